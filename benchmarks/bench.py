@@ -0,0 +1,310 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# make the shared ljcr package importable when run as a script
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+
+from ljcr.autocorr import is_difference_set
+from ljcr.batchcheck import check_all, check_shape, collect_items, load_datasets
+from ljcr.coversearch import greedy_cover
+from ljcr.covertable import CoverIndex
+from ljcr.coververify import verify_cover
+from ljcr.jsonindex import IndexedJson
+from ljcr.ntt import is_signed_difference_set_exact
+
+# Benchmarks for the lookup, verification and table-building paths, at several
+# sizes, on synthetic data and on the datasets in the repository.
+#
+#     python benchmarks/bench.py                  run everything, write benchmarks/results.json
+#     python benchmarks/bench.py --quick          smallest size of each benchmark only
+#     python benchmarks/bench.py --only is_ds     benchmarks whose name starts with is_ds
+#     python benchmarks/bench.py --save-baseline  also make the results the new baseline
+#
+# Each benchmark is set up once per size, then run --repeat times; the best wall
+# time is recorded, with the peak memory allocated during one run (as seen by
+# tracemalloc, which includes NumPy arrays).  If benchmarks/baseline.json
+# exists, each result is compared with it, and any more than --tolerance times
+# slower than the baseline (and slower by at least --min-seconds, so that timer
+# noise in very short runs doesn't count) is reported as a regression (exit
+# status 1).  Timings depend on the machine, so the baseline isn't committed:
+# make one with --save-baseline on the machine the comparisons are run on.
+#
+# The Sage functions (is_cover, is_ds, is_cwm, is_sds) are timed through the
+# code that replaces them without Sage (verify_cover, is_difference_set,
+# is_cwm_exact and the NTT check, and the batched FFT check_shape), and
+# cwm_table and get_cover through the functions in cwm_code.py and
+# covering_code.py, with their printing discarded.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, 'results.json')
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+# name -> (setup function, sizes); setup(size) returns the function to time
+BENCHMARKS = {}
+
+# synthetic files go here, and are removed at exit
+_tmp = None
+
+
+def tmp_path(name):
+    global _tmp
+    if _tmp is None:
+        _tmp = tempfile.TemporaryDirectory()
+    return os.path.join(_tmp.name, name)
+
+
+# the functions defined by a *_code.py file, as the notebooks load() it
+def load_code(path):
+    path = os.path.join(_root, path)
+    g = {'__name__': 'bench'}
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    try:
+        with open(path, 'r') as f:
+            exec(compile(f.read(), path, 'exec'), g)
+    finally:
+        os.chdir(cwd)
+    return g
+
+
+def quiet(fn):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+def benchmark(name, sizes):
+    def register(setup):
+        BENCHMARKS[name] = (setup, sizes)
+        return setup
+    return register
+
+
+# get_cover() on a synthetic covers.json with a greedy C(v,k,t) for each v, opened
+# through its index as load_covers() does
+@benchmark('get_cover', [20, 60, 200])
+def _get_cover(size):
+    rng = np.random.default_rng(0)
+    path = tmp_path(f'covers{size}.json')
+    covers = {f'C({v},5,2)': greedy_cover(v, 5, 2, rng) for v in range(6, 6+size)}
+    with open(path, 'w') as f:
+        json.dump(covers, f)
+    IndexedJson(path)
+    g = load_code('coverings/covering_code.py')
+
+    def run():
+        g['covers'] = IndexedJson(path)
+        for v in range(6, 6+size):
+            g['get_cover'](v, 5, 2)
+    return quiet(run)
+
+
+@benchmark('is_cover', [12, 18, 24])
+def _is_cover(size):
+    blocks = greedy_cover(size, 6, 4, np.random.default_rng(0))
+    return lambda: verify_cover(size, 6, 4, blocks)
+
+
+# Paley difference sets: the quadratic residues mod p = 3 mod 4
+@benchmark('is_ds', [1019, 10007, 100003])
+def _is_ds(size):
+    p = size
+    S = sorted(set((x*x) % p for x in range(1, p)))
+    k = len(S)
+    lam = k*(k-1)//(p-1)
+    return lambda: is_difference_set(p, k, lam, [p], S)
+
+
+# the same sets with 0 as a negative element: "Paley and zero" signed difference sets
+def _paley_zero(p):
+    P = sorted(set((x*x) % p for x in range(1, p)))
+    k = len(P)+1
+    # A(1)^2 = k + lam*(p-1) with A(1) = |P|-1
+    lam = ((len(P)-1)**2 - k)//(p-1)
+    return k, lam, P, [0]
+
+
+# the exact (NTT) check used by is_sds_exact() and is_cwm_exact()
+@benchmark('is_sds', [1019, 10007, 100003])
+def _is_sds(size):
+    k, lam, P, N = _paley_zero(size)
+    return lambda: is_signed_difference_set_exact(size, k, lam, [size], P, N)
+
+
+# the batched FFT check of check_datasets, on one set of each size
+@benchmark('check_shape_sds', [1019, 10007, 100003])
+def _check_shape_sds(size):
+    k, lam, P, N = _paley_zero(size)
+    items = [('sds', f'SDS({size},{k},{lam},[{size}])', 0, (size,), k, lam, P, N)]
+    return lambda: check_shape((size,), items)
+
+
+# the first size sets of cwm.json, as check_datasets collects them
+def _cw_items(size):
+    with open(os.path.join(_root, 'cwm', 'cwm.json'), 'r') as f:
+        return collect_items('cwm', json.load(f))[:size]
+
+
+# is_cwm_exact() from cwm_code.py on the first size sets of cwm.json
+@benchmark('is_cwm', [10, 100, 787])
+def _is_cwm(size):
+    g = load_code('cwm/cwm_code.py')
+    items = _cw_items(size)
+    M = [[item[3][0], int(round(item[4]**0.5)), item[6], item[7]] for item in items]
+
+    def run():
+        return all(g['is_cwm_exact'](m) for m in M)
+    return run
+
+
+# check_shape() on the same sets, a call for each n
+@benchmark('check_shape_cwm', [10, 100, 787])
+def _check_shape_cwm(size):
+    items = _cw_items(size)
+    shapes = {}
+    for item in items:
+        shapes.setdefault(item[3], []).append(item)
+
+    def run():
+        return [check_shape(shape, I) for shape, I in shapes.items()]
+    return run
+
+
+# the batched check of every stored set (is_cwm, is_sds and is_ds for whole datasets)
+@benchmark('check_datasets', [1])
+def _check_datasets(size):
+    datasets = load_datasets(_root)
+    return lambda: check_all(datasets, processes=1)
+
+
+# cwm_table() from cwm_code.py, building the status arrays each time
+@benchmark('cwm_table', [1000, 10000])
+def _cwm_table(size):
+    g = load_code('cwm/cwm_code.py')
+    quiet(lambda: g['cwm'].data())()
+
+    def run():
+        g['_cw_status'] = None
+        g['cwm_table'](range(1, size), range(2, 20))
+    return quiet(run)
+
+
+# coverdata-like entries, and the table of those with v in a range
+@benchmark('cover_tab', [1000, 10000, 100000])
+def _cover_tab(size):
+    rng = np.random.default_rng(0)
+    coverdata = {}
+    while len(coverdata) < size:
+        v, k, t = sorted(int(x) for x in rng.integers(2, 100, 3))[::-1]
+        coverdata[f'C({v},{k},{t})'] = {'size': v, 'low_bd': v-1,
+                                        'imps': [[v, 'greedy', 'bench', '2020-01-01 00:00:00']]}
+
+    def run():
+        I = CoverIndex(coverdata)
+        return I.table(I.query(v=range(20, 60)))
+    return run
+
+
+def measure(fn, repeat):
+    best = None
+    for r in range(repeat):
+        t = time.perf_counter()
+        fn()
+        t = time.perf_counter()-t
+        best = t if best is None else min(best, t)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(only=None, quick=False, repeat=3):
+    results = []
+    for name, (setup, sizes) in BENCHMARKS.items():
+        if only is not None and not any(name.startswith(x) for x in only):
+            continue
+        for size in sizes[:1] if quick else sizes:
+            try:
+                fn = setup(size)
+            except (OSError, ImportError) as e:
+                print(f'{name} [{size}]: skipped ({e})')
+                continue
+            seconds, peak = measure(fn, repeat)
+            results += [{'name': name, 'size': size, 'seconds': seconds, 'peak_bytes': peak}]
+            print(f'{name:16s} {size:8d}  {seconds:10.4f}s  {peak/2**20:10.1f}MB', flush=True)
+    return results
+
+
+def machine():
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'processor': platform.processor(),
+            'cpus': os.cpu_count()}
+
+
+# results more than tolerance times, and at least min_seconds, slower than the baseline
+def regressions(results, baseline, tolerance, min_seconds=0.0):
+    base = {(R['name'], R['size']): R for R in baseline['results']}
+    slow = []
+    for R in results:
+        B = base.get((R['name'], R['size']))
+        if B is None:
+            continue
+        if R['seconds'] > tolerance*B['seconds'] and R['seconds']-B['seconds'] >= min_seconds:
+            slow += [{'name': R['name'], 'size': R['size'], 'seconds': R['seconds'],
+                      'baseline': B['seconds'], 'ratio': R['seconds']/B['seconds']}]
+    return slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the ljcr lookup, verification and table paths')
+    parser.add_argument('--only', nargs='*', help='run the benchmarks whose names start with these')
+    parser.add_argument('--quick', action='store_true', help='smallest size of each benchmark only')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=RESULTS)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--min-seconds', type=float, default=0.002)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.quick, args.repeat)
+    report = {'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': machine(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f'results written to {args.output}')
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        slow = regressions(results, baseline, args.tolerance, args.min_seconds)
+        for R in slow:
+            print(f'regression: {R["name"]} [{R["size"]}] {R["seconds"]:.4f}s, '
+                  f'baseline {R["baseline"]:.4f}s ({R["ratio"]:.1f}x)')
+        if len(slow) > 0:
+            status = 1
+        else:
+            print(f'no regressions against {args.baseline}')
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f'baseline written to {args.baseline}')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,24 @@
 import pandas as pd
 import numpy as np
 import matplotlib as mpl
+import os
+import sys
+
+# make the shared ljcr package importable, whether this file is imported or load()ed
+_here = os.path.dirname(os.path.abspath((lambda: 0).__code__.co_filename))
+if os.path.dirname(_here) not in sys.path:
+    sys.path.insert(0, os.path.dirname(_here))
+
+from ljcr.jsonindex import IndexedJson
+from ljcr.blockstore import BlockStore, write_block_store
+from ljcr.coververify import verify_cover
+from ljcr.coverbatch import verify_all, read_checkpoint, summary_report, print_report
+from ljcr.covertable import CoverIndex
+from ljcr.keyindex import params
+from ljcr.coversearch import search_cover, METHOD
+from ljcr.improvelog import submit, read_log, apply_log, logged_blocks, compact
+from ljcr.coverbounds import BoundTable, check_coverdata
+from ljcr.records import CoverRecord, CoverBlocks, Improvement, format_cover, format_blocks, format_improvement
 
 # coverdata is a python dictionary; each entry is the "name" of a set of parameters, e.g. "C(7,3,2)"
 # the dictionary entries contain 
@@ -13,68 +31,156 @@ import matplotlib as mpl
 #                            submitter
 #                            a timestamp of when it was submitted
 
+# covers.json is 2.7GB, and json.load() on it takes minutes and tens of GB of memory.
+# load_covers() instead scans it once and saves a byte-offset index (covers.json.idx);
+# the result can be used in place of the dictionary, e.g. covers = load_covers(),
+# and each lookup parses only the covering asked for.
+# The index is rebuilt automatically if covers.json changes.
+def load_covers(path='covers.json', rebuild=False):
+    covers = IndexedJson(path, rebuild)
+    print(f'indexed {len(covers)} data items')
+    return covers
+
+# covers.blk is a packed copy of covers.json: each covering is stored as an n x k
+# array of points, with a header table in covers.blk.json.  make_cover_store()
+# builds it (reading covers.json one entry at a time), and load_cover_store()
+# opens it, again for use in place of covers.  get_cover() then returns the blocks
+# as a NumPy array mapped straight from the file, without reading or parsing.
+def make_cover_store(path='covers.blk', json_path='covers.json', layout='rows'):
+    header = write_block_store(IndexedJson(json_path), path, layout)
+    print(f'wrote {len(header["entries"])} coverings to {path}')
+
+def load_cover_store(path='covers.blk'):
+    covers = BlockStore(path)
+    print(f'opened {len(covers)} data items')
+    return covers
+
+# coverdata and covers can instead be read from the SQLite store built by
+# "python -m ljcr.sqlstore" (see ljcr/sqlstore.py): use_store() opens it for both,
+# and cover_query() is then an indexed lookup in the store
+def use_store(path=os.path.join(os.path.dirname(_here),'ljcr.sqlite')):
+    from ljcr.sqlstore import SQLCoverdata, SQLCovers
+
+    global coverdata, covers, _cover_index
+    coverdata = SQLCoverdata(path)
+    covers = SQLCovers(path)
+    _cover_index = None
+    print(f'opened {len(coverdata)} data items')
+
+# names of the coverings with the given parameters (each a value or a range), sorted by
+# (v,k,t); open_only selects those whose size is above the lower bound
+def cover_query(v=None,k=None,t=None,open_only=False):
+    if hasattr(coverdata,'query'):
+        return coverdata.query(v=v,k=k,t=t,open_only=open_only)
+    I = cover_index()
+    return I.names(I.query(v=v,k=k,t=t,open_only=open_only))
+
+# improved coverings are appended to a log (improvements.jsonl) rather than written
+# into coverdata.json and covers.json, which would mean rewriting 2.7GB each time.
+# load_log() applies the log on top of coverdata and covers, so the notebook shows
+# the improvements as soon as they are logged; compact_log() writes them into the
+# files (appending to covers.json in place) and empties the log.
+# logged_covers holds the logged coverings, which get_cover() and show_cover() look at first
+logged_covers = {}
+
+def load_log(path='improvements.jsonl'):
+    global _cover_index
+    records = read_log(path)
+    changed = apply_log(coverdata, records)
+    logged_covers.update(logged_blocks(records))
+    _cover_index = None
+    print(f'read {len(records)} logged improvements')
+    return changed
+
+# check that L is a C(v,k,t) covering smaller than the one in coverdata, and log it
+def submit_improvement(v,k,t,L,creator,method='',path='improvements.jsonl'):
+    global _cover_index
+    covname = f'C({v},{k},{t})'
+    R = submit(path,coverdata,covname,L,method,creator)
+    if R is None:
+        print(f'no improvement on {coverdata[covname]["size"]}')
+        return
+    apply_log(coverdata,[R])
+    logged_covers[covname] = R['blocks']
+    _cover_index = None
+    print(f'{covname} with {len(L)} blocks written to {path}')
+    return R
+
+# an open covers.json view (from load_covers()) is reopened afterwards, to pick up the
+# new byte offsets; an open covers.blk picks up its new header by itself
+def compact_log(path='improvements.jsonl', coverdata_path='coverdata.json', covers_path='covers.json', store_path='covers.blk'):
+    global covers
+    changed = compact(path,coverdata_path,covers_path,store_path)
+    C = globals().get('covers')
+    if isinstance(C,IndexedJson) and os.path.abspath(C.path) == os.path.abspath(covers_path):
+        covers = IndexedJson(covers_path)
+    print(f'{len(changed)} coverings updated')
+    return changed
+
 # pull parameters out from name C
+# names are parsed once, and looked up after that (see ljcr/keyindex.py)
 def get_v(C):
-    S = C.split(',')
-    return int(S[0].split('(')[1])
+    return params(C)[1][0]
 
 def get_k(C):
-    S = C.split(',')
-    return int(S[1])
+    return params(C)[1][1]
 
 def get_t(C):
-    S = C.split(',')
-    return int(S[2].split(')')[0])
+    return params(C)[1][2]
 
 
 def print_improvement(imp):
-    sz = imp[0]
-    method = imp[1]
-    creator = imp[2]
-    timestamp = imp[3]
-    if len(method)>0:
-        print(f'{imp[0]}:  {imp[3]} by {imp[2]} using {imp[1]}')
-    else:
-        print(f'{imp[0]}:  {imp[3]} by {imp[2]}')
+    print(format_improvement(Improvement(*imp)),end='')
 
 
-def get_cover_data(v,k,t):
+# the coverdata entry for C(v,k,t) as a record (see ljcr/records.py): v, k, t, size, low_bd,
+# and the improvements as (size, method, creator, timestamp) tuples; None if it's not in coverdata
+def cover_record(v,k,t):
     covname = f'C({v},{k},{t})'
     if covname not in coverdata:
-        print(f'{covname} not in database')
+        return None
+    return CoverRecord.from_entry(covname,coverdata[covname])
+
+def get_cover_data(v,k,t):
+    R = cover_record(v,k,t)
+    if R is None:
+        print(f'C({v},{k},{t}) not in database')
         return
+    print(format_cover(R),end='')
 
-    CD = coverdata[covname]
-    sz = CD['size']
-    lb = CD['low_bd']
-    imp = CD['imps'][0]
-    if sz == lb:
-        print(f'{covname} = {sz}')
-    else:
-        print(f'{lb} <= {covname} <= {sz}')
-    print(f'last update ',end='')
-    print_improvement(imp)
+# the blocks of C(v,k,t) (see ljcr/records.py): len() is the number of blocks, blocks()
+# iterates over them one at a time and array() gives them all as an array; None if
+# there is no such covering
+def cover_blocks(v,k,t):
+    covname = f'C({v},{k},{t})'
+    if covname in logged_covers:
+        return CoverBlocks(covname,logged_covers[covname])
+    if covname in covers:
+        return CoverBlocks(covname,covers[covname])
+    return None
 
 def get_cover(v,k,t):
     covname = f'C({v},{k},{t})'
-    if covname not in covers:
+    if covname in logged_covers:
+        C = logged_covers[covname]
+    elif covname in covers:
+        C = covers[covname]
+    else:
         print(f'{covname} not in database')
         return
 
-    C = covers[covname]
     print(f'{covname} has {len(C)} blocks')
     return [v,k,t,C]
 
+# prints a line for each block, as they're gone through
 def show_cover(v,k,t):
-    covname = f'C({v},{k},{t})'
-    if covname not in covers:
-        print(f'{covname} not in database')
+    B = cover_blocks(v,k,t)
+    if B is None:
+        print(f'C({v},{k},{t}) not in database')
         return
 
-    C = covers[covname]
-    print(f'{covname} has {len(C)} blocks')
-    for i in range(len(C)):
-        print(f'{C[i]}')
+    for line in format_blocks(B):
+        print(line,end='')
 
 
 # code to create tables for showing a list of covering designs
@@ -91,9 +197,9 @@ def init_tab():
     return T
 
 def add_tab_entry(T,C):
-    v = C.split(',')[0].split('(')[1]
-    k = C.split(',')[1]
-    t = C.split(',')[2].split(')')[0]
+    v = get_v(C)
+    k = get_k(C)
+    t = get_t(C)
     T['v'] += [v]
     T['k'] += [k]
     T['t'] += [t]
@@ -108,6 +214,44 @@ def show_tab(T):
     df = df.style.hide(axis='index')
     return df
 
+# columnar index over coverdata, built on first use (or again with rebuild=True,
+# after coverdata changes)
+_cover_index = None
+
+def cover_index(rebuild=False):
+    global _cover_index
+    if _cover_index is None or rebuild:
+        _cover_index = CoverIndex(coverdata)
+    return _cover_index
+
+# the same table as the init_tab/add_tab_entry loop, from one vectorized query.
+# each parameter is a value or a range, e.g. cover_tab(v=range(10,25),k=9,t=6)
+def cover_tab(v=None,k=None,t=None,open_only=False):
+    I = cover_index()
+    return show_tab(I.table(I.query(v=v,k=k,t=t,open_only=open_only)))
+
+# lower bounds (Schonheim with Hanani's refinement for t=2, using coverdata's
+# lower bounds for smaller parameters) for arrays or single values of v, k and t
+def lower_bound(v,k,t):
+    T = BoundTable(int(np.max(v)),int(np.max(k)),int(np.max(t)),coverdata)
+    return T.bound(v,k,t)
+
+# list the coverdata entries whose low_bd is weaker than the computed bound,
+# and those where the computed bound shows the size is optimal
+def check_lower_bounds():
+    report = check_coverdata(coverdata)
+    print(f'{len(report["weaker"])} entries with a stored lower bound below the computed one')
+    for C,lb,b in report['weaker']:
+        print(f'  {C}: low_bd {lb}, computed {b}')
+    print(f'{len(report["solved"])} entries whose size equals the computed bound')
+    for C,sz,lb in report['solved']:
+        print(f'  {C}: size {sz}, low_bd {lb}')
+    if len(report['wrong']) > 0:
+        print(f'error: {len(report["wrong"])} entries with size below the computed bound')
+        for C,sz,b in report['wrong']:
+            print(f'  {C}: size {sz}, computed {b}')
+    return report
+
 # function to show a table of improvements for a given (v,k,t)
 def show_history(v,k,t):
     T = {}
@@ -162,3 +306,64 @@ def is_cover(C):
 
     return True
 
+
+# faster check that C = [v,k,t,L] is a covering, which doesn't need Sage:
+# blocks are encoded as bitmasks, and each marks the t-sets it contains in a bit array
+# indexed by colex rank.  prints (up to 10 of) the t-sets that aren't covered, if any
+def is_cover_fast(C):
+    v = C[0]
+    k = C[1]
+    t = C[2]
+
+    ok, uncovered = verify_cover(v,k,t,C[3])
+    if not ok:
+        print(f'{len(uncovered)} {t}-sets not contained in any block')
+        for c in uncovered[:10]:
+            print(f'{[int(x) for x in c]}')
+
+    return ok
+
+# write coverdata as typed columns, with the improvements as ragged arrays (see
+# ljcr/columnar.py), and the blocks of each covering too if covers is given (the
+# dictionary, or load_covers() or load_cover_store()).  Parquet files in the directory
+# path if pyarrow is installed, else one .npz file; read it back with read_columns(path)
+def cover_export(path,covers=None,fmt=None):
+    from ljcr.columnar import cover_columns, write_columns
+
+    C = cover_columns(coverdata,covers)
+    fmt = write_columns(C,path,fmt)
+    print(f'wrote {len(C)} data items to {path} ({fmt})')
+    return C
+
+# re-verify every covering in covers.json (or covers.blk) on all cores, then report the
+# coverings that fail or whose number of blocks disagrees with coverdata.
+# progress is saved in checkpoint; if the run is interrupted, calling this again
+# continues where it stopped.  delete the checkpoint file to start over.
+def verify_database(path='covers.json', checkpoint='covers_verify.jsonl', processes=None):
+    for R in verify_all(path, checkpoint=checkpoint, processes=processes):
+        if not R['ok']:
+            print(f'{R["name"]} is not a covering')
+
+    report = summary_report(read_checkpoint(checkpoint).values(), coverdata)
+    print_report(report)
+    return report
+
+# try to find a smaller C(v,k,t) by simulated annealing on all cores (see ljcr/coversearch.py),
+# starting from the best covering known (logged or in covers, if it has been loaded),
+# or else a greedy covering.  a covering with fewer blocks than coverdata's size is
+# checked and submitted to the improvement log
+def try_improvement(v,k,t,creator,time_limit=60,restarts=None,path='improvements.jsonl'):
+    covname = f'C({v},{k},{t})'
+    start = logged_covers.get(covname)
+    known = globals().get('covers')
+    if start is None and known is not None and covname in known:
+        start = [[int(x) for x in b] for b in known[covname] if len(b)>0]
+
+    L = search_cover(v,k,t,start,restarts,time_limit=time_limit)
+    if L is None:
+        print(f'no {covname} found')
+        return
+
+    print(f'found a {covname} with {len(L)} blocks')
+    submit_improvement(v,k,t,L,creator,METHOD,path)
+    return L
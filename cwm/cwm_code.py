@@ -1,13 +1,48 @@
-import pandas as pd
-import numpy as np
-import matplotlib as mpl
-import json
-
-f = open('cwm.json','r')
-cwm = json.load(f)
-f.close()
-
-print(f'read {len(cwm.keys())} data items\n')
+import os
+import sys
+
+# make the shared ljcr package importable, whether this file is imported or load()ed
+_here = os.path.dirname(os.path.abspath((lambda: 0).__code__.co_filename))
+if os.path.dirname(_here) not in sys.path:
+    sys.path.insert(0, os.path.dirname(_here))
+
+from ljcr.dataset import LazyDataset
+from ljcr.keyindex import load_key_index, params
+
+# cwm.json is read the first time cwm is used, rather than when this file is loaded,
+# and from the directory this file is in, whatever the current directory is.
+# likewise pandas and the NumPy-based code in ljcr are only imported when they're needed
+cwm = LazyDataset(os.path.join(_here,'cwm.json'))
+
+# parsed names, and the values of s for each n, from cwm.json.keys when that is up to date
+_keyindex = None
+
+def key_index():
+    global _keyindex
+    if _keyindex is None:
+        _keyindex = load_key_index(cwm.path, cwm)
+    return _keyindex
+
+# read cwm from the SQLite store built by "python -m ljcr.sqlstore" (see ljcr/sqlstore.py)
+# rather than from cwm.json; the functions here work the same on top of it
+def use_store(path=os.path.join(os.path.dirname(_here),'ljcr.sqlite')):
+    from ljcr.sqlstore import SQLDataset
+
+    global cwm, _keyindex, _cw_status
+    cwm = SQLDataset(path,'cwm')
+    _keyindex = cwm.key_index()
+    _cw_status = None
+    print(f'opened {len(cwm)} data items')
+
+# names of the entries with the given parameters (each a value or a range) and status,
+# sorted by parameters, e.g. cw_query(n=range(1,500),status='Open')
+# with use_store() this is an indexed lookup in the store
+def cw_query(n=None,s=None,status=None):
+    from ljcr.sqlstore import query_index
+
+    if hasattr(cwm,'query'):
+        return cwm.query(n=n,s=s,status=status)
+    return query_index(key_index(),cwm,'cwm',status,n=n,s=s)
 
 # cwm is a python dictionary; each entry is the "name" of a set of parameters, e.g. "CW(28,4)"
 # note that the second parameter is s, not k = s^2
@@ -38,17 +73,16 @@ def num_sets(D):
     return len(cwm[D]["sets"])
 
 # pull parameters out from name D
+# names are parsed once, and looked up after that (see ljcr/keyindex.py)
 def get_n(D):
-    S = D.split(',')
-    return int(S[0].split('(')[1])
+    return params(D)[1][0]
 
 def get_k(D):
     s = get_s(D)
     return s*s
 
 def get_s(D):
-    S = D.split(',')
-    return int(S[1].split(')')[0])
+    return params(D)[1][1]
 
 def get_cwm(n,s,i):
     cwmname = f'CW({n},{s})'
@@ -69,81 +103,70 @@ def num_sets(cw):
         return 0
     return len(cw['sets'])
 
-# print out information about a given CWM
-def get_cwm_data(n,s):
+# the entry for a CW(n,s^2) as a record (see ljcr/records.py), with its parameters, status
+# and comment, and sets() iterating over its [P,N] pairs; None if it's not in the dataset
+def cwm_record(n,s):
+    from ljcr.records import CWRecord
+
     cwmname = f'CW({n},{s})'
     if cwmname not in cwm:
-        print(f'{cwmname} not in database')
-        return
-
-    C = cwm[cwmname]
-    if C['status']=="All":
-        if num_sets(C)>1:
-            print(f'There are exactly {num_sets(C)} CW({n},{s}^2)')
-        else:
-            print(f'There is exactly {num_sets(C)} CW({n},{s}^2)')
-
-    if C['status']=="Yes":
-        if num_sets(C)>1:
-            print(f'There are at least {num_sets(C)} CW({n},{s}^2)')
-        else:
-            if num_sets(C)>0:
-                print(f'There is at least {num_sets(C)} CW({n},{s}^2)')
-            else:
-                print(f'There is at least one CW({n},{s}^2), but it is not in this dataset')
+        return None
+    return CWRecord(cwmname,cwm[cwmname])
 
-    if C['status']=="No":
-            print(f'No CW({n},{s}^2) exists')
+# records for the entries with matrices in the dataset, one at a time
+def cwm_records_with_sets():
+    from ljcr.records import CWRecord
 
-    if 'comment' in C:
-        print(f'Reference: {C["comment"]}')
+    for c in cwm:
+        if cwm[c]["status"] in ["All","Yes"] and num_sets(cwm[c])>0:
+            yield CWRecord(c,cwm[c])
 
-    for i in range(num_sets(C)):
-        cw = C['sets'][i]
-        print(f'{i}:\tP = {cw[0]}, N = {cw[1]}')
+# print out information about a given CWM
+def get_cwm_data(n,s):
+    from ljcr.records import format_cw
 
-    print()
+    R = cwm_record(n,s)
+    if R is None:
+        print(f'CW({n},{s}) not in database')
+        return
+    print(format_cw(R),end='')
 
 # show all the CWM in the database (not existence results, just actual circulant weighing matrices)
 def all_sets():
-    for c in cwm:
-        if cwm[c]["status"] in ["All","Yes"] and num_sets(cwm[c])>0:
-            print(c)
-            str = c.split(',')
-            n = int(str[0].split('(')[1])
-            s = int(str[1].split(')')[0])
-            get_cwm_data(n,s)
-            print('')
+    from ljcr.records import format_cw
+
+    for R in cwm_records_with_sets():
+        print(R.name)
+        print(format_cw(R),end='')
+        print('')
 
 
 # make a table, along the lines of Strassler's table (and Tan's 2018 update)
 # I'm ignoring trivial cases n=1 or s=1
-def cwm_table():
-
-    for n in range(1,1000):
-
-        if (n%40)==1:
-            print('\nn\\s ',end='')
-            for s in range(2,20):
-                print(f'{s:2d}  ',end='')
-            print('')
-            if n==1:
-                continue
-
-        print(f'{n:3d}  ',end='')
-        for s in range(2,20):
-            cwmname = f'CW({n},{s})'
-            if cwmname not in cwm:
-                print('.   ',end='')
-            else:
-                status = cwm[cwmname]['status']
-                if status=="All" or status=="Yes":
-                    print('Y   ',end='')
-                if status=="No":
-                    print('.   ',end='')
-                if status=="Open":
-                    print('*   ',end='')
-        print('')
+# the table is built as an array in one step (see ljcr/cwtable.py), for any ranges of n and s
+_cw_status = None
+
+def cw_status(rebuild=False):
+    from ljcr.cwtable import CWStatus
+
+    global _cw_status
+    if _cw_status is None or rebuild:
+        key_index()
+        _cw_status = CWStatus(cwm)
+    return _cw_status
+
+def cwm_table(n=range(1,1000),s=range(2,20)):
+    print(cw_status().text(n,s),end='')
+
+# the same table as a pandas DataFrame, with "Y", "*" or "." for each n and s
+def cwm_grid(n=range(1,1000),s=range(2,20)):
+    return cw_status().grid(n,s)
+
+# write the table to a CSV file, or an HTML file if path ends in .html
+def cwm_table_export(path,n=range(1,1000),s=range(2,20)):
+    from ljcr.cwtable import export_grid
+
+    export_grid(cwm_grid(n,s),path)
 
 # convert an CWM to its representation as an element of the group ring of G
 def cwm_as_gp_ring_elt(M):
@@ -165,6 +188,14 @@ def cwm_as_gp_ring_elt(M):
     return A
 
 
+# the same group ring element without Sage, as a GroupRingElement (see ljcr/groupring.py)
+# supports +, -, * and gp_ring_elt_map(), and converts to Sage with to_sage()
+def cwm_as_gp_ring_array(M):
+    from ljcr.groupring import GroupRingElement
+
+    return GroupRingElement.from_sets([M[0]],M[2],M[3])
+
+
 # get the ith (v,k,lambda) signed difference set in G, as a group ring element
 def get_cwm_in_groupring(v,k,lam,G,i):
     cwmname = f'CWM({n},{s})'
@@ -193,6 +224,9 @@ def get_cwm_in_groupring(v,k,lam,G,i):
 
 # multiply group elts in group ring element by t
 def gp_ring_elt_map(A,t):
+    if not hasattr(A,'parent'):     # a GroupRingElement rather than a Sage element
+        return A.map(t)
+
     R = A.parent()
     G = R.group()
     
@@ -237,6 +271,60 @@ def is_cwm(M):
 
 
 
+# the same test without Sage, and exact for any n: the autocorrelation is computed with
+# number-theoretic transforms mod primes rather than an FFT (see ljcr/ntt.py), so there
+# is no rounding however large n and s are
+def is_cwm_exact(M):
+    from ljcr.ntt import is_signed_difference_set_exact
+
+    n = M[0]
+    s = M[1]
+    return is_signed_difference_set_exact(n,s*s,0,[n],M[2],M[3])
+
+
+# the orbits of Z_n under the multipliers given (by default the primes dividing s that
+# are prime to n), and the group of units they generate.  both are computed once per
+# session, and saved for later sessions if LJCR_CACHE is set (see ljcr/multipliers.py)
+def cw_orbits(n,s,multipliers=None):
+    from ljcr.multipliers import cw_multipliers, orbits, subgroup
+
+    if multipliers is None:
+        multipliers = cw_multipliers(n,s)
+    H = subgroup(n,multipliers)
+    O = orbits(n,multipliers)
+    print(f'multipliers {multipliers} generate a group of {len(H)} units mod {n}, with {len(O)} orbits on Z_{n}')
+    return [list(map(int,o)) for o in O]
+
+# orbit exhaust for CW(n,s^2) (see ljcr/orbitsearch.py): search all CW(n,s^2) fixed by the
+# multipliers given (by default the primes dividing s that are prime to n) on all cores.
+# returns an entry in the format of cwm.json, its comment naming the multipliers: status
+# "Yes" with the sets found, up to equivalence, or if none are found "Open", or "No" when
+# proven=True says the multipliers are known to be multipliers for CW(n,s^2) (the default
+# candidates are not).  with a checkpoint file, an interrupted search can be continued by
+# calling this again with the same file
+def cw_search(n,s,multipliers=None,processes=None,checkpoint=None,proven=False):
+    from ljcr.orbitsearch import cw_orbit_search, cw_multipliers
+
+    if multipliers is None:
+        multipliers = cw_multipliers(n,s)
+    E = cw_orbit_search(n,s,multipliers,processes,checkpoint,proven)
+    print(f'CW({n},{s}^2) fixed by multipliers {multipliers}: {len(E.get("sets",[]))} found')
+    for i in range(num_sets(E)):
+        print(f'{i}:\tP = {E["sets"][i][0]}, N = {E["sets"][i][1]}')
+    return E
+
+
+# write cwm.json as typed columns, with the matrices as ragged arrays (see ljcr/columnar.py):
+# Parquet files in the directory path if pyarrow is installed, else one .npz file.
+# read it back with read_columns(path) from ljcr.columnar
+def cwm_export(path,fmt=None):
+    from ljcr.columnar import dataset_columns, write_columns
+
+    C = dataset_columns(cwm,'CW')
+    fmt = write_columns(C,path,fmt)
+    print(f'wrote {len(C)} data items to {path} ({fmt})')
+    return C
+
 # code to create tables for showing a list of circulant weighing matrices
 def init_tab():
     T = {}
@@ -248,8 +336,8 @@ def init_tab():
     return T
 
 def add_tab_entry(T,M):
-    n = int(M.split(',')[0].split('(')[1])
-    s = int(M.split(',')[1].split(')')[0])
+    n = get_n(M)
+    s = get_s(M)
     k = s*s
     T['n'] += [n]
     T['s'] += [s]
@@ -258,6 +346,7 @@ def add_tab_entry(T,M):
     T['comment'] += [cwm[M]['comment']]
 
 def show_tab(T):
+    import pandas as pd
     df = pd.DataFrame(T)
     df = df.style.hide(axis='index')
     return df
@@ -1,13 +1,48 @@
-import pandas as pd
-import numpy as np
-import matplotlib as mpl
-import json
-
-f = open('ds.json','r')
-diffsets = json.load(f)
-f.close()
-
-print(f'read {len(diffsets.keys())} data items\n')
+import os
+import sys
+
+# make the shared ljcr package importable, whether this file is imported or load()ed
+_here = os.path.dirname(os.path.abspath((lambda: 0).__code__.co_filename))
+if os.path.dirname(_here) not in sys.path:
+    sys.path.insert(0, os.path.dirname(_here))
+
+from ljcr.dataset import LazyDataset
+from ljcr.keyindex import load_key_index, params
+
+# ds.json is read the first time diffsets is used, rather than when this file is loaded,
+# and from the directory this file is in, whatever the current directory is.
+# likewise pandas and the NumPy-based code in ljcr are only imported when they're needed
+diffsets = LazyDataset(os.path.join(_here,'ds.json'))
+
+# parsed names, and the groups for each (v,k,lambda), from ds.json.keys when that is up to date
+_keyindex = None
+
+def key_index():
+    global _keyindex
+    if _keyindex is None:
+        _keyindex = load_key_index(diffsets.path, diffsets)
+    return _keyindex
+
+# read diffsets from the SQLite store built by "python -m ljcr.sqlstore" (see ljcr/sqlstore.py)
+# rather than from ds.json; the functions here work the same on top of it
+def use_store(path=os.path.join(os.path.dirname(_here),'ljcr.sqlite')):
+    from ljcr.sqlstore import SQLDataset
+
+    global diffsets, _keyindex, _canonical_index
+    diffsets = SQLDataset(path,'ds')
+    _keyindex = diffsets.key_index()
+    _canonical_index = None
+    print(f'opened {len(diffsets)} data items')
+
+# names of the entries with the given parameters (each a value or a range) and status,
+# sorted by parameters, e.g. ds_query(v=16,G=[4,4])
+# with use_store() this is an indexed lookup in the store
+def ds_query(v=None,k=None,lam=None,G=None,status=None):
+    from ljcr.sqlstore import query_index
+
+    if hasattr(diffsets,'query'):
+        return diffsets.query(v=v,k=k,lam=lam,G=G,status=status)
+    return query_index(key_index(),diffsets,'ds',status,v=v,k=k,lam=lam,G=G)
 
 # diffsets is a python dictionary; each entry is the "name" of a set of parameters, e.g. "DS(11,5,2,[11])"
 # the dictionary entries contain 
@@ -36,25 +71,18 @@ def num_sets(D):
     return len(diffsets[D]["sets"])
 
 # pull parameters out from name D
+# names are parsed once, and looked up after that (see ljcr/keyindex.py)
 def get_v(D):
-    S = D.split(',')
-    return int(S[0].split('(')[1])
+    return params(D)[1][0]
 
 def get_k(D):
-    S = D.split(',')
-    return int(S[1])
+    return params(D)[1][1]
 
 def get_lam(D):
-    S = D.split(',')
-    return int(S[2])
+    return params(D)[1][2]
 
 def get_G(D):
-    S = D.split('[')[1].split(']')[0].split(',')
-    G = []
-    for i in range(len(S)):
-        component = S[i]
-        G += [int(component)]
-    return G
+    return list(params(D)[1][3])
 
 #get the ith set as a list
 def get_set(D,i):
@@ -89,56 +117,38 @@ def num_sets(ds):
         return 0
     return len(ds['sets'])
 
-# print out information about a given DS
-def get_ds_data(v,k,lam,G):
+# the entry for a DS as a record (see ljcr/records.py), with its parameters, status,
+# comment and G_rep, and sets() iterating over its sets; None if it's not in the dataset
+def ds_record(v,k,lam,G):
+    from ljcr.records import DSRecord
+
     dsname = f'DS({v},{k},{lam},{G})'.replace(' ','')
     if dsname not in diffsets:
-        print(f'{dsname} not in database')
-        return
-
-    D = diffsets[dsname]
-    if D['status']=="All":
-        if num_sets(D)>1:
-            print(f'There are exactly {num_sets(D)} DS({v},{k},{lam}) in group {G}')
-        else:
-            print(f'There is exactly {num_sets(D)} DS({v},{k},{lam}) in group {G}')
-
-    if D['status']=="Yes":
-        if num_sets(D)>1:
-            print(f'There are at least {num_sets(D)} DS({v},{k},{lam}) in group {G}')
-        else:
-            if num_sets(D)>0:
-                print(f'There is at least {num_sets(D)} DS({v},{k},{lam}) in group {G}')
-            else:
-                print(f'There is at least one DS({v},{k},{lam}) in group {G}, but it is not in this dataset')
+        return None
+    return DSRecord(dsname,diffsets[dsname])
 
-    if D['status']=="No":
-            print(f'No DS({v},{k},{lam}) exists in group {G}')
+# records for each group with a (v,k,lambda) difference set entry, one at a time
+def ds_records_allgroups(v,k,lam):
+    for G in key_index().lookup((v,k,lam)):
+        yield ds_record(v,k,lam,list(G))
 
-    if 'comment' in D:
-        print(f'Reference: {D["comment"]}\n')
+# print out information about a given DS
+def get_ds_data(v,k,lam,G):
+    from ljcr.records import format_ds
 
-    if 'G_rep' in D:
-        print(f'DS given as elements of {D["G_rep"]}')
-
-    for i in range(num_sets(D)):
-        ds = D['sets'][i]
-        if num_sets(D) > 1:
-            print(f'{i}:\t',end='')
-        for j in range(len(ds)):
-            print(f'{ds[j]} ',end='')
-        print('')
+    R = ds_record(v,k,lam,G)
+    if R is None:
+        print(f'DS({v},{k},{lam},{G})'.replace(' ','') + ' not in database')
+        return
+    print(format_ds(R,G),end='')
 
 
 # find all (v,k,lambda) difference sets for any group
 def get_ds_allgroups(v,k,lam):
-    dsname = f'DS({v},{k},{lam}'
-    dslen = len(dsname)
-    for d in diffsets:
-        if d[:dslen]==dsname:
-            G = d[dslen+1:-1]
-            get_ds_data(v,k,lam,G)
-            print('')
+    for G in key_index().lookup((v,k,lam)):
+        G = f'{list(G)}'.replace(' ','')
+        get_ds_data(v,k,lam,G)
+        print('')
 
 
 # convert an int or vector to an Additive Abelian Group element
@@ -167,6 +177,23 @@ def ds_as_gp_ring_elt(D):
     return A
 
 
+# the same group ring element without Sage, as a GroupRingElement (see ljcr/groupring.py)
+# supports +, -, * and gp_ring_elt_map(), and converts to Sage with to_sage()
+def ds_as_gp_ring_array(D):
+    from ljcr.groupring import GroupRingElement
+
+    v = D[0]
+    k = D[1]
+    lam = D[2]
+    G = D[3]
+
+    dsname = f'DS({v},{k},{lam},{G})'.replace(' ','')
+    if dsname in diffsets and 'G_rep' in diffsets[dsname]:
+        G = diffsets[dsname]['G_rep']
+
+    return GroupRingElement.from_sets(G,D[4])
+
+
 # get the ith (v,k,lambda) signed difference set in G, as a group ring element
 def get_ds_in_groupring(v,k,lam,G,i):
     dsname = f'DS({v},{k},{lam},{G})'.replace(' ','')
@@ -196,6 +223,9 @@ def get_ds_in_groupring(v,k,lam,G,i):
 
 # multiply group elts in group ring element by t
 def gp_ring_elt_map(A,t):
+    if not hasattr(A,'parent'):     # a GroupRingElement rather than a Sage element
+        return A.map(t)
+
     R = A.parent()
     G = R.group()
     
@@ -237,6 +267,120 @@ def is_ds(D):
             
     return True
 
+# faster test, which doesn't need Sage: the autocorrelation of the set is computed with
+# an FFT over the group (falling back to exact integer arithmetic if rounding is in doubt).
+# if the DS is stored with a G_rep, its elements are taken in that group.
+# exact=True skips the FFT and counts differences exactly
+def is_ds_fast(D,exact=None):
+    from ljcr.autocorr import is_difference_set
+
+    v = D[0]
+    k = D[1]
+    lam = D[2]
+    G = D[3]
+
+    dsname = f'DS({v},{k},{lam},{G})'.replace(' ','')
+    if dsname in diffsets and 'G_rep' in diffsets[dsname]:
+        G = diffsets[dsname]['G_rep']
+
+    return is_difference_set(v,k,lam,G,D[4],exact)
+
+# the orbits of Z_v under the multipliers given (by default those of the first
+# multiplier theorem: the primes dividing k-lambda that are prime to v and bigger
+# than lambda), and the group of units they generate.  both are computed once per
+# session (saved if LJCR_CACHE is set, see ljcr/multipliers.py).  some translate of
+# a cyclic DS is a union of orbits
+def ds_orbits(v,k,lam,multipliers=None):
+    from ljcr.multipliers import ds_multipliers, orbits, subgroup
+
+    if multipliers is None:
+        multipliers = ds_multipliers(v,k,lam)
+    H = subgroup(v,multipliers)
+    O = orbits(v,multipliers)
+    print(f'multipliers {multipliers} generate a group of {len(H)} units mod {v}, with {len(O)} orbits on Z_{v}')
+    return [list(map(int,o)) for o in O]
+
+# equivalence of difference sets under translation and multiplication by units (see
+# ljcr/canonical.py).  sets are compared in the G_rep if the entry has one
+
+# group the sets are stored in
+def _rep_group(dsname):
+    if 'G_rep' in diffsets[dsname]:
+        return diffsets[dsname]['G_rep']
+    return get_G(dsname)
+
+# canonical form of the ith (v,k,lambda) difference set in G
+def ds_canonical(v,k,lam,G,i):
+    from ljcr.canonical import canonical_set
+
+    D = get_ds(v,k,lam,G,i)
+    if D is None:
+        return
+    dsname = f'DS({v},{k},{lam},{G})'.replace(' ','')
+    return canonical_set(_rep_group(dsname),D[4])
+
+# print the equivalence classes of the stored (v,k,lambda) difference sets in G
+def ds_classes(v,k,lam,G):
+    from ljcr.canonical import equivalence_classes
+
+    dsname = f'DS({v},{k},{lam},{G})'.replace(' ','')
+    if dsname not in diffsets:
+        print(f'{dsname} not in database')
+        return
+    C = equivalence_classes(_rep_group(dsname),diffsets[dsname].get('sets',[]))
+    print(f'{num_sets(diffsets[dsname])} sets in {len(C)} equivalence classes')
+    for c in C:
+        print(c)
+    return C
+
+# index of the canonical forms of all stored sets, built on first use
+_canonical_index = None
+
+def canonical_index(rebuild=False):
+    from ljcr.canonical import CanonicalIndex
+
+    global _canonical_index
+    if _canonical_index is None or rebuild:
+        _canonical_index = CanonicalIndex(diffsets)
+    return _canonical_index
+
+# list the entries with equivalent sets stored more than once
+def ds_duplicates():
+    D = canonical_index().duplicates()
+    print(f'{len(D)} entries with equivalent sets')
+    for dsname in D:
+        print(f'{dsname}: {D[dsname]}')
+    return D
+
+# character-sum tests (see ljcr/charfilter.py)
+# the candidate sets in G that pass the test |chi(D)|^2 = k-lambda for every
+# nontrivial character chi, all characters being evaluated at once with an FFT
+def ds_char_filter(v,k,lam,G,sets):
+    from ljcr.charfilter import character_check
+
+    ok = character_check(v,k,lam,G,sets,signed=False)
+    return [sets[i] for i in range(len(sets)) if ok[i]]
+
+# run the parameter tests (trivial character and self-conjugacy) on the entries with the
+# given statuses (all entries if statuses is None), and list the ones they eliminate
+def ds_prefilter(statuses=['Open']):
+    from ljcr.charfilter import prefilter, print_prefilter
+
+    report = prefilter(diffsets,statuses)
+    print_prefilter(report)
+    return report
+
+# write ds.json as typed columns, with the sets as ragged arrays (see ljcr/columnar.py):
+# Parquet files in the directory path if pyarrow is installed, else one .npz file.
+# read it back with read_columns(path) from ljcr.columnar
+def ds_export(path,fmt=None):
+    from ljcr.columnar import dataset_columns, write_columns
+
+    C = dataset_columns(diffsets,'DS')
+    fmt = write_columns(C,path,fmt)
+    print(f'wrote {len(C)} data items to {path} ({fmt})')
+    return C
+
 # code to create tables for showing a list of difference sets
 def init_tab():
     T = {}
@@ -249,9 +393,9 @@ def init_tab():
     return T
 
 def add_tab_entry(T,D):
-    v = int(D.split(',')[0].split('(')[1])
-    k = int(D.split(',')[1])
-    lam = int(D.split(',')[2].split(')')[0])
+    v = get_v(D)
+    k = get_k(D)
+    lam = get_lam(D)
     n = k-lam
     T['v'] += [v]
     T['k'] += [k]
@@ -261,6 +405,7 @@ def add_tab_entry(T,D):
     T['comment'] += [diffsets[D]['comment']]
 
 def show_tab(T):
+    import pandas as pd
     df = pd.DataFrame(T)
     df = df.style.hide(axis='index')
     return df
@@ -0,0 +1,5 @@
+# Shared code for the La Jolla Combinatorics Repository datasets.
+#
+# The notebooks in coverings/, diffsets/, cwm/ and signed_diffsets/ load their
+# *_code.py files with Sage's load(); those files pull in the pieces of this
+# package they need.  Nothing here depends on Sage.
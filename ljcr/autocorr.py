@@ -0,0 +1,133 @@
+import numpy as np
+
+# Autocorrelation of sets in finite abelian groups, without Sage.
+#
+# A group G = Z_{n_1} x ... x Z_{n_r} is given by its shape [n_1,...,n_r], as in
+# the dataset names ("DS(16,6,2,[4,4])") or the "G_rep" entries.  A group ring
+# element sum a_g g is stored as an integer array of that shape, with a_g at
+# index g; elements of a cyclic group may be given as integers rather than
+# length-1 vectors.
+#
+# The product of A and B is their cyclic convolution
+#     C[g] = sum_h a_h b_{g-h}
+# and the autocorrelation of A is the coefficient array of A*A^(-1):
+#     C[g] = sum_h a_{h+g} a_h
+# Both are computed with a multidimensional FFT, or exactly by summing over pairs
+# of elements of the supports (exact=True).  With exact=None the FFT is used, and
+# the exact sum is used instead if the FFT result is not within ROUND_TOL of an
+# integer everywhere.
+
+ROUND_TOL = 0.25
+
+# number of pairs summed at once by the exact method
+CHUNK = 1 << 22
+
+
+def group_order(G):
+    return int(np.prod(G, dtype=np.int64))
+
+
+# m x r array of the elements of S, reduced mod the shape G
+def elements(G, S):
+    G = np.asarray(G, dtype=np.int64)
+    E = np.array(S, dtype=np.int64)
+    if E.ndim == 1:
+        E = E.reshape(-1, 1)
+    if E.size == 0:
+        return np.zeros((0, len(G)), dtype=np.int64)
+    if E.shape[1] != len(G):
+        raise ValueError(f'elements have {E.shape[1]} coordinates, group {list(G)} has {len(G)}')
+    return E % G
+
+
+# group ring element sum(weights[i]*S[i]) as an array of shape G (weights default to 1)
+def indicator(G, S, weights=None):
+    E = elements(G, S)
+    A = np.zeros(tuple(G), dtype=np.int64)
+    if weights is None:
+        weights = np.ones(len(E), dtype=np.int64)
+    np.add.at(A, tuple(E.T), np.asarray(weights, dtype=np.int64))
+    return A
+
+
+# P - N as an array of shape G
+def signed_indicator(G, P, N):
+    return indicator(G, P) - indicator(G, N)
+
+
+# A^(-1): the coefficient of g is a_{-g}
+def conjugate(A):
+    A = np.asarray(A)
+    return np.roll(np.flip(A), 1, axis=tuple(range(A.ndim)))
+
+
+def _support(A):
+    flat = A.reshape(-1)
+    support = np.flatnonzero(flat)
+    E = np.array(np.unravel_index(support, A.shape), dtype=np.int64).T
+    return E.reshape(-1, A.ndim), flat[support].astype(np.int64)
+
+
+def _convolve_exact(A, B):
+    shape = A.shape
+    G = np.array(shape, dtype=np.int64)
+    EA, wA = _support(A)
+    EB, wB = _support(B)
+    C = np.zeros(A.size, dtype=np.int64)
+    step = max(1, CHUNK//max(1, len(wB)))
+    for i in range(0, len(wA), step):
+        # sums EA[i] + EB[j] for a block of i and all j
+        S = (EA[i:i+step, None, :] + EB[None, :, :]) % G
+        idx = np.ravel_multi_index(tuple(S.reshape(-1, len(shape)).T), shape)
+        np.add.at(C, idx, (wA[i:i+step, None]*wB[None, :]).reshape(-1))
+    return C.reshape(shape)
+
+
+def _round(R, exact, redo):
+    C = np.rint(R)
+    if np.abs(R-C).max(initial=0) > ROUND_TOL:
+        if exact is None:
+            return redo()
+        raise ArithmeticError('FFT result is not close to an integer')
+    return C.astype(np.int64)
+
+
+# coefficient array of A*B, as integers
+def convolve(A, B, exact=None):
+    A = np.asarray(A)
+    B = np.asarray(B)
+    if A.shape != B.shape:
+        raise ValueError(f'arrays have different shapes {A.shape} and {B.shape}')
+    if exact:
+        return _convolve_exact(A, B)
+    R = np.fft.ifftn(np.fft.fftn(A)*np.fft.fftn(B)).real
+    return _round(R, exact, lambda: _convolve_exact(A, B))
+
+
+# coefficient array of A*A^(-1), as integers
+def autocorrelation(A, exact=None):
+    A = np.asarray(A)
+    if exact:
+        return _convolve_exact(A, conjugate(A))
+    F = np.fft.fftn(A)
+    R = np.fft.ifftn(F*np.conj(F)).real
+    return _round(R, exact, lambda: _convolve_exact(A, conjugate(A)))
+
+
+# does C have k at the identity and lam everywhere else?
+def is_constant_off_identity(C, k, lam):
+    zero = (0,)*C.ndim
+    if C[zero] != k:
+        return False
+    C = C.reshape(-1)
+    return bool((C[1:] == lam).all())
+
+
+# is S a (v,k,lam) difference set in the group with shape G?
+def is_difference_set(v, k, lam, G, S, exact=None):
+    if group_order(G) != v or len(S) != k:
+        return False
+    A = indicator(G, S)
+    if A.max(initial=0) > 1:
+        return False
+    return is_constant_off_identity(autocorrelation(A, exact), k, lam)
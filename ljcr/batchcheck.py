@@ -0,0 +1,156 @@
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from ljcr.autocorr import group_order, indicator, ROUND_TOL
+from ljcr.names import parse_name
+from ljcr.ntt import autocorrelation_ntt
+
+# Check every stored set in ds.json, cwm.json and sds.json at once.
+#
+# Sets are grouped by the shape of the group they live in (the G_rep if there
+# is one, else G), and the sets of one shape are stacked into one array with a
+# row per set, so a single batched FFT gives the autocorrelation of all of them.
+# Shapes are spread over a process pool.  Each set is checked against
+#     DS(v,k,lam):   0/1 coefficients, k at the identity, lam elsewhere
+#     SDS(v,k,lam):  |P|+|N| = k, 0/+-1 coefficients, k at the identity, lam elsewhere
+#     CW(n,s):       |P|+|N| = s^2, 0/+-1 coefficients, s^2 at the identity, 0 elsewhere
+#
+# The report lists every set that fails, marking those whose entry has status
+# "All" or "Yes", since for those the stored status is contradicted.
+
+DATASETS = {'ds': 'diffsets/ds.json', 'cwm': 'cwm/cwm.json', 'sds': 'signed_diffsets/sds.json'}
+
+# size of the stacked arrays transformed at once
+CHUNK = 1 << 24
+
+
+# one item per stored set: (dataset, name, set index, shape, k, lam, P, N)
+# for a DS the set is P and N is empty
+def collect_items(dataset, data):
+    items = []
+    for name, entry in data.items():
+        kind, params = parse_name(name)
+        if kind == 'CW':
+            n, s = params
+            shape, k, lam = (n,), s*s, 0
+        else:
+            v, k, lam, G = params
+            shape = tuple(entry.get('G_rep', G))
+        for i, S in enumerate(entry.get('sets', [])):
+            if kind == 'DS':
+                P, N = S, []
+            else:
+                P, N = S[0], S[1]
+            items += [(dataset, name, i, shape, k, lam, P, N)]
+    return items
+
+
+def _failure(item, reason):
+    return {'dataset': item[0], 'name': item[1], 'set': item[2], 'reason': reason}
+
+
+# check items that all have the same shape; returns a list of failures
+def check_shape(shape, items):
+    failures = []
+    order = group_order(shape)
+    rows = []
+    for item in items:
+        dataset, name, i, shape, k, lam, P, N = item
+        try:
+            A = indicator(shape, P) - indicator(shape, N)
+        except ValueError as e:
+            failures += [_failure(item, str(e))]
+            continue
+        if np.abs(A).max(initial=0) > 1 or np.count_nonzero(A) != len(P)+len(N):
+            failures += [_failure(item, 'repeated element')]
+        elif len(P)+len(N) != k:
+            failures += [_failure(item, f'|P|+|N| = {len(P)+len(N)}, not {k}')]
+        else:
+            rows += [(item, A)]
+
+    step = max(1, CHUNK//max(1, order))
+    axes = tuple(range(1, len(shape)+1))
+    for c in range(0, len(rows), step):
+        chunk = rows[c:c+step]
+        A = np.stack([R[1] for R in chunk])
+        F = np.fft.fftn(A, axes=axes)
+        X = np.fft.ifftn(F*np.conj(F), axes=axes).real.reshape(len(chunk), -1)
+        C = np.rint(X)
+        k = np.array([R[0][4] for R in chunk], dtype=np.int64)
+        lam = np.array([R[0][5] for R in chunk], dtype=np.int64)
+
+        # rows whose FFT doesn't round cleanly are redone exactly, with an NTT (see ntt.py)
+        unsure = np.abs(X-C).max(axis=1) > ROUND_TOL
+        for j in np.flatnonzero(unsure):
+            C[j] = autocorrelation_ntt(chunk[j][1]).reshape(-1)
+
+        ok = (C[:, 0] == k) & (C[:, 1:] == lam[:, None]).all(axis=1)
+        for j in np.flatnonzero(~ok):
+            bad = np.flatnonzero(C[j, 1:] != lam[j])
+            if C[j, 0] != k[j]:
+                reason = f'{int(C[j, 0])} at the identity, not {k[j]}'
+            else:
+                reason = f'{len(bad)} nonidentity coefficients are not {lam[j]}'
+            failures += [_failure(chunk[j][0], reason)]
+    return failures
+
+
+def _check_task(task):
+    return check_shape(*task)
+
+
+# check every set in the given datasets ({'ds': diffsets, ...}) and return the failures,
+# each a dictionary with keys dataset, name, set, reason and status
+def check_all(datasets, processes=None):
+    buckets = {}
+    for dataset, data in datasets.items():
+        for item in collect_items(dataset, data):
+            buckets.setdefault(item[3], []).append(item)
+
+    # biggest groups first, so they aren't left running alone at the end
+    tasks = sorted(buckets.items(), key=lambda T: -group_order(T[0])*len(T[1]))
+    failures = []
+    if processes == 1:
+        for task in tasks:
+            failures += _check_task(task)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for F in pool.imap_unordered(_check_task, tasks):
+                failures += F
+
+    for F in failures:
+        F['status'] = datasets[F['dataset']][F['name']].get('status')
+    failures.sort(key=lambda F: (F['dataset'], F['name'], F['set']))
+    return failures
+
+
+# the datasets that exist under the repository root
+def load_datasets(root='.'):
+    datasets = {}
+    for dataset, path in DATASETS.items():
+        path = os.path.join(root, path)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                datasets[dataset] = json.load(f)
+    return datasets
+
+
+def print_failures(failures):
+    contradicted = [F for F in failures if F['status'] in ['All', 'Yes']]
+    print(f'{len(failures)} stored sets fail, {len(contradicted)} of them in entries with status "All" or "Yes"')
+    for F in failures:
+        mark = '*' if F in contradicted else ' '
+        print(f'{mark} {F["dataset"]} {F["name"]} set {F["set"]} ({F["status"]}): {F["reason"]}')
+
+
+# python -m ljcr.batchcheck [repository root]
+if __name__ == '__main__':
+    root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    datasets = load_datasets(root)
+    for dataset in datasets:
+        print(f'read {len(datasets[dataset])} {dataset} data items')
+    print_failures(check_all(datasets))
@@ -0,0 +1,208 @@
+import json
+import os
+
+import numpy as np
+
+from ljcr.dataset import file_stamp
+
+# Packed on-disk store for the blocks of covering designs.
+#
+# covers.blk holds the blocks of each covering as one fixed-width array, and
+# covers.blk.json is the header table giving, for each covering name, its
+# parameters and where its array lives in covers.blk.  Arrays are stored in one
+# of two layouts:
+#     "rows": an n x k array of points (1..v), uint8 if v < 256, else uint16
+#     "mask": an n x ceil(v/64) array of uint64 words, bit p-1 set for point p
+# Reading a covering returns a NumPy view over an np.memmap of covers.blk, so
+# nothing is copied or parsed, and a covering opens in milliseconds however
+# large it is.  An open BlockStore rereads the header when covers.blk.json
+# changes, so coverings appended since (append_block_store()) are seen.
+
+STORE_VERSION = 1
+ALIGN = 8
+
+
+def header_path(path):
+    return path + '.json'
+
+
+# (v,k,t) from a name like "C(7,3,2)"
+def cover_params(name):
+    S = name.split('(')[1].split(')')[0].split(',')
+    return int(S[0]), int(S[1]), int(S[2])
+
+
+def rows_dtype(v):
+    if v < 256:
+        return np.uint8
+    return np.uint16
+
+
+def mask_words(v):
+    return (v+63)//64
+
+
+# convert a list of blocks to an n x k array, dropping empty blocks
+def blocks_to_rows(blocks, v, k):
+    blocks = [b for b in blocks if len(b) > 0]
+    for b in blocks:
+        if len(b) != k:
+            raise ValueError(f'block {b} does not have {k} points')
+    rows = np.array(blocks, dtype=rows_dtype(v)).reshape(len(blocks), k)
+    if len(rows) > 0 and (rows.min() < 1 or rows.max() > v):
+        raise ValueError(f'block points must lie in 1..{v}')
+    return rows
+
+
+# v-bit masks of an n x k array of points
+def rows_to_masks(rows, v):
+    rows = np.asarray(rows, dtype=np.int64)
+    masks = np.zeros((len(rows), mask_words(v)), dtype=np.uint64)
+    if len(rows) == 0:
+        return masks
+    p = rows-1
+    word = p >> 6
+    bit = np.left_shift(np.uint64(1), (p & 63).astype(np.uint64))
+    for j in range(rows.shape[1]):
+        np.bitwise_or.at(masks, (np.arange(len(rows)), word[:, j]), bit[:, j])
+    return masks
+
+
+# n x k array of points from v-bit masks, each with k bits set
+def masks_to_rows(masks, v, k):
+    masks = np.ascontiguousarray(masks, dtype='<u8')
+    bits = np.unpackbits(masks.view(np.uint8).reshape(len(masks), 8*masks.shape[1]), axis=1, bitorder='little')[:, :v]
+    n, p = np.nonzero(bits)
+    if len(p) != len(masks)*k:
+        raise ValueError(f'masks do not all have {k} bits set')
+    return (p+1).astype(rows_dtype(v)).reshape(len(masks), k)
+
+
+def _pad(f):
+    pos = f.tell()
+    if pos % ALIGN:
+        f.write(b'\0' * (ALIGN - pos % ALIGN))
+    return f.tell()
+
+
+# append one covering to an open data file, returning its header entry
+def _write_entry(f, name, blocks, layout):
+    v, k, t = cover_params(name)
+    rows = blocks_to_rows(blocks, v, k)
+    if layout == 'rows':
+        A = rows
+    elif layout == 'mask':
+        A = rows_to_masks(rows, v)
+    else:
+        raise ValueError(f'unknown layout {layout}')
+    offset = _pad(f)
+    f.write(np.ascontiguousarray(A).tobytes())
+    return {'v': v, 'k': k, 't': t, 'layout': layout, 'dtype': A.dtype.str,
+            'offset': offset, 'shape': list(A.shape)}
+
+
+def _save_header(header, path):
+    tmp = header_path(path) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(header, f)
+    os.replace(tmp, header_path(path))
+
+
+# write every covering in covers (a dictionary, or load_covers() view) to path
+# entries are read one at a time, so covers.json never has to be held in memory
+def write_block_store(covers, path='covers.blk', layout='rows'):
+    header = {'version': STORE_VERSION, 'entries': {}}
+    with open(path, 'wb') as f:
+        for name in covers:
+            header['entries'][name] = _write_entry(f, name, covers[name], layout)
+    _save_header(header, path)
+    return header
+
+
+# add or replace coverings in an existing store without rewriting it:
+# new arrays go at the end of the data file and the header table is updated
+def append_block_store(path, new_covers, layout='rows'):
+    header = read_header(path)
+    with open(path, 'ab') as f:
+        for name in new_covers:
+            header['entries'][name] = _write_entry(f, name, new_covers[name], layout)
+    _save_header(header, path)
+    return header
+
+
+def read_header(path):
+    with open(header_path(path), 'r') as f:
+        header = json.load(f)
+    if header.get('version') != STORE_VERSION:
+        raise ValueError(f'{header_path(path)}: unsupported block store version')
+    return header
+
+
+# read-only dictionary-like view of a block store, usable in place of covers
+# store[name] is the n x k array of blocks, a zero-copy view for the "rows" layout;
+# array(name) is the array as stored
+class BlockStore:
+    def __init__(self, path='covers.blk'):
+        self.path = path
+        self._stamp = None
+        self._entries = None
+        self._mm = None
+
+    # the header table, read again (with a new memmap) if the header file has changed
+    @property
+    def entries(self):
+        stamp = file_stamp(header_path(self.path))
+        if stamp != self._stamp:
+            self._entries = read_header(self.path)['entries']
+            self._stamp = stamp
+            self._mm = None
+        return self._entries
+
+    def _data(self):
+        if self._mm is None:
+            if os.path.getsize(self.path) == 0:
+                self._mm = np.zeros(0, dtype=np.uint8)
+            else:
+                self._mm = np.memmap(self.path, dtype=np.uint8, mode='r')
+        return self._mm
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def keys(self):
+        return self.entries.keys()
+
+    def params(self, name):
+        E = self.entries[name]
+        return E['v'], E['k'], E['t']
+
+    def num_blocks(self, name):
+        return self.entries[name]['shape'][0]
+
+    def array(self, name):
+        E = self.entries[name]
+        dtype = np.dtype(E['dtype'])
+        nbytes = int(np.prod(E['shape'])) * dtype.itemsize
+        A = self._data()[E['offset']:E['offset']+nbytes]
+        return A.view(dtype).reshape(E['shape'])
+
+    def rows(self, name):
+        E = self.entries[name]
+        if E['layout'] == 'rows':
+            return self.array(name)
+        return masks_to_rows(self.array(name), E['v'], E['k'])
+
+    def masks(self, name):
+        E = self.entries[name]
+        if E['layout'] == 'mask':
+            return self.array(name)
+        return rows_to_masks(self.array(name), E['v'])
+
+    def __getitem__(self, name):
+        return self.rows(name)
@@ -0,0 +1,148 @@
+import numpy as np
+
+from ljcr import multipliers
+from ljcr.autocorr import elements, group_order
+from ljcr.names import parse_name
+
+# Canonical forms of sets in finite abelian groups, up to translation and
+# multiplication by units.
+#
+# For a group G of shape [n_1,...,n_r] with exponent e = lcm(n_i), the maps
+#     x -> u*x + g,    u a unit mod e, g in G
+# send difference sets to difference sets with the same parameters (for cyclic
+# G these are all the affine automorphisms).  Elements are encoded as integers
+# 0 <= x < |G| (their index in an array of shape G), and the canonical form of
+# a set S is the lexicographically smallest sorted image of S under these maps.
+# Two sets are equivalent under the maps exactly when their canonical forms are
+# equal, so equivalence classes are found by hashing canonical forms.
+#
+# The smallest image contains 0, so only the translations taking some u*s to 0
+# need to be tried: the candidates for all units in a chunk and all s in S are
+# built as one array, those with the smallest second element are sorted along
+# rows, and the smallest row is picked out a column at a time.  For a signed set P - N, the image of P is followed by the
+# image of N, and the translations taking an element of P to 0 are tried.
+
+# number of candidate elements built at once
+CHUNK = 1 << 22
+
+
+# units mod the exponent of G (saved by multipliers.py)
+def units(G):
+    e = int(np.lcm.reduce(np.asarray(G, dtype=np.int64)))
+    return multipliers.units(e).astype(np.int64)
+
+
+# the lexicographically smallest row of R
+def _lexmin(R):
+    I = np.arange(len(R))
+    for j in range(R.shape[1]):
+        col = R[I, j]
+        I = I[col == col.min()]
+        if len(I) == 1:
+            break
+    return R[I[0]]
+
+
+# canonical form of P - N (N may be empty) as a sorted integer array:
+# the encoded image of P followed by the encoded image of N
+def canonical_form(G, P, N=()):
+    G = tuple(int(n) for n in G)
+    EP = elements(G, P)
+    EN = elements(G, N)
+    if len(EP) == 0:
+        EP, EN = EN, EP
+    if len(EP) == 0:
+        return np.zeros(0, dtype=np.int64)
+    E = np.concatenate([EP, EN])
+    m = len(EP)
+    shape = np.array(G, dtype=np.int64)
+
+    U = units(G)
+    step = max(1, CHUNK//(len(E)*m*len(G)))
+    best = None
+    for i in range(0, len(U), step):
+        UE = (U[i:i+step, None, None]*E[None, :, :]) % shape     # units x elements x r
+        # candidate c, j: the image under u, translated to take u*p_j to 0
+        C = (UE[:, None, :, :] - UE[:, :m, None, :]) % shape
+        C = np.ravel_multi_index(tuple(np.moveaxis(C, -1, 0)), G)
+        C = C.reshape(-1, len(E))
+        # sorting is the slow part, so first keep the rows whose P part has the
+        # smallest nonzero element (the second entry of the sorted row)
+        if m > 1:
+            second = np.where(C[:, :m] == 0, group_order(G), C[:, :m]).min(axis=1)
+            C = C[second == second.min()]
+        C = np.concatenate([np.sort(C[:, :m], axis=1), np.sort(C[:, m:], axis=1)], axis=1)
+        if best is not None:
+            C = np.concatenate([best[None, :], C])
+        best = _lexmin(C)
+    return best
+
+
+# hashable canonical form
+def canonical_key(G, P, N=()):
+    return tuple(canonical_form(G, P, N).tolist())
+
+
+# the canonical form as a set in the format of the datasets: integers for a
+# cyclic group, lists of coordinates otherwise
+def canonical_set(G, S):
+    F = canonical_form(G, S)
+    if len(G) == 1:
+        return F.tolist()
+    return np.array(np.unravel_index(F, tuple(G))).T.tolist()
+
+
+def equivalent(G, S, T):
+    return len(S) == len(T) and canonical_key(G, S) == canonical_key(G, T)
+
+
+# split a list of sets into equivalence classes; returns a list of classes, each a
+# list of indices into sets, in order of first appearance
+def equivalence_classes(G, sets, signed=False):
+    classes = {}
+    for i, S in enumerate(sets):
+        key = canonical_key(G, S[0], S[1]) if signed else canonical_key(G, S)
+        classes.setdefault(key, []).append(i)
+    return list(classes.values())
+
+
+# the sets with the repeated members of each class removed
+def dedup(G, sets, signed=False):
+    return [sets[C[0]] for C in equivalence_classes(G, sets, signed)]
+
+
+# index of a whole dataset (e.g. ds.json): maps (name, canonical form) to the list of
+# indices of the sets of that name with that form.  sets are taken in their G_rep
+# if the entry has one
+class CanonicalIndex:
+    def __init__(self, data):
+        self.index = {}
+        for name, entry in data.items():
+            kind, P = parse_name(name)
+            if kind not in ('DS', 'SDS') or 'sets' not in entry:
+                continue
+            G = entry.get('G_rep', P[3])
+            for i, S in enumerate(entry['sets']):
+                key = canonical_key(G, S[0], S[1]) if kind == 'SDS' else canonical_key(G, S)
+                self.index.setdefault((name, key), []).append(i)
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, name, G, S):
+        return self.index.get((name, canonical_key(G, S)), [])
+
+    # the number of inequivalent sets of each name
+    def counts(self):
+        N = {}
+        for name, key in self.index:
+            N[name] = N.get(name, 0) + 1
+        return N
+
+    # {name: [list of indices of equivalent sets]} for the names with repeated sets
+    def duplicates(self):
+        D = {}
+        for (name, key), I in self.index.items():
+            if len(I) > 1:
+                D.setdefault(name, []).append(I)
+        return D
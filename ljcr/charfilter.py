@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+
+from ljcr.autocorr import indicator, ROUND_TOL
+from ljcr.names import parse_name
+
+# Character-sum tests for difference sets and signed difference sets.
+#
+# If A = P - N (N empty for a DS) is a (v,k,lam) DS or SDS in G, then for every
+# character chi of G
+#     chi(A) conj(chi(A)) = k - lam            (chi nontrivial)
+#     chi(A)^2 = k + lam*(v-1)                 (chi trivial)
+#
+# For candidate sets, all characters are evaluated at once: the characters of
+# G = Z_{n_1} x ... x Z_{n_r} evaluated at A are the entries of the FFT of the
+# coefficient array of A, so a stack of candidates is one batched FFT.
+#
+# For parameters, without any sets, the tests are
+#     trivial character: k + lam*(v-1) = a^2 with a = k mod 2 (a = |P| - |N|);
+#         for a DS also k(k-1) = lam*(v-1)
+#     self-conjugacy (Turyn): let chi have order m, n = k - lam, and p a prime
+#         dividing n.  If p^j = -1 mod the p-free part of m for some j, each prime
+#         ideal over p in Z[zeta_m] is fixed by complex conjugation, so from
+#         chi(A) conj(chi(A)) = n, e*v_p(n) is even, e = phi(p^(v_p(m))) being the
+#         ramification index.  (For m = 2 this says n is a square.)
+# A character of order m exists exactly when m divides the exponent of G.
+
+# test names, as given in reports
+TRIVIAL = 'trivial character'
+SELF_CONJUGATE = 'self-conjugacy'
+
+
+# |chi(A)|^2 for every character, for a stack of candidate sets in the group with shape G:
+# sets is a list of sets, or of [P, N] pairs if signed; returns an array of shape (len(sets),)+G
+def character_norms(G, sets, signed=False):
+    G = tuple(G)
+    if len(sets) == 0:
+        return np.zeros((0,)+G)
+    if signed:
+        A = np.stack([indicator(G, P) - indicator(G, N) for P, N in sets])
+    else:
+        A = np.stack([indicator(G, S) for S in sets])
+    F = np.fft.fftn(A, axes=tuple(range(1, len(G)+1)))
+    return (F*np.conj(F)).real
+
+
+# which candidate sets pass the character tests (a boolean array)
+def character_check(v, k, lam, G, sets, signed=False):
+    X = character_norms(G, sets, signed).reshape(len(sets), -1)
+    ok = np.abs(X[:, 0] - (k + lam*(v-1))) <= ROUND_TOL
+    ok &= (np.abs(X[:, 1:] - (k - lam)) <= ROUND_TOL).all(axis=1)
+    return ok
+
+
+def _factor(n):
+    F = {}
+    p = 2
+    while p*p <= n:
+        while n % p == 0:
+            F[p] = F.get(p, 0) + 1
+            n //= p
+        p += 1
+    if n > 1:
+        F[n] = F.get(n, 0) + 1
+    return F
+
+
+def _divisors(n):
+    return [d for d in range(1, n+1) if n % d == 0]
+
+
+def exponent(G):
+    return int(np.lcm.reduce(np.asarray(G, dtype=np.int64)))
+
+
+# is p^j = -1 mod m for some j?
+def self_conjugate(p, m):
+    if m <= 2:
+        return True
+    x = p % m
+    seen = set()
+    while x not in seen:
+        if x == m-1:
+            return True
+        seen.add(x)
+        x = (x*p) % m
+    return False
+
+
+# the first test failed by the parameters, as a string, or None if they pass
+def feasibility(v, k, lam, G, kind='SDS'):
+    a2 = k + lam*(v-1)
+    a = int(np.sqrt(max(a2, 0)))
+    while a*a > a2:
+        a -= 1
+    while (a+1)*(a+1) <= a2:
+        a += 1
+    if a*a != a2 or (a-k) % 2 != 0:
+        return f'{TRIVIAL}: k + lam*(v-1) = {a2}'
+    if kind == 'DS' and k*(k-1) != lam*(v-1):
+        return f'{TRIVIAL}: k(k-1) != lam(v-1)'
+
+    n = k - lam
+    if n <= 0:
+        return None
+    primes = _factor(n)
+    for m in _divisors(exponent(G))[1:]:
+        for p, e in primes.items():
+            f = 0
+            mp = m
+            while mp % p == 0:
+                mp //= p
+                f += 1
+            ram = (p-1)*p**(f-1) if f > 0 else 1
+            if (ram*e) % 2 == 1 and self_conjugate(p, mp):
+                return f'{SELF_CONJUGATE}: {p}^{e} || {n}, character of order {m}'
+    return None
+
+
+# run feasibility() on the DS or SDS entries of data with the given statuses.  returns a list
+# of {'name', 'status', 'reason', 'seconds'}, with reason None for those not eliminated
+def prefilter(data, statuses=('Open',)):
+    report = []
+    for name, entry in data.items():
+        if statuses is not None and entry.get('status') not in statuses:
+            continue
+        kind, P = parse_name(name)
+        if kind not in ('DS', 'SDS'):
+            continue
+        t = time.perf_counter()
+        reason = feasibility(*P, kind=kind)
+        report += [{'name': name, 'status': entry.get('status'), 'reason': reason,
+                    'seconds': time.perf_counter()-t}]
+    return report
+
+
+def print_prefilter(report):
+    eliminated = [R for R in report if R['reason'] is not None]
+    contradicted = [R for R in eliminated if R['status'] in ['All', 'Yes']]
+    total = sum(R['seconds'] for R in report)
+    print(f'{len(report)} entries checked in {total:.3f}s, {len(eliminated)} eliminated')
+    for R in eliminated:
+        mark = '*' if R in contradicted else ' '
+        print(f'{mark} {R["name"]} ({R["status"]}): {R["reason"]} [{1000*R["seconds"]:.2f}ms]')
+    if len(contradicted) > 0:
+        print(f'error: {len(contradicted)} entries with status "All" or "Yes" eliminated')
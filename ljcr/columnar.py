@@ -0,0 +1,380 @@
+import json
+import os
+
+import numpy as np
+
+from ljcr.names import parse_name
+
+# Columnar copies of the datasets, for reading whole datasets as arrays.
+#
+# The JSON files key each entry by a name encoding its parameters
+# ("SDS(89,12,1,[89])"), so every reader has to parse the names again.  Here a
+# dataset is a set of tables, each a dictionary of equal-length NumPy columns:
+#     entries    one row per name: the parameters as integer columns, status and
+#                comment as codes into the status_values and comment_values tables
+#     G, G_rep   (DS, SDS) the group shapes, concatenated
+#     sets       one row per stored set: n_pos and n_neg, the sizes of P and N
+#     elements   the elements of every set, P then N, as indices into the shape
+#                (G_rep if there is one, else G) in row-major order, reduced mod
+#                the shape (so to_dict() gives 0 for an element stored as n in Z_n)
+# and for coverings (coverdata.json, with the blocks of covers.json if given)
+#     entries    v, k, t, size, low_bd, n_imps, n_points
+#     imps       one row per improvement: size, method and creator codes, date
+#     blocks     the points of every covering, k to a block (n_points = size*k
+#                if the blocks were included, 0 if not)
+# A ragged child table is tied to its parent by a count column in the parent
+# (RAGGED), and offsets() turns the counts into offsets, so the sets of entry i
+# are rows offsets('sets')[i]:offsets('sets')[i+1] of sets.  Codes of -1 mean
+# the field was missing.
+#
+# write_columns() saves the tables as Parquet files (a directory with a file for
+# each table) if pyarrow is installed, otherwise as one NumPy .npz file, and
+# read_columns() reads either back.  Both check the tables against SCHEMAS.
+
+COLUMNS_VERSION = 1
+
+_SETS = {'sets': {'n_pos': 'int64', 'n_neg': 'int64'},
+         'elements': {'element': 'int64'},
+         'status_values': {'value': 'str'},
+         'comment_values': {'value': 'str'}}
+
+SCHEMAS = {
+    'CW': dict(entries={'name': 'str', 'n': 'int64', 's': 'int64', 'status': 'int32',
+                        'comment': 'int32', 'n_sets': 'int64'}, **_SETS),
+    'DS': dict(entries={'name': 'str', 'v': 'int64', 'k': 'int64', 'lam': 'int64', 'n_G': 'int64',
+                        'n_G_rep': 'int64', 'status': 'int32', 'comment': 'int32', 'n_sets': 'int64'},
+               G={'order': 'int64'}, G_rep={'order': 'int64'}, **_SETS),
+    'C': {'entries': {'name': 'str', 'v': 'int64', 'k': 'int64', 't': 'int64', 'size': 'int64',
+                      'low_bd': 'int64', 'n_imps': 'int64', 'n_points': 'int64'},
+          'imps': {'size': 'int64', 'method': 'int32', 'creator': 'int32', 'date': 'str'},
+          'blocks': {'point': 'int64'},
+          'method_values': {'value': 'str'},
+          'creator_values': {'value': 'str'}},
+}
+SCHEMAS['SDS'] = SCHEMAS['DS']
+
+# child table -> (parent table, count columns summed to give the rows of each parent row)
+RAGGED = {
+    'CW': {'sets': ('entries', ['n_sets']), 'elements': ('sets', ['n_pos', 'n_neg'])},
+    'DS': {'G': ('entries', ['n_G']), 'G_rep': ('entries', ['n_G_rep']),
+           'sets': ('entries', ['n_sets']), 'elements': ('sets', ['n_pos', 'n_neg'])},
+    'C': {'imps': ('entries', ['n_imps']), 'blocks': ('entries', ['n_points'])},
+}
+RAGGED['SDS'] = RAGGED['DS']
+
+# code columns -> the table of values they index
+CODES = {'status': 'status_values', 'comment': 'comment_values',
+         'method': 'method_values', 'creator': 'creator_values'}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+# codes for a list of strings (None for missing), and the values they index
+def _encode_values(S):
+    values = sorted(set(x for x in S if x is not None))
+    code = {x: i for i, x in enumerate(values)}
+    return (np.array([code.get(x, -1) for x in S], dtype=np.int32),
+            np.array(values, dtype=str).reshape(-1))
+
+
+def _column(x, dtype):
+    if dtype == 'str':
+        return np.array(x, dtype=str).reshape(-1)
+    return np.asarray(x, dtype=dtype).reshape(-1)
+
+
+# raise ValueError unless tables follow the schema for kind
+def validate(kind, tables):
+    if kind not in SCHEMAS:
+        raise ValueError(f'unknown kind {kind}')
+    for table, columns in SCHEMAS[kind].items():
+        if table not in tables:
+            raise ValueError(f'{kind}: missing table {table}')
+        T = tables[table]
+        length = None
+        for column, dtype in columns.items():
+            if column not in T:
+                raise ValueError(f'{kind}: missing column {table}.{column}')
+            x = T[column]
+            ok = x.dtype.kind == 'U' if dtype == 'str' else x.dtype == np.dtype(dtype)
+            if not ok or x.ndim != 1:
+                raise ValueError(f'{kind}: column {table}.{column} is {x.dtype}{list(x.shape)}, not {dtype}')
+            if length is not None and len(x) != length:
+                raise ValueError(f'{kind}: columns of {table} have different lengths')
+            length = len(x)
+    for child, (parent, counts) in RAGGED[kind].items():
+        n = sum(tables[parent][c] for c in counts)
+        if (n < 0).any():
+            raise ValueError(f'{kind}: negative counts in {parent}.{"+".join(counts)}')
+        if int(n.sum()) != len(tables[child][next(iter(SCHEMAS[kind][child]))]):
+            raise ValueError(f'{kind}: {parent}.{"+".join(counts)} does not add up to the rows of {child}')
+    for table, columns in SCHEMAS[kind].items():
+        for column in columns:
+            if column in CODES and CODES[column] in tables:
+                x = tables[table][column]
+                if len(x) > 0 and (x.min() < -1 or x.max() >= len(tables[CODES[column]]['value'])):
+                    raise ValueError(f'{kind}: codes in {table}.{column} out of range')
+
+
+class Columns:
+    def __init__(self, kind, tables):
+        validate(kind, tables)
+        self.kind = kind
+        self.tables = tables
+        self._offsets = {}
+        self._index = None
+
+    def __len__(self):
+        return len(self.tables['entries']['name'])
+
+    def column(self, table, column):
+        return self.tables[table][column]
+
+    # the parameter and count columns of the entries, e.g. C['v']
+    def __getitem__(self, column):
+        return self.tables['entries'][column]
+
+    # row of each name in entries
+    def index(self, name):
+        if self._index is None:
+            self._index = {x: i for i, x in enumerate(self.tables['entries']['name'].tolist())}
+        return self._index[name]
+
+    # offsets into child for each row of its parent table, one more than the parent's rows
+    def offsets(self, child):
+        if child not in self._offsets:
+            parent, counts = RAGGED[self.kind][child]
+            n = sum(self.tables[parent][c] for c in counts)
+            self._offsets[child] = np.concatenate([[0], np.cumsum(n)]).astype(np.int64)
+        return self._offsets[child]
+
+    # rows of child belonging to row i of its parent, as a slice
+    def rows(self, child, i):
+        O = self.offsets(child)
+        return slice(int(O[i]), int(O[i+1]))
+
+    # strings of a code column (status, comment, method, creator), None where missing
+    def values(self, table, column):
+        V = np.array(self.tables[CODES[column]]['value'].tolist() + [None], dtype=object)
+        return V[self.tables[table][column]]
+
+    def shape(self, i):
+        if self.kind == 'CW':
+            return (int(self['n'][i]),)
+        G = self.tables['G_rep']['order'][self.rows('G_rep', i)]
+        if len(G) == 0:
+            G = self.tables['G']['order'][self.rows('G', i)]
+        return tuple(int(x) for x in G)
+
+    # the sets of entry i as in the JSON file: lists of elements for a DS, [P, N] pairs otherwise
+    def sets(self, i):
+        shape = self.shape(i)
+        S = self.rows('sets', i)
+        n_pos = self.tables['sets']['n_pos'][S]
+        n_neg = self.tables['sets']['n_neg'][S]
+        O = self.offsets('elements')[S.start:S.stop+1]
+        E = self.tables['elements']['element'][O[0]:O[-1]]
+        if len(shape) == 1:
+            E = E.tolist()
+        else:
+            E = np.stack(np.unravel_index(E, shape), axis=1).tolist()
+        sets = []
+        for j in range(len(n_pos)):
+            a = int(O[j]-O[0])
+            b = a + int(n_pos[j])
+            c = b + int(n_neg[j])
+            sets += [E[a:b] if self.kind == 'DS' else [E[a:b], E[b:c]]]
+        return sets
+
+    # the dataset as the dictionary in its JSON file (for coverings, coverdata.json)
+    def to_dict(self):
+        if self.kind == 'C':
+            return self._cover_dict()
+        status = self.values('entries', 'status')
+        comment = self.values('entries', 'comment')
+        data = {}
+        for i, name in enumerate(self['name'].tolist()):
+            entry = {}
+            if status[i] is not None:
+                entry['status'] = status[i]
+            if comment[i] is not None:
+                entry['comment'] = comment[i]
+            if self.kind != 'CW' and self['n_G_rep'][i] > 0:
+                entry['G_rep'] = self.tables['G_rep']['order'][self.rows('G_rep', i)].tolist()
+            if self['n_sets'][i] > 0:
+                entry['sets'] = self.sets(i)
+            data[name] = entry
+        return data
+
+    def _cover_dict(self):
+        method = self.values('imps', 'method')
+        creator = self.values('imps', 'creator')
+        imps = self.tables['imps']
+        data = {}
+        for i, name in enumerate(self['name'].tolist()):
+            S = self.rows('imps', i)
+            data[name] = {'size': int(self['size'][i]), 'low_bd': int(self['low_bd'][i]),
+                          'imps': [[int(imps['size'][j]), method[j], creator[j], str(imps['date'][j])]
+                                   for j in range(S.start, S.stop)]}
+        return data
+
+    # the blocks of entry i as a size x k array, or None if they weren't included
+    def blocks(self, i):
+        if self['n_points'][i] == 0:
+            return None
+        return self.tables['blocks']['point'][self.rows('blocks', i)].reshape(-1, int(self['k'][i]))
+
+
+# columns for ds.json, sds.json or cwm.json (kind is read from the names if not given)
+def dataset_columns(data, kind=None):
+    names = list(data)
+    parsed = [parse_name(name) for name in names]
+    if kind is None:
+        kind = parsed[0][0] if len(parsed) > 0 else 'DS'
+    if any(K != kind for K, P in parsed):
+        raise ValueError(f'names in the dataset are not all {kind}')
+
+    entries = {'name': _column(names, 'str')}
+    entries['status'], status_values = _encode_values([data[x].get('status') for x in names])
+    entries['comment'], comment_values = _encode_values([data[x].get('comment') for x in names])
+    n_sets = []
+    n_pos = []
+    n_neg = []
+    elements = []
+    G_all = []
+    G_rep_all = []
+    for name, (K, P) in zip(names, parsed):
+        entry = data[name]
+        if kind == 'CW':
+            shape = (P[0],)
+        else:
+            G_all += [list(P[3])]
+            G_rep_all += [list(entry.get('G_rep', []))]
+            shape = tuple(entry.get('G_rep', P[3]))
+        sets = entry.get('sets', [])
+        n_sets += [len(sets)]
+        for S in sets:
+            PN = [S, []] if kind == 'DS' else S
+            for X in PN:
+                E = np.array(X, dtype=np.int64).reshape(len(X), len(shape)) % np.array(shape, dtype=np.int64)
+                elements += [np.ravel_multi_index(E.T, shape)]
+            n_pos += [len(PN[0])]
+            n_neg += [len(PN[1])]
+
+    P = np.array([P if kind == 'CW' else P[:3] for K, P in parsed], dtype=np.int64).reshape(len(names), -1)
+    for j, column in enumerate(['n', 's'] if kind == 'CW' else ['v', 'k', 'lam']):
+        entries[column] = P[:, j].copy()
+    entries['n_sets'] = _column(n_sets, 'int64')
+    tables = {'entries': entries,
+              'sets': {'n_pos': _column(n_pos, 'int64'), 'n_neg': _column(n_neg, 'int64')},
+              'elements': {'element': _column(np.concatenate(elements + [np.zeros(0, dtype=np.int64)]), 'int64')},
+              'status_values': {'value': status_values},
+              'comment_values': {'value': comment_values}}
+    if kind != 'CW':
+        entries['n_G'] = _column([len(G) for G in G_all], 'int64')
+        entries['n_G_rep'] = _column([len(G) for G in G_rep_all], 'int64')
+        tables['G'] = {'order': _column(sum(G_all, []), 'int64')}
+        tables['G_rep'] = {'order': _column(sum(G_rep_all, []), 'int64')}
+    return Columns(kind, tables)
+
+
+# columns for coverdata, with the blocks of each covering from covers (a dictionary,
+# or an IndexedJson or BlockStore) if given
+def cover_columns(coverdata, covers=None):
+    names = list(coverdata)
+    P = np.array([parse_name(name)[1] for name in names], dtype=np.int64).reshape(len(names), 3)
+    entries = {'name': _column(names, 'str'), 'v': P[:, 0].copy(), 'k': P[:, 1].copy(), 't': P[:, 2].copy(),
+               'size': _column([coverdata[x]['size'] for x in names], 'int64'),
+               'low_bd': _column([coverdata[x]['low_bd'] for x in names], 'int64')}
+    imps = [I for x in names for I in coverdata[x].get('imps', [])]
+    entries['n_imps'] = _column([len(coverdata[x].get('imps', [])) for x in names], 'int64')
+    method, method_values = _encode_values([I[1] for I in imps])
+    creator, creator_values = _encode_values([I[2] for I in imps])
+
+    points = []
+    n_points = []
+    for name in names:
+        if covers is None or name not in covers:
+            n_points += [0]
+            continue
+        B = np.asarray(covers[name], dtype=np.int64).reshape(-1)
+        points += [B]
+        n_points += [len(B)]
+    entries['n_points'] = _column(n_points, 'int64')
+    tables = {'entries': entries,
+              'imps': {'size': _column([I[0] for I in imps], 'int64'), 'method': method,
+                       'creator': creator, 'date': _column([I[3] for I in imps], 'str')},
+              'blocks': {'point': _column(np.concatenate(points + [np.zeros(0, dtype=np.int64)]), 'int64')},
+              'method_values': {'value': method_values},
+              'creator_values': {'value': creator_values}}
+    return Columns('C', tables)
+
+
+# save columns to path: a directory of Parquet files if pyarrow is installed (or
+# fmt='parquet'), else (or with fmt='npz') one .npz file.  returns the format used
+def write_columns(C, path, fmt=None):
+    validate(C.kind, C.tables)
+    if fmt is None:
+        fmt = 'parquet' if _pyarrow() is not None else 'npz'
+    meta = {'version': COLUMNS_VERSION, 'kind': C.kind}
+
+    if fmt == 'npz':
+        arrays = {f'{table}/{column}': x for table, T in C.tables.items() for column, x in T.items()}
+        arrays['meta'] = np.array(json.dumps(meta))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    elif fmt == 'parquet':
+        pa = _pyarrow()
+        if pa is None:
+            raise ImportError('writing Parquet needs pyarrow')
+        os.makedirs(path, exist_ok=True)
+        for table, T in C.tables.items():
+            t = pa.table({column: pa.array(x.tolist(), type=pa.string()) if x.dtype.kind == 'U' else pa.array(x)
+                          for column, x in T.items()})
+            pa.parquet.write_table(t, os.path.join(path, f'{table}.parquet'))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+    else:
+        raise ValueError(f'unknown format {fmt}')
+    return fmt
+
+
+def _check_meta(meta, path):
+    if meta.get('version') != COLUMNS_VERSION:
+        raise ValueError(f'{path}: version {meta.get("version")}, not {COLUMNS_VERSION}')
+    return meta['kind']
+
+
+# read columns saved by write_columns()
+def read_columns(path):
+    if os.path.isdir(path):
+        pa = _pyarrow()
+        if pa is None:
+            raise ImportError('reading Parquet needs pyarrow')
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            kind = _check_meta(json.load(f), path)
+        tables = {}
+        for table, columns in SCHEMAS[kind].items():
+            t = pa.parquet.read_table(os.path.join(path, f'{table}.parquet'))
+            tables[table] = {column: _column(t.column(column).to_pylist(), dtype) if dtype == 'str'
+                             else t.column(column).to_numpy().astype(dtype, copy=False)
+                             for column, dtype in columns.items()}
+        return Columns(kind, tables)
+
+    with np.load(path, allow_pickle=False) as Z:
+        kind = _check_meta(json.loads(str(Z['meta'])), path)
+        tables = {}
+        for key in Z.files:
+            if key != 'meta':
+                table, column = key.split('/', 1)
+                tables.setdefault(table, {})[column] = Z[key]
+    return Columns(kind, tables)
@@ -0,0 +1,131 @@
+import json
+import multiprocessing
+import os
+import time
+
+from ljcr.blockstore import BlockStore, cover_params
+from ljcr.coververify import verify_cover
+from ljcr.jsonindex import IndexedJson
+
+# Re-verify every covering in covers.json (or a covers.blk block store) on a
+# pool of processes.  Each worker opens the file itself and reads only the
+# coverings it is given, so the database is never loaded as a whole.
+#
+# Results are streamed back as each covering finishes, and each is appended as
+# one JSON line to a checkpoint file; running again with the same checkpoint
+# skips every covering already recorded there, so an interrupted run continues
+# where it stopped.
+
+# number of uncovered t-sets kept in each result
+MAX_UNCOVERED = 10
+
+
+def open_covers(path):
+    if path.endswith('.blk'):
+        return BlockStore(path)
+    return IndexedJson(path)
+
+
+_covers = None
+
+
+def _init_worker(path):
+    global _covers
+    _covers = open_covers(path)
+
+
+def _verify_one(name):
+    start = time.time()
+    R = {'name': name}
+    try:
+        v, k, t = cover_params(name)
+        blocks = _covers[name]
+        ok, uncovered = verify_cover(v, k, t, blocks, MAX_UNCOVERED)
+        R['ok'] = bool(ok)
+        R['blocks'] = sum(1 for b in blocks if len(b) > 0)
+        R['uncovered'] = uncovered.tolist()
+    except Exception as e:
+        R['ok'] = False
+        R['error'] = f'{type(e).__name__}: {e}'
+    R['seconds'] = round(time.time()-start, 3)
+    return R
+
+
+# results recorded in a checkpoint file, keyed by covering name
+def read_checkpoint(checkpoint):
+    done = {}
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return done
+    with open(checkpoint, 'r') as f:
+        for line in f:
+            try:
+                R = json.loads(line)
+            except ValueError:
+                continue    # partial last line from an interrupted run
+            done[R['name']] = R
+    return done
+
+
+# verify the coverings in path (all of them, or just names) and yield each result
+# as it finishes; results are a dictionary with keys
+#     name, ok, blocks, uncovered (up to MAX_UNCOVERED t-sets), seconds, and error if
+#     the covering couldn't be read or has malformed blocks
+# coverings already in the checkpoint file are not verified again, or yielded
+def verify_all(path='covers.json', names=None, checkpoint='covers_verify.jsonl', processes=None):
+    done = read_checkpoint(checkpoint)
+    if names is None:
+        names = list(open_covers(path))
+    todo = [name for name in names if name not in done]
+
+    # largest coverings first, so one big one doesn't finish last on its own
+    todo.sort(key=lambda name: -cover_params(name)[0])
+
+    out = None
+    if checkpoint is not None:
+        partial = False
+        if os.path.exists(checkpoint) and os.path.getsize(checkpoint) > 0:
+            with open(checkpoint, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                partial = f.read(1) != b'\n'
+        out = open(checkpoint, 'a')
+        if partial:
+            out.write('\n')    # end a partial line left by an interrupted run
+            out.flush()
+    try:
+        with multiprocessing.Pool(processes, _init_worker, (path,)) as pool:
+            for R in pool.imap_unordered(_verify_one, todo):
+                if out is not None:
+                    out.write(json.dumps(R) + '\n')
+                    out.flush()
+                yield R
+    finally:
+        if out is not None:
+            out.close()
+
+
+# coverings that fail to verify, or whose number of blocks isn't coverdata[name]['size']
+def summary_report(results, coverdata=None):
+    report = {'checked': 0, 'failed': [], 'size_mismatch': []}
+    for R in results:
+        report['checked'] += 1
+        if not R['ok']:
+            report['failed'] += [R]
+        if coverdata is not None and 'blocks' in R:
+            if R['name'] not in coverdata:
+                report['size_mismatch'] += [[R['name'], R['blocks'], None]]
+            elif int(coverdata[R['name']]['size']) != R['blocks']:
+                report['size_mismatch'] += [[R['name'], R['blocks'], int(coverdata[R['name']]['size'])]]
+    return report
+
+
+def print_report(report):
+    print(f'checked {report["checked"]} coverings')
+    print(f'{len(report["failed"])} failed')
+    for R in report['failed']:
+        if 'error' in R:
+            print(f'  {R["name"]}: {R["error"]}')
+        else:
+            print(f'  {R["name"]}: uncovered {R["uncovered"]}')
+    print(f'{len(report["size_mismatch"])} with the wrong number of blocks')
+    for name, blocks, size in report['size_mismatch']:
+        print(f'  {name}: {blocks} blocks, coverdata size {size}')
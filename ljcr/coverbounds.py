@@ -0,0 +1,117 @@
+import numpy as np
+
+from ljcr.names import parse_name
+
+# Lower bounds on covering numbers C(v,k,t), computed for whole arrays of
+# parameters at once.
+#
+# The Schonheim bound comes from C(v,k,t) >= ceil(v/k * C(v-1,k-1,t-1)), which
+# holds with any lower bound in place of C(v-1,k-1,t-1).  So the bounds are
+# built up as a table over all v <= vmax, k <= kmax, t <= tmax, one t at a time
+# (each layer is a vectorized step from the last one), where each entry is the
+# best of
+#     the Schonheim step from the entry for (v-1,k-1,t-1)
+#     Hanani's refinement for t=2: if k-1 divides v-1 and v(v-1)/(k-1) = -1 mod k,
+#         then C(v,k,2) >= ceil(v/k * (v-1)/(k-1)) + 1
+#     a known bound, such as the low_bd entries of coverdata, if one is given
+# and looking up bounds for any number of (v,k,t) is then a single indexing.
+#
+# Each step a*L + b-1 is checked against the int64 range before it is taken:
+# schonheim() then carries on in Python integers (an object array), while
+# BoundTable, whose table has to be int64, raises OverflowError.
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+# whether a*L + b-1 fits in int64 for every entry (L >= 0, b >= 1)
+def _step_fits(a, L, b):
+    return bool((L <= (INT64_MAX - (b-1)) // np.maximum(a, 1)).all())
+
+
+# the plain Schonheim bound, for arrays (or single values) of v, k, t
+def schonheim(v, k, t):
+    v, k, t = np.broadcast_arrays(*(np.asarray(x, dtype=np.int64) for x in (v, k, t)))
+    L = np.ones(v.shape, dtype=np.int64)
+    for j in range(int(t.max(initial=0)), 0, -1):
+        # apply the step for (v-j+1, k-j+1) to those with t >= j
+        m = t >= j
+        a = v[m]-j+1
+        b = k[m]-j+1
+        if L.dtype != object and not _step_fits(a, L[m], np.maximum(b, 1)):
+            L = L.astype(object)
+        if L.dtype == object:
+            a = a.astype(object)
+            b = b.astype(object)
+        L[m] = (a*L[m] + b-1)//b
+    return L
+
+
+def _hanani(v, k, L):
+    ok = (k > 1) & (k < v)
+    r = np.where(ok, (v-1)//np.maximum(k-1, 1), 0)
+    ok &= (v-1) == r*(k-1)
+    ok &= (v*r) % np.maximum(k, 1) == k-1
+    return L + ok
+
+
+class BoundTable:
+    # known is a dictionary from (v,k,t) or covering names to lower bounds, or coverdata
+    def __init__(self, vmax, kmax, tmax, known=None):
+        self.shape = (vmax+1, kmax+1, tmax+1)
+        K = np.zeros(self.shape, dtype=np.int64)
+        if known is not None:
+            for key, lb in known.items():
+                if isinstance(key, str):
+                    key = parse_name(key)[1]
+                if isinstance(lb, dict):
+                    lb = lb['low_bd']
+                v, k, t = key
+                if v <= vmax and k <= kmax and t <= tmax:
+                    K[v, k, t] = int(lb)
+
+        v = np.arange(vmax+1)[:, None]
+        k = np.arange(kmax+1)[None, :]
+        # derived: bound from the recursion; best: also counting the known bounds
+        self.derived = np.zeros(self.shape, dtype=np.int64)
+        self.derived[:, :, 0] = 1
+        self.best = np.maximum(self.derived, K)
+        for t in range(1, tmax+1):
+            prev = np.zeros((vmax+1, kmax+1), dtype=np.int64)
+            prev[1:, 1:] = self.best[:-1, :-1, t-1]
+            kk = np.maximum(k, 1)
+            if not _step_fits(v, prev, kk):
+                raise OverflowError(f'bounds for t = {t} do not fit in 64 bits; use smaller vmax')
+            L = (v*prev + kk-1)//kk
+            if t == 2:
+                L = np.maximum(L, _hanani(v, k, L))
+            # a block of k >= v points covers everything
+            L = np.where(k >= v, 1, L)
+            L = np.where((k < t) | (v < k), 0, L)
+            self.derived[:, :, t] = L
+            self.best[:, :, t] = np.maximum(L, K[:, :, t])
+
+    # lower bounds for arrays (or single values) of v, k, t; with known=False,
+    # the known bound for (v,k,t) itself is left out (but used for smaller parameters)
+    def bound(self, v, k, t, known=True):
+        T = self.best if known else self.derived
+        return T[np.asarray(v), np.asarray(k), np.asarray(t)]
+
+
+# compare coverdata with the computed bounds.  returns lists of
+#     weaker:  [name, stored low_bd, computed bound] where the stored bound is smaller
+#     solved:  [name, size, low_bd] where the computed bound equals the size, but low_bd doesn't
+#     wrong:   [name, size, computed bound] where size is below the computed bound
+def check_coverdata(coverdata):
+    names = list(coverdata)
+    P = np.array([parse_name(C)[1] for C in names], dtype=np.int64).reshape(-1, 3)
+    size = np.array([int(coverdata[C]['size']) for C in names], dtype=np.int64)
+    low = np.array([int(coverdata[C]['low_bd']) for C in names], dtype=np.int64)
+    vmax, kmax, tmax = P.max(axis=0, initial=0)
+    T = BoundTable(vmax, kmax, tmax, coverdata)
+    B = T.bound(P[:, 0], P[:, 1], P[:, 2], known=False)
+
+    report = {}
+    report['weaker'] = [[names[i], int(low[i]), int(B[i])] for i in np.flatnonzero(low < B)]
+    report['solved'] = [[names[i], int(size[i]), int(low[i])] for i in np.flatnonzero((B == size) & (low != size))]
+    report['wrong'] = [[names[i], int(size[i]), int(B[i])] for i in np.flatnonzero(size < B)]
+    return report
@@ -0,0 +1,220 @@
+import itertools
+import multiprocessing
+import time
+from math import comb, exp
+
+import numpy as np
+
+from ljcr.blockstore import blocks_to_rows
+from ljcr.coververify import binom_table, colex_rank, colex_unrank
+
+# Simulated annealing search for smaller covering designs, along the lines of
+# Nurmela and Ostergard's method, which is behind many of the improvements
+# recorded in coverdata.
+#
+# A state is a list of b blocks; its cost is the number of t-sets not covered by
+# any of them.  For each t-set (by colex rank, as in coververify.py) the state
+# keeps the number of blocks containing it.  A move replaces one point x of a
+# block by a point y not in it: only the C(k-1,t-1) t-sets of the block
+# containing x lose a block and only those containing y gain one, so the change
+# in cost is found from 2*C(k-1,t-1) counts rather than a full recheck.
+# As in Nurmela and Ostergard, moves are aimed at a random uncovered t-set T:
+# a block meeting T in t-1 points has a point outside T replaced by the last
+# point of T.
+#
+# Whenever a state reaches cost 0, the block whose removal uncovers the fewest
+# t-sets is dropped and the search continues with b-1 blocks.  The search
+# starts from a given covering (e.g. the one in covers.json) or a greedy one,
+# and independent restarts run on a process pool.
+
+METHOD = 'simulated annealing'
+
+# largest C(v,t) for which the coverage counts are kept in memory: they are int32,
+# so this is up to 1GB (and another 256MB of flags for greedy_cover())
+MAX_TSETS = 1 << 28
+
+
+def _combinations(n, r):
+    if r == 0:
+        return np.zeros((1, 0), dtype=np.int64)
+    return np.array(list(itertools.combinations(range(n), r)), dtype=np.int64).reshape(-1, r)
+
+
+def _check_size(v, t):
+    if comb(v, t) > MAX_TSETS:
+        raise ValueError(f'C({v},{t}) t-sets is too many to search')
+
+
+class CoverState:
+    def __init__(self, v, k, t, rows, rng):
+        _check_size(v, t)
+        self.v = v
+        self.k = k
+        self.t = t
+        self.rng = rng
+        self.B = binom_table(v, t)
+        self.sub = _combinations(k, t)
+        self.sub1 = _combinations(k-1, t-1)
+        self.rows = np.sort(np.asarray(rows, dtype=np.int64), axis=1)
+        self.member = np.zeros((len(self.rows), v), dtype=bool)
+        self.member[np.arange(len(self.rows))[:, None], self.rows] = True
+        self.count = np.zeros(comb(v, t), dtype=np.int32)
+        for row in self.rows:
+            self.count[self._ranks(row)] += 1
+        self.cost = int(np.count_nonzero(self.count == 0))
+        self.uncovered = None
+
+    # ranks of all t-subsets of a sorted block
+    def _ranks(self, row):
+        return colex_rank(row[self.sub], self.B)
+
+    # ranks of the t-subsets of rest+{p} containing p, for a sorted (k-1)-set rest
+    def _ranks_with(self, rest, p):
+        S = np.empty((len(self.sub1), self.t), dtype=np.int64)
+        S[:, :-1] = rest[self.sub1]
+        S[:, -1] = p
+        S.sort(axis=1)
+        return colex_rank(S, self.B)
+
+    # a random uncovered t-set, picked from a saved list of them; the list is only
+    # recomputed when several picks in a row turn out to have been covered since
+    def _random_uncovered(self):
+        for tries in range(2):
+            if self.uncovered is None or len(self.uncovered) == 0:
+                self.uncovered = np.flatnonzero(self.count == 0)
+            for j in range(8):
+                r = int(self.uncovered[self.rng.integers(len(self.uncovered))])
+                if self.count[r] == 0:
+                    return colex_unrank([r], self.v, self.t, self.B)[0]
+            self.uncovered = None
+        return None
+
+    # propose a move (see above), or replace a random point of a random block if
+    # there is nothing to aim at; returns the move and its change in cost
+    def propose(self):
+        T = self._random_uncovered() if self.cost > 0 else None
+        i = None
+        if T is not None:
+            y = int(T[self.rng.integers(self.t)])
+            others = T[T != y]
+            near = np.flatnonzero(self.member[:, others].all(axis=1))
+            if len(near) > 0:
+                i = int(near[self.rng.integers(len(near))])
+                outside = np.flatnonzero(~np.isin(self.rows[i], T))
+                j = int(outside[self.rng.integers(len(outside))])
+        if i is None:
+            i = int(self.rng.integers(len(self.rows)))
+            j = int(self.rng.integers(self.k))
+            y = int(self.rng.integers(self.v))
+            while self.member[i, y]:
+                y = int(self.rng.integers(self.v))
+        rest = np.delete(self.rows[i], j)
+        lost = self._ranks_with(rest, self.rows[i, j])
+        gained = self._ranks_with(rest, y)
+        delta = int(np.count_nonzero(self.count[lost] == 1)) - int(np.count_nonzero(self.count[gained] == 0))
+        return (i, rest, y, lost, gained), delta
+
+    def apply(self, move, delta):
+        i, rest, y, lost, gained = move
+        self.count[lost] -= 1
+        self.count[gained] += 1
+        self.member[i, self.rows[i]] = False
+        self.rows[i] = np.sort(np.append(rest, y))
+        self.member[i, self.rows[i]] = True
+        self.cost += delta
+
+    # drop the block covering the fewest t-sets on its own
+    def drop_block(self):
+        R = colex_rank(self.rows[:, self.sub].reshape(-1, self.t), self.B).reshape(len(self.rows), -1)
+        alone = (self.count[R] == 1).sum(axis=1)
+        i = int(np.argmin(alone))
+        self.count[R[i]] -= 1
+        self.cost += int(alone[i])
+        self.rows = np.delete(self.rows, i, axis=0)
+        self.member = np.delete(self.member, i, axis=0)
+        self.uncovered = None
+
+    def blocks(self):
+        return (self.rows+1).tolist()
+
+
+# a covering built by repeatedly taking an uncovered t-set and adding the k-t points
+# (out of a few random candidates each time) that cover the most new t-sets
+def greedy_cover(v, k, t, rng, candidates=8):
+    _check_size(v, t)
+    B = binom_table(v, t)
+    covered = np.zeros(comb(v, t), dtype=bool)
+    sub = _combinations(k, t)
+    blocks = []
+    r = 0
+    while True:
+        zero = np.flatnonzero(~covered[r:])
+        if len(zero) == 0:
+            break
+        r += int(zero[0])
+        T = colex_unrank([r], v, t, B)[0]
+        best = None
+        for c in range(candidates):
+            others = rng.permutation(np.setdiff1d(np.arange(v), T))[:k-t]
+            row = np.sort(np.concatenate([T, others]))
+            ranks = colex_rank(row[sub], B)
+            gain = int(np.count_nonzero(~covered[ranks]))
+            if best is None or gain > best[0]:
+                best = (gain, row, ranks)
+        covered[best[2]] = True
+        blocks += [(best[1]+1).tolist()]
+    return blocks
+
+
+# anneal from start (a covering, or None for a greedy one), returning the smallest
+# covering found within time_limit seconds.  T0 is the starting temperature, which is
+# multiplied by cooling after every steps moves, and reset whenever a block is dropped
+def anneal_cover(v, k, t, start=None, seed=None, time_limit=60, T0=0.5, cooling=0.99, steps=1000):
+    rng = np.random.default_rng(seed)
+    if start is None:
+        start = greedy_cover(v, k, t, rng)
+    S = CoverState(v, k, t, blocks_to_rows(start, v, k)-1, rng)
+    best = S.blocks() if S.cost == 0 else None
+
+    stop = time.time() + time_limit
+    T = T0
+    moves = 0
+    while time.time() < stop:
+        if S.cost == 0:
+            best = S.blocks()
+            if len(S.rows) <= 1:
+                break
+            S.drop_block()
+            T = T0
+        move, delta = S.propose()
+        if delta <= 0 or rng.random() < exp(-delta/T):
+            S.apply(move, delta)
+        moves += 1
+        if moves % steps == 0:
+            T = max(T*cooling, 1e-3)
+
+    if S.cost == 0:
+        best = S.blocks()
+    return best
+
+
+def _anneal_task(args):
+    return anneal_cover(*args[0], **args[1])
+
+
+# run restarts independent annealing searches on a process pool (seeds seed, seed+1, ...)
+# and return the smallest covering found, or None
+def search_cover(v, k, t, start=None, restarts=None, processes=None, seed=0, **kw):
+    if restarts is None:
+        restarts = processes or multiprocessing.cpu_count()
+    tasks = [((v, k, t, start, seed+i), kw) for i in range(restarts)]
+    if processes == 1:
+        results = [_anneal_task(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_anneal_task, tasks)
+    results = [R for R in results if R is not None]
+    if len(results) == 0:
+        return None
+    return min(results, key=len)
+
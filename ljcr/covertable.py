@@ -0,0 +1,105 @@
+import numpy as np
+
+from ljcr.blockstore import cover_params
+
+# Columnar index over coverdata, for range queries on the parameters.
+#
+# Each field of each C(v,k,t) entry is parsed once into a NumPy array:
+#     v, k, t, size, low_bd (int64), timestamp (datetime64[s], of the last update),
+#     creator, method, timestamp_text, name (object arrays of strings)
+# and queries are vectorized comparisons over the arrays instead of a loop over
+# the dictionary keys.
+#
+# A condition on a column is either a single value, or a range: a range()
+# object, or a pair (lo,hi) meaning lo <= x < hi (as with range, hi=None means no
+# upper bound).  For example
+#     I = CoverIndex(coverdata)
+#     I.table(I.query(v=range(10,25), k=9, t=6))
+
+TABLE_COLUMNS = ['v', 'k', 't', 'size', 'lower bd', 'creator', 'method', 'timestamp']
+
+
+def _to_datetime(S):
+    try:
+        return np.array(S, dtype='datetime64[s]')
+    except ValueError:
+        T = np.empty(len(S), dtype='datetime64[s]')
+        for i, s in enumerate(S):
+            try:
+                T[i] = np.datetime64(s, 's')
+            except ValueError:
+                T[i] = np.datetime64('NaT')
+        return T
+
+
+# boolean mask of x satisfying a condition, as described above
+def match(x, cond):
+    if cond is None:
+        return np.ones(len(x), dtype=bool)
+    if isinstance(cond, range):
+        if cond.step != 1:
+            return np.isin(x, np.array(cond))
+        cond = (cond.start, cond.stop)
+    if isinstance(cond, (tuple, list)):
+        lo, hi = cond
+        m = np.ones(len(x), dtype=bool)
+        if lo is not None:
+            m &= x >= lo
+        if hi is not None:
+            m &= x < hi
+        return m
+    return x == cond
+
+
+class CoverIndex:
+    def __init__(self, coverdata):
+        names = list(coverdata)
+        P = np.array([cover_params(C) for C in names], dtype=np.int64).reshape(-1, 3)
+        last = [coverdata[C]['imps'][0] for C in names]
+
+        self.name = np.array(names, dtype=object)
+        self.v = P[:, 0]
+        self.k = P[:, 1]
+        self.t = P[:, 2]
+        self.size = np.array([int(coverdata[C]['size']) for C in names], dtype=np.int64)
+        self.low_bd = np.array([int(coverdata[C]['low_bd']) for C in names], dtype=np.int64)
+        self.creator = np.array([imp[2] for imp in last], dtype=object)
+        self.method = np.array([imp[1] for imp in last], dtype=object)
+        self.timestamp = _to_datetime([imp[3] for imp in last])
+        self.timestamp_text = np.array([imp[3] for imp in last], dtype=object)
+
+    def __len__(self):
+        return len(self.name)
+
+    # positions of entries satisfying every condition given, sorted by (v,k,t)
+    # updated is a condition on the last update timestamp, e.g. ('2020-01-01',None);
+    # open_only selects entries whose size and lower bound differ
+    def query(self, v=None, k=None, t=None, size=None, low_bd=None, updated=None, open_only=False):
+        m = match(self.v, v) & match(self.k, k) & match(self.t, t)
+        m &= match(self.size, size) & match(self.low_bd, low_bd)
+        if updated is not None:
+            lo, hi = updated
+            updated = (None if lo is None else np.datetime64(lo, 's'),
+                       None if hi is None else np.datetime64(hi, 's'))
+            m &= match(self.timestamp, updated)
+        if open_only:
+            m &= self.size != self.low_bd
+        I = np.flatnonzero(m)
+        return I[np.lexsort((self.t[I], self.k[I], self.v[I]))]
+
+    def names(self, I):
+        return list(self.name[I])
+
+    # table with the same columns as init_tab() in covering_code.py
+    def table(self, I):
+        import pandas as pd
+        T = {}
+        T['v'] = self.v[I]
+        T['k'] = self.k[I]
+        T['t'] = self.t[I]
+        T['size'] = self.size[I]
+        T['lower bd'] = self.low_bd[I]
+        T['creator'] = self.creator[I]
+        T['method'] = self.method[I]
+        T['timestamp'] = self.timestamp_text[I]
+        return pd.DataFrame(T, columns=TABLE_COLUMNS)
@@ -0,0 +1,104 @@
+import itertools
+from math import comb
+
+import numpy as np
+
+from ljcr.blockstore import blocks_to_rows, rows_to_masks
+
+# Verification of covering designs without Sage.
+#
+# Every t-subset {c_1 < ... < c_t} of {0,...,v-1} has colex rank
+#     C(c_1,1) + C(c_2,2) + ... + C(c_t,t),
+# a number in 0..C(v,t)-1.  A bit array indexed by rank records which t-sets
+# are covered; each block marks the ranks of its C(k,t) t-subsets, computed for
+# many blocks at once from a table of binomial coefficients.  Blocks are first
+# encoded as v-bit masks so that repeated blocks are only processed once.
+
+# number of t-subset ranks computed at once
+CHUNK = 1 << 22
+
+_popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+# B[n,j] = C(n,j) for 0 <= n <= v, 0 <= j <= t
+def binom_table(v, t):
+    B = np.zeros((v+1, t+1), dtype=np.int64)
+    for n in range(v+1):
+        for j in range(min(n, t)+1):
+            B[n, j] = comb(n, j)
+    return B
+
+
+# colex ranks of the rows of an m x t array of increasing 0-based points
+def colex_rank(S, B=None):
+    S = np.asarray(S, dtype=np.int64)
+    t = S.shape[1]
+    if B is None:
+        B = binom_table(int(S.max(initial=0))+1, t)
+    r = np.zeros(len(S), dtype=np.int64)
+    for j in range(t):
+        r += B[S[:, j], j+1]
+    return r
+
+
+# m x t array of 0-based t-sets with the given colex ranks
+def colex_unrank(ranks, v, t, B=None):
+    if B is None:
+        B = binom_table(v, t)
+    r = np.array(ranks, dtype=np.int64)
+    S = np.zeros((len(r), t), dtype=np.int64)
+    for j in range(t, 0, -1):
+        # largest c with C(c,j) <= r
+        c = np.searchsorted(B[:, j], r, side='right')-1
+        S[:, j-1] = c
+        r -= B[c, j]
+    return S
+
+
+def count_bits(bits):
+    return int(_popcount[bits].sum())
+
+
+# check that blocks (points 1..v, k per block) cover every t-subset of {1,...,v}
+# returns (True or False, array of uncovered t-sets with points 1..v)
+# at most max_uncovered uncovered t-sets are listed if it is given
+def verify_cover(v, k, t, blocks, max_uncovered=None):
+    total = comb(v, t)
+    rows = np.asarray(blocks_to_rows(blocks, v, k), dtype=np.int64)
+    if len(rows) > 0:
+        rows = np.sort(rows, axis=1)
+        _, first = np.unique(rows_to_masks(rows, v), axis=0, return_index=True)
+        rows = rows[np.sort(first)] - 1
+        if (np.diff(rows, axis=1) == 0).any():
+            raise ValueError('a block has a repeated point')
+
+    bits = np.zeros((total+7)//8, dtype=np.uint8)
+    B = binom_table(v, t)
+    sub = np.array(list(itertools.combinations(range(k), t)), dtype=np.int64).reshape(-1, t)
+    step = max(1, CHUNK//max(1, len(sub)))
+
+    covered = 0
+    marked = 0
+    for i in range(0, len(rows), step):
+        # points of every t-subset of every block in this chunk
+        S = rows[i:i+step][:, sub].reshape(-1, t)
+        r = colex_rank(S, B)
+        np.bitwise_or.at(bits, r >> 3, (1 << (r & 7)).astype(np.uint8))
+
+        # counting is as expensive as marking C(v,t) ranks, so only do it that often
+        marked += len(r)
+        if marked >= total:
+            covered = count_bits(bits)
+            marked = 0
+            if covered == total:
+                break
+
+    if covered != total:
+        covered = count_bits(bits)
+    if covered == total:
+        return True, np.zeros((0, t), dtype=np.int64)
+
+    missing = np.flatnonzero(np.unpackbits(bits, bitorder='little')[:total] == 0)
+    if max_uncovered is not None:
+        missing = missing[:max_uncovered]
+    return False, colex_unrank(missing, v, t, B) + 1
@@ -0,0 +1,80 @@
+import numpy as np
+
+from ljcr.keyindex import params
+
+# Existence table of circulant weighing matrices CW(n,s^2), along the lines of
+# Strassler's table, as a grid with a row for each n and a column for each s.
+#
+# The names and statuses of cwm.json are read into arrays once (CWStatus);
+# a grid for any ranges of n and s is then one scatter into an array of status
+# codes, defaulting to "no entry" for names not in cwm.json.  The grid comes out
+# as a pandas DataFrame of categoricals, which writes itself to CSV or HTML, or
+# as the text table printed by cwm_table().
+
+# table symbols: exists, open, does not exist (or no entry)
+SYMBOLS = ['Y', '*', '.']
+CODES = {'All': 0, 'Yes': 0, 'Open': 1, 'No': 2}
+MISSING = 2
+
+
+# position in values of each x in X (and whether it is there at all)
+def _positions(X, values):
+    V = np.asarray(values, dtype=np.int64)
+    order = np.argsort(V, kind='stable')
+    p = np.minimum(np.searchsorted(V[order], X), len(V)-1)
+    return order[p], V[order[p]] == X
+
+
+class CWStatus:
+    def __init__(self, cwm):
+        names = list(cwm)
+        P = np.array([params(C)[1] for C in names], dtype=np.int64).reshape(-1, 2)
+        self.n = P[:, 0]
+        self.s = P[:, 1]
+        self.code = np.array([CODES.get(cwm[C].get('status'), MISSING) for C in names], dtype=np.int8)
+
+    # array of status codes, rows n in n_range, columns s in s_range (any ranges, or
+    # lists of values)
+    def codes(self, n_range, s_range):
+        G = np.full((len(n_range), len(s_range)), MISSING, dtype=np.int8)
+        if len(n_range) == 0 or len(s_range) == 0:
+            return G
+        i, m = _positions(self.n, n_range)
+        j, ms = _positions(self.s, s_range)
+        m &= ms
+        G[i[m], j[m]] = self.code[m]
+        return G
+
+    def grid(self, n_range, s_range):
+        import pandas as pd
+
+        G = self.codes(n_range, s_range)
+        T = {}
+        for j, s in enumerate(s_range):
+            T[s] = pd.Categorical.from_codes(G[:, j], SYMBOLS)
+        df = pd.DataFrame(T, index=pd.Index(list(n_range), name='n'))
+        df.columns.name = 's'
+        return df
+
+    # the table as text: a row for each n, with the header repeated every 40 rows
+    # (before n = 1 mod 40, the row for n = 1 itself being left out)
+    def text(self, n_range, s_range):
+        symbols = np.array([x + '   ' for x in SYMBOLS])
+        rows = symbols[self.codes(n_range, s_range)]
+        header = '\nn\\s ' + ''.join(f'{s:2d}  ' for s in s_range) + '\n'
+        lines = []
+        for i, n in enumerate(n_range):
+            if n % 40 == 1 or i == 0:
+                lines += [header]
+                if n == 1:
+                    continue
+            lines += [f'{n:3d}  ' + ''.join(rows[i]) + '\n']
+        return ''.join(lines)
+
+
+# write a grid to path, as HTML if path ends in .html or .htm, else as CSV
+def export_grid(df, path):
+    if path.endswith('.html') or path.endswith('.htm'):
+        df.to_html(path)
+    else:
+        df.to_csv(path)
@@ -0,0 +1,55 @@
+import json
+import os
+
+# A dataset read from a JSON file the first time it is used, rather than when
+# the code using it is loaded.  It behaves like the dictionary in the file.
+#
+# This module only uses the standard library, so it is cheap to import.
+
+
+# size and modification time identify the version of a file that something was built from
+def file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class LazyDataset:
+    def __init__(self, path, verbose=True):
+        self.path = path
+        self.verbose = verbose
+        self._data = None
+
+    def loaded(self):
+        return self._data is not None
+
+    def data(self):
+        if self._data is None:
+            with open(self.path, 'r') as f:
+                self._data = json.load(f)
+            if self.verbose:
+                print(f'read {len(self._data.keys())} data items\n')
+        return self._data
+
+    def __getitem__(self, name):
+        return self.data()[name]
+
+    def __contains__(self, name):
+        return name in self.data()
+
+    def __iter__(self):
+        return iter(self.data())
+
+    def __len__(self):
+        return len(self.data())
+
+    def keys(self):
+        return self.data().keys()
+
+    def values(self):
+        return self.data().values()
+
+    def items(self):
+        return self.data().items()
+
+    def get(self, name, default=None):
+        return self.data().get(name, default)
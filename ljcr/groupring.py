@@ -0,0 +1,152 @@
+import numpy as np
+
+from ljcr.autocorr import conjugate, convolve, elements, group_order, indicator
+
+# Integral group ring Z[G] of a finite abelian group G, without Sage.
+#
+# An element sum a_g g is a dense integer array of coefficients over the shape
+# of G (see autocorr.py), so products are cyclic convolutions, computed with an
+# FFT, and the maps g -> t*g and g -> -g are index permutations.  This covers
+# what the notebooks do with Sage's GroupAlgebra(AdditiveAbelianGroup(G),ZZ):
+#     A = GroupRingElement.from_sets(G, P, N)      # P - N
+#     B = A.map(-1)                                # or A.conjugate()
+#     A*B
+# to_sage() and from_sage() convert to and from the Sage objects, when Sage is
+# available.
+
+
+class GroupRingElement:
+    __slots__ = ['shape', 'coeffs']
+
+    def __init__(self, shape, coeffs=None):
+        self.shape = tuple(int(n) for n in shape)
+        if coeffs is None:
+            coeffs = np.zeros(self.shape, dtype=np.int64)
+        coeffs = np.asarray(coeffs, dtype=np.int64)
+        if coeffs.shape != self.shape:
+            coeffs = coeffs.reshape(self.shape)
+        self.coeffs = coeffs
+
+    # sum of the elements of P minus the sum of the elements of N
+    @classmethod
+    def from_sets(cls, shape, P, N=()):
+        return cls(shape, indicator(shape, P) - indicator(shape, N))
+
+    # the identity 1*0 times c
+    @classmethod
+    def scalar(cls, shape, c):
+        A = cls(shape)
+        A.coeffs[(0,)*len(A.shape)] = c
+        return A
+
+    def order(self):
+        return group_order(self.shape)
+
+    def is_cyclic(self):
+        return len(self.shape) == 1
+
+    # group elements are ints for cyclic groups, tuples otherwise
+    def _element(self, g):
+        if self.is_cyclic():
+            return int(g[0])
+        return tuple(int(x) for x in g)
+
+    def _index(self, g):
+        return tuple(elements(self.shape, [g])[0])
+
+    def coefficient(self, g):
+        return int(self.coeffs[self._index(g)])
+
+    def support(self):
+        return [self._element(g) for g in np.argwhere(self.coeffs != 0)]
+
+    # (group element, coefficient) pairs for the nonzero coefficients, as when iterating
+    # over a Sage group algebra element
+    def __iter__(self):
+        for g in np.argwhere(self.coeffs != 0):
+            yield self._element(g), int(self.coeffs[tuple(g)])
+
+    def __len__(self):
+        return int(np.count_nonzero(self.coeffs))
+
+    def _check(self, B):
+        if not isinstance(B, GroupRingElement):
+            return GroupRingElement.scalar(self.shape, B)
+        if B.shape != self.shape:
+            raise ValueError(f'elements of different groups {list(self.shape)} and {list(B.shape)}')
+        return B
+
+    def __eq__(self, B):
+        B = self._check(B)
+        return bool((self.coeffs == B.coeffs).all())
+
+    def __add__(self, B):
+        return GroupRingElement(self.shape, self.coeffs + self._check(B).coeffs)
+
+    __radd__ = __add__
+
+    def __sub__(self, B):
+        return GroupRingElement(self.shape, self.coeffs - self._check(B).coeffs)
+
+    def __rsub__(self, B):
+        return GroupRingElement(self.shape, self._check(B).coeffs - self.coeffs)
+
+    def __neg__(self):
+        return GroupRingElement(self.shape, -self.coeffs)
+
+    # product in Z[G]; integers act as scalars
+    def __mul__(self, B):
+        if isinstance(B, (int, np.integer)):
+            return GroupRingElement(self.shape, self.coeffs*int(B))
+        return GroupRingElement(self.shape, convolve(self.coeffs, self._check(B).coeffs))
+
+    def __rmul__(self, B):
+        return self*B
+
+    # image under g -> t*g; for t a unit mod the exponent of G this is a multiplier map
+    def map(self, t):
+        B = np.zeros(self.shape, dtype=np.int64)
+        E = np.argwhere(self.coeffs != 0)
+        np.add.at(B, tuple((t*E % np.array(self.shape)).T), self.coeffs[tuple(E.T)])
+        return GroupRingElement(self.shape, B)
+
+    # image under g -> -g
+    def conjugate(self):
+        return GroupRingElement(self.shape, conjugate(self.coeffs))
+
+    def __repr__(self):
+        terms = []
+        for g, c in self:
+            g = f'{list(g)}'.replace(' ', '') if not self.is_cyclic() else f'{g}'
+            if c == 1:
+                terms += [f'+ ({g})']
+            elif c == -1:
+                terms += [f'- ({g})']
+            else:
+                terms += [f'{"+" if c > 0 else "-"} {abs(c)}*({g})']
+        if len(terms) == 0:
+            return '0'
+        s = ' '.join(terms)
+        return s[2:] if s[0] == '+' else '-' + s[2:]
+
+    # the same element of GroupAlgebra(AdditiveAbelianGroup(shape),ZZ), in Sage
+    def to_sage(self):
+        from sage.all import AdditiveAbelianGroup, GroupAlgebra, ZZ, vector
+        G = AdditiveAbelianGroup(list(self.shape))
+        R = GroupAlgebra(G, ZZ)
+        A = R.zero()
+        for g, c in self:
+            if self.is_cyclic():
+                g = [g]
+            A = A + c*R(G(vector(list(g))))
+        return A
+
+    # convert a Sage group algebra element over an AdditiveAbelianGroup
+    @classmethod
+    def from_sage(cls, A):
+        G = A.parent().group()
+        shape = [int(n) for n in G.invariants()]
+        B = cls(shape)
+        for g, c in A:
+            B.coeffs[tuple(int(x) for x in g.vector())] += int(c)
+        return B
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+
+from ljcr.blockstore import append_block_store, read_header
+from ljcr.coverbounds import schonheim
+from ljcr.coververify import verify_cover
+from ljcr.jsonindex import IndexedJson, append_entries, recover_append
+from ljcr.names import parse_name
+
+# Append-only log of improved coverings, and compaction of the log into the
+# database.
+#
+# A submission is one JSON line appended to the log (improvements.jsonl):
+#     {"name": "C(v,k,t)", "imp": [size, method, submitter, timestamp], "blocks": [...]}
+# where "imp" has the format of the entries of coverdata's "imps" lists, newest
+# first.  Submitting takes time proportional to the size of the new covering.
+# apply_log() applies logged records to coverdata in memory, so readers see
+# them straight away.
+#
+# compact() moves the log into the files: coverdata.json is rewritten (it is
+# small), new block lists are appended in place to covers.json (updating its
+# byte-offset index) and to covers.blk if there is one, and the log is emptied.
+# An interrupted compaction can be run again: applying a record twice has no
+# further effect, an interrupted append to covers.json is undone from its
+# journal (see jsonindex.py), and a covering already in covers.json or covers.blk
+# with the logged number of blocks is not appended again.
+
+
+# an improvement in the format of coverdata's "imps" lists:
+#     [size, method, submitter, timestamp]
+def improvement(blocks, method, creator, timestamp=None):
+    if timestamp is None:
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    return [len(blocks), method, creator, timestamp]
+
+
+# append an improved covering to the log, returning the record
+def write_improvement(path, name, blocks, method, creator, timestamp=None):
+    record = {'name': name, 'imp': improvement(blocks, method, creator, timestamp), 'blocks': blocks}
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    return record
+
+
+def read_log(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip() == '':
+                continue
+            try:
+                records += [json.loads(line)]
+            except ValueError:
+                pass    # partial last line from an interrupted write
+    return records
+
+
+# check a covering and log it if it improves on coverdata (or is new)
+# returns the record, or None if it was not logged
+def submit(path, coverdata, name, blocks, method, creator, timestamp=None):
+    v, k, t = parse_name(name)[1]
+    blocks = [[int(x) for x in b] for b in blocks if len(b) > 0]
+    if name in coverdata and len(blocks) >= int(coverdata[name]['size']):
+        return None
+    if not verify_cover(v, k, t, blocks)[0]:
+        raise ValueError(f'not a {name} covering')
+    return write_improvement(path, name, blocks, method, creator, timestamp)
+
+
+# apply one record to coverdata in place; returns whether anything changed
+def apply_record(coverdata, record):
+    name = record['name']
+    imp = record['imp']
+    if name not in coverdata:
+        v, k, t = parse_name(name)[1]
+        coverdata[name] = {'size': imp[0], 'low_bd': int(schonheim(v, k, t)), 'imps': []}
+    CD = coverdata[name]
+    if imp in CD['imps']:
+        return False
+    CD['imps'].insert(0, imp)
+    if int(imp[0]) < int(CD['size']) or len(CD['imps']) == 1:
+        CD['size'] = imp[0]
+    return True
+
+
+def apply_log(coverdata, records):
+    changed = []
+    for record in records:
+        if apply_record(coverdata, record):
+            changed += [record['name']]
+    return changed
+
+
+# the newest logged block list for each covering
+def logged_blocks(records):
+    blocks = {}
+    for record in records:
+        blocks[record['name']] = record['blocks']
+    return blocks
+
+
+def _num_blocks(blocks):
+    return sum(1 for b in blocks if len(b) > 0)
+
+
+# write the log into coverdata.json, covers.json and covers.blk (those that exist),
+# then empty the log.  returns the names of the coverings that were updated
+def compact(log='improvements.jsonl', coverdata_path='coverdata.json', covers_path='covers.json',
+            store_path='covers.blk'):
+    records = read_log(log)
+    if len(records) == 0:
+        return []
+
+    with open(coverdata_path, 'r') as f:
+        coverdata = json.load(f)
+    changed = apply_log(coverdata, records)
+    tmp = coverdata_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(coverdata, f)
+    os.replace(tmp, coverdata_path)
+
+    # only the best covering for each name goes into the covers files
+    best = {}
+    for name, blocks in logged_blocks(records).items():
+        if len(blocks) == int(coverdata[name]['size']):
+            best[name] = blocks
+    if os.path.exists(covers_path):
+        recover_append(covers_path)
+        C = IndexedJson(covers_path)
+        append_entries(covers_path, {name: blocks for name, blocks in best.items()
+                                     if name not in C or _num_blocks(C[name]) != len(blocks)})
+    if store_path is not None and os.path.exists(store_path):
+        E = read_header(store_path)['entries']
+        append_block_store(store_path, {name: blocks for name, blocks in best.items()
+                                        if name not in E or E[name]['shape'][0] != len(blocks)})
+
+    open(log, 'w').close()
+    return sorted(set(changed))
@@ -0,0 +1,330 @@
+import json
+import os
+
+import numpy as np
+
+from ljcr.dataset import file_stamp
+
+# Byte-offset index for a large JSON file whose top level is an object, such
+# as covers.json (2.7GB).  The file is scanned once, recording where the value
+# of each top-level key starts and ends; the index is saved next to the JSON
+# file ("covers.json.idx") and reused until the JSON file changes.  Looking up
+# one entry then seeks to it and parses only that entry.
+#
+# append_entries() adds or replaces entries by writing them at the end of the
+# object, in place, and updating the index, so its cost depends only on the new
+# entries.  A replaced entry is left in the file as a duplicate key; json.load()
+# keeps the last value for a key, so the file still reads as intended.  An append
+# that is interrupted can be undone from its journal (recover_append()).
+
+INDEX_VERSION = 1
+CHUNK_SIZE = 1 << 24
+
+_QUOTE = ord('"')
+_BACKSLASH = ord('\\')
+_COLON = ord(':')
+_COMMA = ord(',')
+_OPEN_BRACE = ord('{')
+_CLOSE_BRACE = ord('}')
+
+_delta = np.zeros(256, dtype=np.int8)
+_delta[ord('[')] = 1
+_delta[ord('{')] = 1
+_delta[ord(']')] = -1
+_delta[ord('}')] = -1
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+# scanner state carried from one chunk to the next
+class _ScanState:
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.events = []
+
+
+# byte-at-a-time scan, used for chunks containing backslash escapes
+def _scan_slow(buf, base, state):
+    for i, c in enumerate(buf):
+        if state.in_string:
+            if state.escape:
+                state.escape = False
+            elif c == _BACKSLASH:
+                state.escape = True
+            elif c == _QUOTE:
+                state.in_string = False
+                if state.depth == 1:
+                    state.events.append((_QUOTE, base+i))
+            continue
+
+        if c == _QUOTE:
+            state.in_string = True
+            if state.depth == 1:
+                state.events.append((_QUOTE, base+i))
+        elif c == _OPEN_BRACE or c == ord('['):
+            state.depth += 1
+            if state.depth == 1:
+                state.events.append((_OPEN_BRACE, base+i))
+        elif c == _CLOSE_BRACE or c == ord(']'):
+            state.depth -= 1
+            if state.depth == 0:
+                state.events.append((_CLOSE_BRACE, base+i))
+        elif state.depth == 1 and (c == _COLON or c == _COMMA):
+            state.events.append((c, base+i))
+
+
+# vectorized scan of a chunk with no backslashes: string state is the parity
+# of the number of quotes seen, depth is a running sum over brackets
+def _scan_fast(buf, base, state):
+    a = np.frombuffer(buf, dtype=np.uint8)
+    delta = _delta[a].astype(np.int32)
+    if state.in_string or _QUOTE in buf:
+        is_quote = a == _QUOTE
+        parity = np.cumsum(is_quote, dtype=np.int32) & 1
+        in_string = parity.astype(bool) ^ state.in_string
+        # a quote that opens a string counts as inside it, a closing one does not
+        outside = ~in_string & ~is_quote
+        delta[~outside] = 0
+    else:
+        # the usual case inside covers.json: only numbers and brackets
+        is_quote = np.zeros(len(a), dtype=bool)
+        in_string = is_quote
+        outside = ~is_quote
+
+    depth_after = state.depth + np.cumsum(delta)
+    depth_before = depth_after - delta
+
+    top = depth_before == 1
+    keep = is_quote & top
+    keep |= outside & top & ((a == _COLON) | (a == _COMMA))
+    keep |= outside & (((depth_after == 1) & (delta > 0)) | ((depth_after == 0) & (delta < 0)))
+    for i in np.flatnonzero(keep):
+        c = int(a[i])
+        if c == ord('['):
+            c = _OPEN_BRACE
+        elif c == ord(']'):
+            c = _CLOSE_BRACE
+        state.events.append((c, base+int(i)))
+
+    if len(a) > 0:
+        state.depth = int(depth_after[-1])
+        state.in_string = bool(in_string[-1])
+
+
+def _scan_file(path, chunk_size=CHUNK_SIZE):
+    state = _ScanState()
+    base = 0
+    with open(path, 'rb') as f:
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            if state.escape or b'\\' in buf:
+                _scan_slow(buf, base, state)
+            else:
+                _scan_fast(buf, base, state)
+            base += len(buf)
+    return state.events
+
+
+# turn the top-level events into (key, value start, value end) triples
+def _entries_from_events(path, events):
+    if len(events) == 0 or events[0][0] != _OPEN_BRACE:
+        raise ValueError(f'{path}: top level is not a JSON object')
+
+    entries = []
+    key_span = None
+    quotes = []
+    value_start = None
+    with open(path, 'rb') as f:
+        for c, pos in events[1:]:
+            if c == _QUOTE:
+                quotes.append(pos)
+            elif c == _COLON:
+                if value_start is not None or len(quotes) < 2:
+                    raise ValueError(f'{path}: malformed JSON near byte {pos}')
+                key_span = (quotes[-2], quotes[-1])
+                value_start = pos+1
+            elif c == _COMMA or c == _CLOSE_BRACE:
+                if value_start is not None:
+                    f.seek(key_span[0])
+                    key = json.loads(f.read(key_span[1]-key_span[0]+1))
+                    entries.append((key, value_start, pos))
+                value_start = None
+                quotes = []
+                if c == _CLOSE_BRACE:
+                    break
+    return entries
+
+
+def build_index(path, chunk_size=CHUNK_SIZE):
+    entries = _entries_from_events(path, _scan_file(path, chunk_size))
+    index = {}
+    index['version'] = INDEX_VERSION
+    index['stamp'] = file_stamp(path)
+    index['names'] = [e[0] for e in entries]
+    index['offsets'] = [[e[1], e[2]] for e in entries]
+    return index
+
+
+def save_index(index, path):
+    tmp = index_path(path) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path(path))
+
+
+# read the saved index for path, or None if it is missing or stale
+def read_index(path):
+    try:
+        with open(index_path(path), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != INDEX_VERSION or index.get('stamp') != file_stamp(path):
+        return None
+    return index
+
+
+def load_index(path, rebuild=False):
+    index = None if rebuild else read_index(path)
+    if index is None:
+        index = build_index(path)
+        try:
+            save_index(index, path)
+        except OSError:
+            pass    # read-only directory: keep the index in memory only
+    return index
+
+
+def journal_path(path):
+    return path + '.journal'
+
+
+# position of the closing brace of the JSON object at path (only whitespace follows it)
+def _closing_brace(f, path):
+    pos = f.seek(0, os.SEEK_END)
+    while pos > 0:
+        pos -= 1
+        f.seek(pos)
+        c = f.read(1)
+        if c == b'}':
+            return pos
+        if not c.isspace():
+            raise ValueError(f'{path}: does not end with a JSON object')
+    raise ValueError(f'{path}: does not end with a JSON object')
+
+
+# finish or undo an append_entries() that was interrupted, as recorded in its journal:
+# if the old closing brace was not yet replaced, the entries written after the end of
+# the old file are cut off again; otherwise the append was complete
+def recover_append(path):
+    try:
+        with open(journal_path(path), 'r') as f:
+            J = json.load(f)
+    except (OSError, ValueError):
+        J = None
+    if J is not None:
+        with open(path, 'r+b') as f:
+            f.seek(J['brace'])
+            if f.read(1) == b'}':
+                f.truncate(J['size'])
+    if os.path.exists(journal_path(path)):
+        os.remove(journal_path(path))
+
+
+# add entries (a dictionary) to the end of the JSON object at path, and update its index.
+# The entries and a new closing brace are written after the end of the file, and only
+# then is the old closing brace overwritten, so until that one byte is written the old
+# object is intact (the index stops at its brace); a journal (path.journal) holding the
+# old size lets recover_append() cut off the new bytes if the process dies before then
+def append_entries(path, entries):
+    recover_append(path)
+    index = load_index(path)
+    offsets = dict(zip(index['names'], index['offsets']))
+    if len(entries) == 0:
+        return index
+    with open(path, 'r+b') as f:
+        brace = _closing_brace(f, path)
+        size = f.seek(0, os.SEEK_END)
+        with open(journal_path(path), 'w') as J:
+            json.dump({'brace': brace, 'size': size}, J)
+            J.flush()
+            os.fsync(J.fileno())
+
+        sep = '\n'
+        for name, value in entries.items():
+            f.write((sep + json.dumps(name) + ': ').encode())
+            start = f.tell()
+            f.write(json.dumps(value).encode())
+            offsets[name] = [start, f.tell()]
+            sep = ',\n'
+        f.write(b'\n}\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+        # the old brace becomes the comma before the new entries (a space if there
+        # were no entries before)
+        f.seek(brace)
+        f.write(b',' if len(index['names']) > 0 else b' ')
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal_path(path))
+
+    index['stamp'] = file_stamp(path)
+    index['names'] = list(offsets)
+    index['offsets'] = list(offsets.values())
+    try:
+        save_index(index, path)
+    except OSError:
+        pass
+    return index
+
+
+# dictionary-like read-only view of a JSON object on disk
+# entries are parsed on each access; nothing but the index is held in memory
+class IndexedJson:
+    def __init__(self, path, rebuild=False):
+        self.path = path
+        index = load_index(path, rebuild)
+        self._offsets = dict(zip(index['names'], index['offsets']))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __contains__(self, name):
+        return name in self._offsets
+
+    def keys(self):
+        return self._offsets.keys()
+
+    # byte range of the value of name in the file
+    def span(self, name):
+        return self._offsets[name]
+
+    def raw(self, name):
+        start, end = self.span(name)
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end-start)
+
+    def __getitem__(self, name):
+        return json.loads(self.raw(name))
+
+    def get(self, name, default=None):
+        if name not in self._offsets:
+            return default
+        return self[name]
+
+    def items(self):
+        with open(self.path, 'rb') as f:
+            for name, (start, end) in self._offsets.items():
+                f.seek(start)
+                yield name, json.loads(f.read(end-start))
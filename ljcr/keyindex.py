@@ -0,0 +1,100 @@
+import json
+import os
+
+from ljcr.dataset import file_stamp
+from ljcr.names import parse_name
+
+# Parsed names of a dataset, built once and saved next to the JSON file
+# (e.g. "ds.json.keys"), so later sessions don't parse the names again.
+#
+# The index maps each name to its (kind, parameters) as given by parse_name(),
+# and groups names by everything but the last parameter:
+#     DS/SDS: (v,k,lam) -> list of group shapes G
+#     C:      (v,k)     -> list of t
+#     CW:     n         -> list of s
+# so that, e.g., all groups with a (v,k,lam) difference set are one lookup
+# rather than a scan of every name.
+#
+# Parsed names are also kept in one dictionary shared by all datasets, which
+# get_v() and friends in the *_code.py files read through params().
+
+KEYS_VERSION = 1
+
+_parsed = {}
+
+
+# (kind, parameters) for a name, parsed at most once
+def params(name):
+    P = _parsed.get(name)
+    if P is None:
+        P = parse_name(name)
+        _parsed[name] = P
+    return P
+
+
+def keys_path(path):
+    return path + '.keys'
+
+
+def _group_key(kind, P):
+    if kind == 'CW':
+        return P[0], P[1]
+    return P[:-1], P[-1]
+
+
+class KeyIndex:
+    def __init__(self, names, parsed=None):
+        if parsed is None:
+            parsed = [parse_name(name) for name in names]
+        self.params = dict(zip(names, parsed))
+        self.groups = {}
+        for kind, P in parsed:
+            key, last = _group_key(kind, P)
+            self.groups.setdefault(key, []).append(last)
+        _parsed.update(self.params)
+
+    def __len__(self):
+        return len(self.params)
+
+    def __contains__(self, name):
+        return name in self.params
+
+    # group shapes (or t, or s) of the names whose other parameters are key
+    def lookup(self, key):
+        return self.groups.get(key, [])
+
+    def save(self, path):
+        S = {'version': KEYS_VERSION, 'stamp': file_stamp(path),
+             'names': list(self.params), 'params': [[kind, P] for kind, P in self.params.values()]}
+        tmp = keys_path(path) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(S, f)
+        os.replace(tmp, keys_path(path))
+
+
+def _from_json(kind, P):
+    if kind in ('DS', 'SDS'):
+        return kind, (P[0], P[1], P[2], tuple(P[3]))
+    return kind, tuple(P)
+
+
+# the key index of the JSON file at path, from its .keys file if that is up to date;
+# otherwise it is built from names (default: the keys of the JSON file) and saved
+def load_key_index(path, names=None):
+    try:
+        with open(keys_path(path), 'r') as f:
+            S = json.load(f)
+        if S.get('version') == KEYS_VERSION and S.get('stamp') == file_stamp(path):
+            return KeyIndex(S['names'], [_from_json(kind, P) for kind, P in S['params']])
+    except (OSError, ValueError):
+        pass
+
+    if names is None:
+        with open(path, 'r') as f:
+            names = list(json.load(f))
+    K = KeyIndex(list(names))
+    try:
+        K.save(path)
+    except OSError:
+        pass    # read-only directory: keep the index in memory only
+    return K
@@ -0,0 +1,180 @@
+import os
+from math import gcd
+
+import numpy as np
+
+# Unit groups, multiplier candidates and multiplier orbits of Z_n, kept on disk.
+#
+#     units(n)                  the units mod n, as a sorted array
+#     subgroup(n, gens)         the subgroup of units generated by gens
+#     ds_multipliers(v,k,lam)   numerical multiplier candidates for the parameters
+#     sds_multipliers(v,k,lam)  (see below)
+#     cw_multipliers(n,s)
+#     orbit_labels(n, gens)     orbit of each x in Z_n under x -> t*x, t in the
+#                               subgroup generated by gens, numbered in order of
+#                               their smallest elements
+#     orbits(n, gens)           the orbits themselves, as sorted arrays
+#
+# Arrays are computed once and kept in memory for the session.  They are also
+# saved as .npy files, keyed by n and the generators reduced mod n, so that
+# searches and canonical forms in later sessions read them back, but only when
+# asked: if LJCR_CACHE names a directory, or if cache is given (True for
+# LJCR_CACHE or ~/.cache/ljcr/multipliers, or a directory).  A cache that can't
+# be written is left alone and the arrays are still returned.
+#
+# Orbit labels are found by pointer doubling: with label[x] the smallest of
+# x, t*x, ..., t^(2^j-1)*x, taking the minimum with label[t^(2^j)*x] doubles
+# the range, so a generator of order m takes log2(m) vectorized steps; the
+# generators are gone through until nothing changes.
+#
+# Multiplier candidates are the primes p dividing k - lam that are prime to v
+# (also p > lam, as in the first multiplier theorem, for a DS or SDS; for a
+# CW(n,s^2), k - lam = s^2).  For a DS these are multipliers.  For SDS and CW no
+# multiplier theorem is known to cover them: they are only candidates, and a
+# search fixed by them proves nothing about nonexistence (see orbitsearch.py).
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ljcr', 'multipliers')
+CACHE_DIR = os.environ.get('LJCR_CACHE')
+
+_memo = {}
+
+
+def primes(n):
+    P = []
+    p = 2
+    while p*p <= n:
+        if n % p == 0:
+            P += [p]
+            while n % p == 0:
+                n //= p
+        p += 1
+    if n > 1:
+        P += [n]
+    return P
+
+
+def ds_multipliers(v, k, lam):
+    return [p for p in primes(k-lam) if gcd(p, v) == 1 and p > lam]
+
+
+def sds_multipliers(v, k, lam):
+    return [p for p in primes(abs(k-lam)) if gcd(p, v) == 1 and p > lam]
+
+
+def cw_multipliers(n, s):
+    return [p for p in primes(s) if gcd(p, n) == 1]
+
+
+# generators reduced mod n, without repeats or 1
+def _generators(n, gens):
+    G = sorted(set(int(t) % n for t in gens) - {1 % n})
+    for t in G:
+        if gcd(t, n) != 1:
+            raise ValueError(f'{t} is not a unit mod {n}')
+    return G
+
+
+# the cache directory for the cache argument, or None for memory only
+def _cache_dir(cache):
+    if cache is None:
+        return CACHE_DIR
+    if cache is True:
+        return CACHE_DIR or DEFAULT_CACHE_DIR
+    return cache or None
+
+
+# the array called name: from memory, else from the cache directory, else from compute()
+def _cached(name, compute, cache):
+    if name in _memo:
+        return _memo[name]
+    directory = _cache_dir(cache)
+    path = os.path.join(directory, name + '.npy') if directory else None
+    A = None
+    if path is not None and os.path.exists(path):
+        try:
+            A = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            A = None
+    if A is None:
+        A = compute()
+        if path is not None:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.save(f, A)
+                os.replace(tmp, path)
+            except OSError:
+                pass    # read-only or missing directory: keep the array in memory only
+    A.setflags(write=False)
+    _memo[name] = A
+    return A
+
+
+def _dtype(n):
+    return np.int32 if n < 2**31 else np.int64
+
+
+def units(n, cache=None):
+    n = int(n)
+    def compute():
+        u = np.arange(1, n+1, dtype=np.int64)
+        return u[np.gcd(u, n) == 1].astype(_dtype(n))
+    return _cached(f'units_{n}', compute, cache)
+
+
+def subgroup(n, gens, cache=None):
+    n = int(n)
+    G = _generators(n, gens)
+
+    def compute():
+        H = np.array([1 % n], dtype=np.int64)
+        while True:
+            H1 = np.unique(np.concatenate([H] + [H*t % n for t in G]))
+            if len(H1) == len(H):
+                return H1.astype(_dtype(n))
+            H = H1
+    return _cached(f'subgroup_{n}_' + '_'.join(map(str, G)), compute, cache)
+
+
+def orbit_labels(n, gens, cache=None):
+    n = int(n)
+    G = _generators(n, gens)
+
+    def compute():
+        x = np.arange(n, dtype=np.int64)
+        label = x.copy()
+        while True:
+            old = label
+            for t in G:
+                s = t
+                for j in range(max(1, n.bit_length())):
+                    label = np.minimum(label, label[x*s % n])
+                    s = s*s % n
+                    if s == 1:
+                        break
+            if (label == old).all():
+                break
+        # number the orbits in order of their smallest elements
+        reps = np.flatnonzero(label == x)
+        return np.searchsorted(reps, label).astype(_dtype(n))
+    return _cached(f'orbits_{n}_' + '_'.join(map(str, G)), compute, cache)
+
+
+def orbits(n, gens, cache=None):
+    label = orbit_labels(n, gens, cache)
+    order = np.argsort(label, kind='stable')
+    splits = np.flatnonzero(np.diff(label[order])) + 1
+    return np.split(order.astype(np.int64), splits)
+
+
+# remove the saved arrays (all of them, or those for one n)
+def clear_cache(n=None, cache=True):
+    global _memo
+    _memo = {}
+    path = _cache_dir(cache)
+    if path is None or not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        if name.endswith('.npy') and (n is None or name[:-4].split('_')[1] == str(n)):
+            os.remove(os.path.join(path, name))
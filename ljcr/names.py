@@ -0,0 +1,37 @@
+# Parsing the dataset names, e.g.
+#     "C(7,3,2)"             covering design C(v,k,t)
+#     "DS(16,6,2,[4,4])"     difference set DS(v,k,lambda) in Z_4 x Z_4
+#     "SDS(18,13,4,[3,6])"   signed difference set
+#     "CW(28,4)"             circulant weighing matrix CW(n,s^2); note s, not k = s^2
+
+# (kind, parameters) for a name: kind is "C", "DS", "SDS" or "CW", and
+# the parameters are (v,k,t), (v,k,lam,G), (v,k,lam,G) or (n,s), with G a tuple
+def parse_name(name):
+    kind, rest = name.split('(', 1)
+    rest = rest.rstrip()
+    if not rest.endswith(')'):
+        raise ValueError(f'bad name {name}')
+    rest = rest[:-1]
+
+    if kind in ('DS', 'SDS'):
+        head, G = rest.split('[', 1)
+        v, k, lam = [int(x) for x in head.rstrip(',').split(',')]
+        G = tuple(int(x) for x in G.rstrip(']').split(','))
+        return kind, (v, k, lam, G)
+
+    P = tuple(int(x) for x in rest.split(','))
+    if (kind == 'C' and len(P) == 3) or (kind == 'CW' and len(P) == 2):
+        return kind, P
+    raise ValueError(f'bad name {name}')
+
+
+def ds_name(v, k, lam, G, kind='DS'):
+    return f'{kind}({v},{k},{lam},{list(G)})'.replace(' ', '')
+
+
+def cw_name(n, s):
+    return f'CW({n},{s})'
+
+
+def cover_name(v, k, t):
+    return f'C({v},{k},{t})'
@@ -0,0 +1,159 @@
+import numpy as np
+
+from ljcr.autocorr import conjugate, elements, group_order, is_constant_off_identity
+
+# Exact autocorrelation with number-theoretic transforms, for large groups.
+#
+# The FFT in autocorr.py works in floating point, and once v is in the millions
+# (or the coefficients are large) its rounding can no longer be trusted, while
+# the exact pair sum there costs k^2.  Here the transform is done mod primes p
+# with a 2^m-th root of unity, so it's exact:
+#     - each axis of length n is padded to a power of two L >= 2n-1, so that the
+#       linear convolution of A with A^(-1) doesn't wrap, and the cyclic one is
+#       recovered by folding (c[g] = lin[g] + lin[g+n] along each axis);
+#     - |C[g]| <= sum a_h^2 (Cauchy-Schwarz), so enough primes are used for
+#       their product to exceed twice that, and the residues are combined by CRT
+#       (Garner), taking the representative nearest 0.
+# For a 0/+-1 array one prime is always enough.  Residues are below 2^31, so
+# products of two fit in int64.
+
+# (p, generator of the multiplicative group mod p, largest m with 2^m | p-1)
+PRIMES = [(2013265921, 31, 27),
+          (469762049, 3, 26),
+          (167772161, 3, 25),
+          (754974721, 11, 24),
+          (998244353, 3, 23)]
+
+
+def _next_pow2(n):
+    L = 1
+    while L < n:
+        L *= 2
+    return L
+
+
+def _bit_reverse(L):
+    bits = L.bit_length()-1
+    r = np.zeros(L, dtype=np.int64)
+    for b in range(bits):
+        r |= ((np.arange(L) >> b) & 1) << (bits-1-b)
+    return r
+
+
+# w^0, w^1, ..., w^(n-1) mod p
+def _powers(w, n, p):
+    W = np.ones(max(n, 1), dtype=np.int64)
+    m = 1
+    while m < n:
+        W[m:2*m] = W[:min(m, n-m)]*pow(w, m, p) % p
+        m *= 2
+    return W[:n]
+
+
+# transform of A mod p along its last axis, of length L (a power of two)
+def _ntt(A, p, g, inverse=False):
+    L = A.shape[-1]
+    w = pow(g, (p-1)//L, p)
+    if inverse:
+        w = pow(w, p-2, p)
+    T = _powers(w, L//2, p)
+    A = A[..., _bit_reverse(L)]
+    lead = A.shape[:-1]
+    h = 1
+    while h < L:
+        A = A.reshape(lead + (L//(2*h), 2, h))
+        u = A[..., 0, :]
+        v = A[..., 1, :]*T[::L//(2*h)] % p
+        A = np.stack([(u+v) % p, (u-v) % p], axis=-2)
+        h *= 2
+    A = A.reshape(lead + (L,))
+    if inverse:
+        A = A*pow(L, p-2, p) % p
+    return A
+
+
+# transform along every axis, each padded to the length in shape
+def _ntt_all(A, p, g, inverse=False):
+    for axis in range(A.ndim):
+        A = np.moveaxis(_ntt(np.moveaxis(A, axis, -1), p, g, inverse), -1, axis)
+    return A
+
+
+def _padded(A, shape):
+    B = np.zeros(shape, dtype=np.int64)
+    B[tuple(slice(0, n) for n in A.shape)] = A
+    return B
+
+
+# the primes used for arrays whose products have absolute value at most bound
+def primes_for(bound, L=1):
+    chosen = []
+    M = 1
+    for p, g, m in PRIMES:
+        if L > 1 << m:
+            continue
+        chosen += [(p, g)]
+        M *= p
+        if M > 2*bound:
+            return chosen
+    raise ValueError(f'bound {bound} needs more primes than there are for length {L}')
+
+
+# combine residues R[j] mod primes[j] into the values nearest 0
+def _crt(R, primes):
+    if len(primes) == 1:
+        p = primes[0]
+        X = R[0]
+        return np.where(X > p//2, X-p, X)
+    # Garner: x = r_0 + p_0*(t_1 + p_1*(t_2 + ...)), all t_j < p_j
+    dtype = np.int64 if len(primes) == 2 else object
+    X = R[0].astype(dtype)
+    M = 1
+    for j in range(1, len(primes)):
+        q = primes[j]
+        M *= primes[j-1]
+        t = ((R[j].astype(dtype) - X) % q) * pow(M % q, q-2, q) % q
+        X = X + M*t
+    M *= primes[-1]
+    return np.where(X > M//2, X-M, X)
+
+
+# coefficient array of A*A^(-1), exactly, for any integer array A
+def autocorrelation_ntt(A):
+    A = np.asarray(A, dtype=np.int64)
+    shape = A.shape
+    padded = tuple(_next_pow2(2*n-1) for n in shape)
+    bound = int((A.astype(object)**2).sum()) if A.size > 0 else 0
+    B = conjugate(A)
+
+    residues = []
+    primes = primes_for(bound, max(padded, default=1))
+    for p, g in primes:
+        FA = _ntt_all(_padded(A % p, padded), p, g)
+        FB = _ntt_all(_padded(B % p, padded), p, g)
+        R = _ntt_all(FA*FB % p, p, g, inverse=True)
+        # fold the linear convolution back into the group
+        for axis, n in enumerate(shape):
+            R = np.moveaxis(R, axis, 0)
+            F = R[:n].copy()
+            F[:n-1] += R[n:2*n-1]
+            R = np.moveaxis(F % p, 0, axis)
+        residues += [R]
+    return _crt(residues, [p for p, g in primes])
+
+
+# is P - N, with P and N disjoint, a (v,k,lam) signed difference set in the group
+# with shape G (exactly: no floating point)?  a CW(n,s^2) is an (n,s^2,0) SDS in Z_n
+def is_signed_difference_set_exact(v, k, lam, G, P, N):
+    if group_order(G) != v or len(P)+len(N) != k:
+        return False
+    A = np.zeros(tuple(G), dtype=np.int64)
+    np.add.at(A, tuple(elements(G, P).T), 1)
+    np.add.at(A, tuple(elements(G, N).T), -1)
+    if np.count_nonzero(A) != len(P)+len(N) or np.abs(A).max(initial=0) > 1:
+        return False
+    return is_constant_off_identity(autocorrelation_ntt(A), k, lam)
+
+
+def is_difference_set_exact(v, k, lam, G, S):
+    return is_signed_difference_set_exact(v, k, lam, G, S, [])
@@ -0,0 +1,343 @@
+import json
+import multiprocessing
+import os
+from math import gcd, isqrt
+
+import numpy as np
+
+from ljcr.canonical import canonical_key
+from ljcr.multipliers import cw_multipliers, orbits, sds_multipliers
+
+# Orbit exhaust: search for group ring elements A = P - N in an abelian group G
+# of order n (given by its shape, as in autocorr.py) with
+#     A A^(-1) = k + lam*(G - 1)
+# (CW(n,s^2): G = Z_n, k = s^2, lam = 0; SDS(v,k,lam): as named) that are fixed
+# by a group H of multipliers x -> t*x, i.e. unions of H-orbits of G with signs.
+# Group elements are encoded as integers 0 <= x < n, their index in an array
+# of shape G.
+#
+# If every element of H is a multiplier for the parameters, some translate of
+# any solution is fixed by H (as in the multiplier theorems behind the "Orbit
+# Exhaust" entries of cwm.json and sds.json), so finding no H-fixed solution
+# shows there is none at all.  Choosing H is left to the caller; the search only
+# answers the question for H-fixed A.
+#
+# Applying the trivial character, A(1)^2 = k + lam*(n-1), so A(1) = +-a with a
+# a square root, and replacing A by -A if need be, |P| = (k+a)/2, |N| = (k-a)/2.
+# (The parameters passed are called n here whatever the dataset calls them.)
+#
+# Orbits are given a coefficient +1, 0 or -1 in turn (largest orbits first).
+# Since A is fixed by H, so is its autocorrelation C, which is kept as its
+# values at one representative r_o of each orbit.  With M[i,j,o] the number of
+# pairs x in O_i, y in O_j with x - y = r_o, C[o] = sum c_i c_j M[i,j,o], and
+# giving orbit i coefficient c adds c*sum_j c_j (M[i,j,o] + M[j,i,o]) + M[i,i,o]
+# (over the orbits j already given coefficients): a small dense product per node.
+#
+# A node is pruned when some C[o] - lam (o not the orbit of 0) is too far from 0
+# to be made up by the orbits still to come.  The change still possible is at
+# most 2r, where r is the number of nonzero coefficients still to be placed (each
+# occurs in at most 2 terms), and at most the sum of M[i,j,o] over the pairs of
+# orbits with a nonzero coefficient that are not yet both decided.
+#
+# The tree is cut at a depth giving enough subtrees, and the subtrees are
+# searched on a process pool.  With a checkpoint file, the result of each
+# subtree is appended to it as one JSON line as it finishes, and a later run
+# with the same checkpoint skips the subtrees already there, so an interrupted
+# search continues where it stopped.  Solutions are returned up to equivalence
+# (translation and multiplication by units, see canonical.py).
+#
+# The entries returned by cw_orbit_search() and sds_orbit_search() name the
+# multipliers used in their comment.  When nothing is found the status is "No"
+# only if the caller says the multipliers are proven (proven=True); the default
+# candidates are not, so otherwise it stays "Open".
+
+COMMENT = 'Orbit Exhaust'
+
+
+# the comment for an entry found with the given multipliers
+def exhaust_comment(multipliers):
+    if len(multipliers) == 0:
+        return f'{COMMENT} (no multipliers)'
+    return f'{COMMENT} (multipliers {",".join(str(int(t)) for t in multipliers)})'
+
+
+def _shape(G):
+    if isinstance(G, (int, np.integer)):
+        return (int(G),)
+    return tuple(int(n) for n in G)
+
+
+# n x r array of the coordinates of the encoded elements of G
+def _coordinates(G):
+    return np.array(np.unravel_index(np.arange(int(np.prod(G))), G), dtype=np.int64).T.reshape(-1, len(G))
+
+
+def _encode(G, E):
+    return np.ravel_multi_index(tuple(np.moveaxis(E % np.array(G, dtype=np.int64), -1, 0)), G)
+
+
+# the orbits of G (a shape, or n for Z_n) under the group generated by multipliers, as arrays
+# (for Z_n, from the saved orbits of multipliers.py)
+def multiplier_orbits(G, multipliers):
+    G = _shape(G)
+    if len(G) == 1:
+        return orbits(G[0], multipliers)
+    E = _coordinates(G)
+    label = np.arange(len(E), dtype=np.int64)
+    while True:
+        old = label
+        for t in multipliers:
+            label = np.minimum(label, label[_encode(G, t*E)])
+        if (label == old).all():
+            break
+    order = np.argsort(label, kind='stable')
+    splits = np.flatnonzero(np.diff(label[order])) + 1
+    return np.split(order, splits)
+
+
+# (|P|, |N|) for the parameters, or None if k + lam*(n-1) is not a square
+def weights(n, k, lam):
+    a2 = k + lam*(n-1)
+    a = isqrt(max(a2, 0))
+    if a*a != a2 or (k+a) % 2 != 0 or a > k:
+        return None
+    return (k+a)//2, (k-a)//2
+
+
+class OrbitSearch:
+    def __init__(self, G, k, lam, orbits):
+        self.G = _shape(G)
+        n = int(np.prod(self.G))
+        self.n = n
+        self.k = k
+        self.lam = lam
+        self.orbits = sorted(orbits, key=len, reverse=True)
+        self.sizes = np.array([len(O) for O in self.orbits], dtype=np.int64)
+        # room left: total size of orbits i, i+1, ...
+        self.room = np.concatenate([np.cumsum(self.sizes[::-1])[::-1], [0]])
+        self.target = weights(n, k, lam)
+
+        m = len(self.orbits)
+        label = np.empty(n, dtype=np.int64)
+        for i, O in enumerate(self.orbits):
+            label[O] = i
+        E = _coordinates(self.G)
+        reps = E[[O[0] for O in self.orbits]]
+        self.zero = int(label[0])
+        self.M = np.zeros((m, m, m), dtype=np.int64)
+        for i, O in enumerate(self.orbits):
+            # y = x - r_o for x in O_i and each representative r_o
+            Y = label[_encode(self.G, E[O][:, None, :]-reps[None, :, :])]
+            np.add.at(self.M[i], (Y, np.broadcast_to(np.arange(m), Y.shape)), 1)
+        self.MM = self.M + self.M.transpose(1, 0, 2)
+        # tail[i,j]: sum over i' >= i of M[i',j] + M[j,i']
+        # both[i]: sum over i', j' >= i of M[i',j']
+        self.tail = np.zeros((m+1, m, m), dtype=np.int64)
+        self.tail[:m] = np.cumsum(self.MM[::-1], axis=0)[::-1]
+        self.both = np.zeros((m+1, m), dtype=np.int64)
+        for i in range(m-1, -1, -1):
+            self.both[i] = self.both[i+1] + self.M[i, i] + self.MM[i, i+1:].sum(axis=0)
+
+    # C after giving orbit i coefficient c, with coefficients coef for orbits < i
+    def _add(self, coef, C, i, c):
+        return C + c*(coef[:i].astype(np.int64) @ self.MM[i, :i]) + self.M[i, i]
+
+    # can the node with coefficients coef for orbits < i and r nonzero coefficients
+    # still to place be completed, as far as the bounds show?
+    def _feasible(self, coef, C, i, r):
+        bound = self.both[i] + self.tail[i, np.flatnonzero(coef[:i])].sum(axis=0)
+        bound = np.minimum(bound, 2*r)
+        bound[self.zero] = abs(C[self.zero]-self.lam)
+        return bool((np.abs(C-self.lam) <= bound).all())
+
+    # the children of a node (coef, C, i, p, m), with the coefficient c of orbit i
+    # in each; p and m are the numbers of +1 and -1 coefficients still to place
+    def _children(self, node):
+        coef, C, i, p, m = node
+        size = int(self.sizes[i])
+        for c in (1, 0, -1):
+            p1 = p - size*(c == 1)
+            m1 = m - size*(c == -1)
+            if p1 < 0 or m1 < 0 or p1+m1 > self.room[i+1]:
+                continue
+            if c == 0:
+                yield c, (coef, C, i+1, p1, m1)
+                continue
+            coef1 = coef.copy()
+            coef1[i] = c
+            C1 = self._add(coef, C, i, c)
+            if self._feasible(coef1, C1, i+1, p1+m1):
+                yield c, (coef1, C1, i+1, p1, m1)
+
+    def root(self):
+        m = len(self.orbits)
+        return (np.zeros(m, dtype=np.int8), np.zeros(m, dtype=np.int64), 0, self.target[0], self.target[1])
+
+    # node reached by giving the first orbits the coefficients in prefix, or None
+    def node(self, prefix):
+        node = self.root()
+        for c in prefix:
+            node = dict(self._children(node)).get(c)
+            if node is None:
+                return None
+        return node
+
+    # prefixes of the nodes at the first depth with at least count nodes
+    def prefixes(self, count):
+        level = [((), self.root())]
+        while 0 < len(level) < count and level[0][1][2] < len(self.orbits):
+            next_level = []
+            for prefix, node in level:
+                for c, child in self._children(node):
+                    next_level += [(prefix+(c,), child)]
+            level = next_level
+        return [prefix for prefix, node in level]
+
+    def _sets(self, coef):
+        P = [self.orbits[i] for i in np.flatnonzero(coef > 0)]
+        N = [self.orbits[i] for i in np.flatnonzero(coef < 0)]
+        return [np.sort(np.concatenate(P + [np.zeros(0, dtype=np.int64)])).tolist(),
+                np.sort(np.concatenate(N + [np.zeros(0, dtype=np.int64)])).tolist()]
+
+    # all solutions below the node with the given prefix, as [P, N] lists
+    def search(self, prefix=()):
+        if self.target is None:
+            return []
+        start = self.node(prefix)
+        if start is None:
+            return []
+        solutions = []
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            coef, C, i, p, m = node
+            if p == 0 and m == 0:
+                if (np.delete(C, self.zero) == self.lam).all():
+                    solutions += [self._sets(coef)]
+                continue
+            if i < len(self.orbits):
+                stack += [child for c, child in self._children(node)]
+        return solutions
+
+
+def _search_task(args):
+    G, k, lam, orbits, prefix = args
+    return prefix, OrbitSearch(G, k, lam, orbits).search(prefix)
+
+
+# solutions up to equivalence, dropping repeats
+def _distinct(G, solutions):
+    E = _coordinates(G)
+    found = {}
+    for P, N in solutions:
+        found.setdefault(canonical_key(G, E[P], E[N]), [P, N])
+    return list(found.values())
+
+
+# the subtrees recorded in a checkpoint file: {prefix: solutions}.  the first line
+# describes the search, and must match header
+def read_checkpoint(checkpoint, header):
+    done = {}
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return done
+    with open(checkpoint, 'r') as f:
+        lines = f.readlines()
+    if len(lines) == 0:
+        return done
+    if json.loads(lines[0]) != header:
+        raise ValueError(f'{checkpoint} is a checkpoint for a different search')
+    for line in lines[1:]:
+        try:
+            R = json.loads(line)
+        except ValueError:
+            continue    # partial last line from an interrupted run
+        done[tuple(R['prefix'])] = R['solutions']
+    return done
+
+
+# all H-fixed solutions in G, with H generated by multipliers (up to equivalence),
+# as lists [P, N] of encoded elements
+def orbit_search(G, k, lam, multipliers, processes=None, split=64, checkpoint=None):
+    G = _shape(G)
+    e = int(np.lcm.reduce(np.array(G, dtype=np.int64)))
+    if any(gcd(t, e) != 1 for t in multipliers):
+        raise ValueError(f'multipliers must be units mod {e}')
+    orbits = multiplier_orbits(G, multipliers)
+    S = OrbitSearch(G, k, lam, orbits)
+    if S.target is None:
+        return []
+    if processes == 1 and checkpoint is None:
+        return _distinct(G, S.search())
+
+    header = {'G': list(G), 'k': k, 'lam': lam, 'multipliers': list(multipliers), 'split': split}
+    done = read_checkpoint(checkpoint, header)
+    tasks = [(G, k, lam, orbits, prefix) for prefix in S.prefixes(split) if prefix not in done]
+    solutions = [P for R in done.values() for P in R]
+    out = None
+    if checkpoint is not None:
+        new = not os.path.exists(checkpoint) or os.path.getsize(checkpoint) == 0
+        if not new:
+            with open(checkpoint, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                partial = f.read(1) != b'\n'
+        out = open(checkpoint, 'a')
+        if new:
+            out.write(json.dumps(header) + '\n')
+        elif partial:
+            out.write('\n')    # end a partial line left by an interrupted run
+        out.flush()
+    pool = None
+    try:
+        if processes == 1:
+            results = map(_search_task, tasks)
+        else:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(_search_task, tasks)
+        for prefix, R in results:
+            solutions += R
+            if out is not None:
+                out.write(json.dumps({'prefix': list(prefix), 'solutions': R}) + '\n')
+                out.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if out is not None:
+            out.close()
+    return _distinct(G, solutions)
+
+
+# orbit exhaust for CW(n,s^2), as an entry in the format of cwm.json; proven says the
+# multipliers are known to be multipliers for CW(n,s^2), so that finding none means "No"
+def cw_orbit_search(n, s, multipliers=None, processes=None, checkpoint=None, proven=False):
+    if multipliers is None:
+        multipliers = cw_multipliers(n, s)
+    sets = orbit_search(n, s*s, 0, multipliers, processes, checkpoint=checkpoint)
+    comment = exhaust_comment(multipliers)
+    if len(sets) == 0:
+        return {'status': 'No' if proven else 'Open', 'comment': comment}
+    return {'status': 'Yes', 'comment': comment, 'sets': sets}
+
+
+# orbit exhaust for SDS(v,k,lam) in G, as an entry in the format of sds.json.  the search
+# is done in the group with shape rep if given (e.g. the elementary divisors [2,3,3] for
+# G = [3,6]), which then becomes the entry's G_rep.  as for cw_orbit_search(), finding
+# none gives "No" only with proven=True; there is no multiplier theorem for SDS behind
+# the default candidates
+def sds_orbit_search(v, k, lam, G, multipliers=None, processes=None, checkpoint=None, rep=None,
+                     proven=False):
+    shape = _shape(G if rep is None else rep)
+    if int(np.prod(shape)) != v:
+        raise ValueError(f'group {list(shape)} does not have order {v}')
+    if multipliers is None:
+        multipliers = sds_multipliers(v, k, lam)
+    sets = orbit_search(shape, k, lam, multipliers, processes, checkpoint=checkpoint)
+    entry = {'status': 'Yes' if len(sets) > 0 else 'No' if proven else 'Open',
+             'comment': exhaust_comment(multipliers)}
+    if rep is not None:
+        entry['G_rep'] = list(shape)
+    if len(sets) > 0:
+        if len(shape) > 1:
+            E = _coordinates(shape)
+            sets = [[E[P].tolist(), E[N].tolist()] for P, N in sets]
+        entry['sets'] = sets
+    return entry
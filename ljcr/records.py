@@ -0,0 +1,211 @@
+from typing import NamedTuple
+
+from ljcr.keyindex import params
+
+# Records for the entries of the datasets, returned by the *_record() functions
+# in the *_code.py files, so that the data can be used without reading it back
+# from printed text.  The get_*_data() functions print format_*() of a record.
+#
+#     DSRecord      an entry of ds.json or sds.json
+#     CWRecord      an entry of cwm.json
+#     CoverRecord   an entry of coverdata.json, with its improvements
+#     CoverBlocks   the blocks of a covering
+#
+# Records are small: they hold the parameters and the dictionary entry, and
+# sets() and blocks() are iterators over the entry, so nothing is copied until
+# it is asked for (a covering of millions of blocks is gone through a block at a
+# time).  Sets of an SDS or CW are SignedSet pairs (P, N).
+
+
+class SignedSet(NamedTuple):
+    P: list
+    N: list
+
+
+class Improvement(NamedTuple):
+    size: int
+    method: str
+    creator: str
+    timestamp: str
+
+
+class DSRecord:
+    __slots__ = ('kind', 'name', 'v', 'k', 'lam', 'G', 'G_rep', 'status', 'comment', '_entry')
+
+    def __init__(self, name, entry):
+        kind, P = params(name)
+        self.kind = kind
+        self.name = name
+        self.v, self.k, self.lam, self.G = P
+        self.G_rep = tuple(entry['G_rep']) if 'G_rep' in entry else None
+        self.status = entry.get('status')
+        self.comment = entry.get('comment')
+        self._entry = entry
+
+    @property
+    def num_sets(self):
+        return len(self._entry.get('sets', []))
+
+    # the i-th set: a list of elements for a DS, a SignedSet for an SDS
+    def set(self, i):
+        S = self._entry['sets'][i]
+        return S if self.kind == 'DS' else SignedSet(S[0], S[1])
+
+    def sets(self):
+        for i in range(self.num_sets):
+            yield self.set(i)
+
+    def __repr__(self):
+        return f'DSRecord({self.name}, status={self.status!r}, num_sets={self.num_sets})'
+
+
+class CWRecord:
+    __slots__ = ('name', 'n', 's', 'status', 'comment', '_entry')
+
+    def __init__(self, name, entry):
+        self.name = name
+        self.n, self.s = params(name)[1]
+        self.status = entry.get('status')
+        self.comment = entry.get('comment')
+        self._entry = entry
+
+    @property
+    def k(self):
+        return self.s*self.s
+
+    @property
+    def num_sets(self):
+        return len(self._entry.get('sets', []))
+
+    def set(self, i):
+        S = self._entry['sets'][i]
+        return SignedSet(S[0], S[1])
+
+    def sets(self):
+        for i in range(self.num_sets):
+            yield self.set(i)
+
+    def __repr__(self):
+        return f'CWRecord({self.name}, status={self.status!r}, num_sets={self.num_sets})'
+
+
+class CoverRecord(NamedTuple):
+    name: str
+    v: int
+    k: int
+    t: int
+    size: int
+    low_bd: int
+    imps: tuple
+
+    @classmethod
+    def from_entry(cls, name, entry):
+        v, k, t = params(name)[1]
+        imps = tuple(Improvement(*imp) for imp in entry.get('imps', []))
+        return cls(name, v, k, t, entry['size'], entry['low_bd'], imps)
+
+    # the most recent improvement
+    @property
+    def last(self):
+        return self.imps[0] if len(self.imps) > 0 else None
+
+    @property
+    def optimal(self):
+        return self.size == self.low_bd
+
+
+class CoverBlocks:
+    __slots__ = ('name', 'v', 'k', 't', '_blocks')
+
+    # blocks is anything with len() and indexing by block: a list of lists, or an array
+    def __init__(self, name, blocks):
+        self.name = name
+        self.v, self.k, self.t = params(name)[1]
+        self._blocks = blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    # the blocks one at a time, as tuples of ints
+    def blocks(self):
+        for i in range(len(self._blocks)):
+            yield tuple(int(x) for x in self._blocks[i])
+
+    __iter__ = blocks
+
+    def array(self):
+        import numpy as np
+        return np.asarray(self._blocks, dtype=np.int64).reshape(-1, self.k)
+
+    def __repr__(self):
+        return f'CoverBlocks({self.name}, {len(self)} blocks)'
+
+
+# how many sets the status says there are, as text: "There are exactly 2 DS(...) in group G"
+def _count_text(status, count, what):
+    if status == 'All':
+        if count > 1:
+            return f'There are exactly {count} {what}\n'
+        return f'There is exactly {count} {what}\n'
+    if status == 'Yes':
+        if count > 1:
+            return f'There are at least {count} {what}\n'
+        if count > 0:
+            return f'There is at least {count} {what}\n'
+        return f'There is at least one {what}, but it is not in this dataset\n'
+    return ''
+
+
+# the text get_ds_data() and get_sds_data() print; G is the group as the caller wrote it
+def format_ds(R, G=None):
+    if G is None:
+        G = f'{list(R.G)}'.replace(' ', '')
+    lines = [_count_text(R.status, R.num_sets, f'{R.kind}({R.v},{R.k},{R.lam}) in group {G}')]
+    if R.status == 'No':
+        lines += [f'No {R.kind}({R.v},{R.k},{R.lam}) exists in group {G}\n']
+    if R.comment is not None:
+        lines += [f'Reference: {R.comment}\n\n']
+    if R.G_rep is not None:
+        lines += [f'{R.kind} given as elements of {list(R.G_rep)}\n']
+    for i, S in enumerate(R.sets()):
+        prefix = f'{i}:\t' if R.num_sets > 1 else ''
+        if R.kind == 'DS':
+            lines += [prefix + ''.join(f'{x} ' for x in S) + '\n']
+        else:
+            lines += [prefix + f'P = {S.P}, N = {S.N}\n']
+    return ''.join(lines)
+
+
+# the text get_cwm_data() prints
+def format_cw(R):
+    what = f'CW({R.n},{R.s}^2)'
+    lines = [_count_text(R.status, R.num_sets, what)]
+    if R.status == 'No':
+        lines += [f'No {what} exists\n']
+    if R.comment is not None:
+        lines += [f'Reference: {R.comment}\n']
+    for i, S in enumerate(R.sets()):
+        lines += [f'{i}:\tP = {S.P}, N = {S.N}\n']
+    return ''.join(lines) + '\n'
+
+
+def format_improvement(imp):
+    if len(imp.method) > 0:
+        return f'{imp.size}:  {imp.timestamp} by {imp.creator} using {imp.method}\n'
+    return f'{imp.size}:  {imp.timestamp} by {imp.creator}\n'
+
+
+# the text get_cover_data() prints
+def format_cover(R):
+    if R.size == R.low_bd:
+        text = f'{R.name} = {R.size}\n'
+    else:
+        text = f'{R.low_bd} <= {R.name} <= {R.size}\n'
+    return text + 'last update ' + format_improvement(R.last)
+
+
+# the lines show_cover() prints, one at a time
+def format_blocks(B):
+    yield f'{B.name} has {len(B)} blocks\n'
+    for block in B.blocks():
+        yield f'{list(block)}\n'
@@ -0,0 +1,493 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+import numpy as np
+
+from ljcr.batchcheck import DATASETS
+from ljcr.blockstore import BlockStore, header_path
+from ljcr.columnar import dataset_columns
+from ljcr.covertable import CoverIndex, match
+from ljcr.jsonindex import IndexedJson
+from ljcr.names import cover_name, cw_name, ds_name, parse_name
+
+# Query server for the datasets: loads each one once and answers HTTP GET
+# requests with JSON, so that long-running services don't each read the JSON
+# files and parse names themselves.
+#
+#     GET /                               datasets and their sizes
+#     GET /stats                          result cache hits and misses
+#     GET /<dataset>/query?<conditions>   entries matching every condition
+#     GET /<dataset>/entry?name=...       one entry, without its sets
+#     GET /<dataset>/sets?name=...[&i=]   its sets (or the i-th one)
+#     GET /cover/blocks?name=...          the blocks of a covering, streamed
+#
+# <dataset> is ds, sds, cwm or cover.  An entry is given by name=, or by its
+# parameters (v,k,lam,G for ds and sds, n,s for cwm, v,k,t for cover).  Query
+# conditions are a value, or a range lo:hi meaning lo <= x < hi (either end may
+# be left out), on
+#     ds, sds: v, k, lam, status, G (e.g. G=4,4)
+#     cwm:     n, s, status
+#     cover:   v, k, t, size, low_bd, open (1 for size != low_bd)
+# with limit and offset for paging (limit defaults to LIMIT).  Range queries are
+# vectorized over the parameter columns (columnar.py, covertable.py).
+#
+# Responses other than blocks are kept in an LRU cache keyed by the request.
+# Responses are worked out (and blocks read) on the event loop's thread pool, so
+# a slow query doesn't hold up the other clients; an error answers 500.
+# Blocks are written with chunked transfer encoding as they are read, straight
+# from covers.json's bytes (through its index) or a block at a time from
+# covers.blk, so a covering of millions of blocks is never held in memory.
+#
+# Client talks to a running server with http.client; QueryServer.start() runs
+# the server on a background thread, so both ends can be used in one process,
+# with no outside services:
+#     S = QueryServer('.')
+#     port = S.start()
+#     Client(port=port).query('cwm', n='1:500', status='Open')
+
+PORT = 8765
+LIMIT = 1000
+CACHE_SIZE = 1024
+
+# bytes of covers.json, or blocks of covers.blk, written at a time
+STREAM_BYTES = 1 << 20
+STREAM_BLOCKS = 1 << 14
+
+# dataset -> (columns of the parameters, kind in the names)
+PARAMS = {'ds': (['v', 'k', 'lam'], 'DS'), 'sds': (['v', 'k', 'lam'], 'SDS'),
+          'cwm': (['n', 's'], 'CW'), 'cover': (['v', 'k', 't'], 'C')}
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LRUCache:
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        # responses are worked out on several threads at once
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# a condition from a query parameter: "5" -> 5, "5:10" -> (5,10), "5:" -> (5,None)
+def parse_condition(s):
+    try:
+        if ':' not in s:
+            return int(s)
+        lo, hi = s.split(':', 1)
+        return (int(lo) if lo != '' else None, int(hi) if hi != '' else None)
+    except ValueError:
+        raise QueryError(400, f'bad condition {s!r}')
+
+
+def _int(query, key, default=None):
+    if key not in query:
+        if default is None:
+            raise QueryError(400, f'missing parameter {key}')
+        return default
+    try:
+        return int(query[key])
+    except ValueError:
+        raise QueryError(400, f'bad value for {key}: {query[key]!r}')
+
+
+def _json_bytes(obj):
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class QueryServer:
+    # root is the repository root, where the datasets are looked for (coverings in
+    # coverings/: coverdata.json, and covers.blk or else covers.json); any of them may
+    # be passed instead, as the dictionaries (covers also as an IndexedJson or BlockStore)
+    def __init__(self, root='.', ds=None, sds=None, cwm=None, coverdata=None, covers=None,
+                 cache_size=CACHE_SIZE, verbose=True):
+        given = {'ds': ds, 'sds': sds, 'cwm': cwm}
+        self.data = {}
+        for dataset in ['ds', 'sds', 'cwm']:
+            path = os.path.join(root, DATASETS[dataset])
+            if given[dataset] is not None:
+                self.data[dataset] = given[dataset]
+            elif os.path.exists(path):
+                self.data[dataset] = _load_json(path)
+        path = os.path.join(root, 'coverings', 'coverdata.json')
+        if coverdata is None and os.path.exists(path):
+            coverdata = _load_json(path)
+        if coverdata is not None:
+            self.data['cover'] = coverdata
+        if covers is None:
+            blk = os.path.join(root, 'coverings', 'covers.blk')
+            path = os.path.join(root, 'coverings', 'covers.json')
+            if os.path.exists(header_path(blk)):
+                covers = BlockStore(blk)
+            elif os.path.exists(path):
+                covers = IndexedJson(path)
+        self.covers = covers
+
+        self.columns = {}
+        for dataset in ['ds', 'sds', 'cwm']:
+            if dataset in self.data:
+                self.columns[dataset] = dataset_columns(self.data[dataset], PARAMS[dataset][1])
+        if 'cover' in self.data:
+            self.cover_index = CoverIndex(self.data['cover'])
+        self.cache = LRUCache(cache_size)
+        if verbose:
+            for dataset, data in self.data.items():
+                print(f'{dataset}: {len(data)} data items')
+            if covers is not None:
+                print(f'covers: {len(covers)} coverings')
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    # the dataset in a request path, which must be loaded
+    def _dataset(self, dataset):
+        if dataset not in PARAMS:
+            raise QueryError(404, f'unknown dataset {dataset}')
+        if dataset not in self.data:
+            raise QueryError(404, f'dataset {dataset} is not loaded')
+        return self.data[dataset]
+
+    # the name of the entry a request asks for: name=, or the parameters
+    def _name(self, dataset, query):
+        if 'name' in query:
+            name = query['name']
+        elif dataset in ('ds', 'sds'):
+            G = [int(x) for x in query.get('G', query.get('v', '')).split(',') if x != '']
+            name = ds_name(_int(query, 'v'), _int(query, 'k'), _int(query, 'lam'), G, PARAMS[dataset][1])
+        elif dataset == 'cwm':
+            name = cw_name(_int(query, 'n'), _int(query, 's'))
+        else:
+            name = cover_name(_int(query, 'v'), _int(query, 'k'), _int(query, 't'))
+        if name not in self._dataset(dataset):
+            raise QueryError(404, f'{name} not in {dataset}')
+        return name
+
+    def _summary(self, dataset, name):
+        entry = self.data[dataset][name]
+        kind, P = parse_name(name)
+        if dataset == 'cover':
+            R = dict(zip(PARAMS[dataset][0], P))
+            R.update({'name': name, 'size': entry['size'], 'low_bd': entry['low_bd']})
+            if len(entry.get('imps', [])) > 0:
+                imp = entry['imps'][0]
+                R.update({'method': imp[1], 'creator': imp[2], 'timestamp': imp[3]})
+            R['has_blocks'] = self.covers is not None and name in self.covers
+            return R
+        R = {'name': name}
+        R.update(zip(PARAMS[dataset][0], P))
+        if dataset != 'cwm':
+            R['G'] = list(P[3])
+            if 'G_rep' in entry:
+                R['G_rep'] = entry['G_rep']
+        R.update({'status': entry.get('status'), 'comment': entry.get('comment'),
+                  'num_sets': len(entry.get('sets', []))})
+        return R
+
+    def query(self, dataset, query):
+        self._dataset(dataset)
+        limit = _int(query, 'limit', LIMIT)
+        offset = _int(query, 'offset', 0)
+        if dataset == 'cover':
+            conditions = {x: parse_condition(query[x]) for x in ['v', 'k', 't', 'size', 'low_bd'] if x in query}
+            I = self.cover_index.query(open_only=query.get('open', '0') == '1', **conditions)
+            names = self.cover_index.names(I)
+        else:
+            C = self.columns[dataset]
+            m = np.ones(len(C), dtype=bool)
+            for x in PARAMS[dataset][0]:
+                if x in query:
+                    m &= match(C[x], parse_condition(query[x]))
+            if 'status' in query:
+                m &= C.values('entries', 'status') == query['status']
+            I = np.flatnonzero(m)
+            I = I[np.lexsort(tuple(C[x][I] for x in PARAMS[dataset][0][::-1]))]
+            names = C['name'][I].tolist()
+            if 'G' in query:
+                G = tuple(int(x) for x in query['G'].split(','))
+                names = [name for name in names if parse_name(name)[1][3] == G]
+        page = names[offset:offset+limit]
+        return {'dataset': dataset, 'total': len(names), 'offset': offset, 'limit': limit,
+                'results': [self._summary(dataset, name) for name in page]}
+
+    def entry(self, dataset, query):
+        name = self._name(dataset, query)
+        R = self._summary(dataset, name)
+        if dataset == 'cover':
+            R['imps'] = self.data[dataset][name].get('imps', [])
+        return R
+
+    def sets(self, dataset, query):
+        if dataset == 'cover':
+            raise QueryError(404, 'coverings have blocks, not sets: use /cover/blocks')
+        name = self._name(dataset, query)
+        entry = self.data[dataset][name]
+        S = entry.get('sets', [])
+        kind, P = parse_name(name)
+        R = {'name': name, 'G': [P[0]] if dataset == 'cwm' else entry.get('G_rep', list(P[3]))}
+        if 'i' in query:
+            i = _int(query, 'i')
+            if not 0 <= i < len(S):
+                raise QueryError(404, f'{name} has {len(S)} sets')
+            R['set'] = S[i]
+        else:
+            R['sets'] = S
+        return R
+
+    # chunks of the JSON response {"name":...,"blocks":[[...],...]}
+    def blocks(self, query):
+        name = self._name('cover', query)
+        if self.covers is None or name not in self.covers:
+            raise QueryError(404, f'no blocks for {name}')
+        covers = self.covers
+        head = b'{"name":' + _json_bytes(name) + b',"blocks":'
+        if isinstance(covers, IndexedJson):
+            start, end = covers.span(name)
+
+            def chunks():
+                yield head
+                with open(covers.path, 'rb') as f:
+                    f.seek(start)
+                    left = end - start
+                    while left > 0:
+                        buf = f.read(min(left, STREAM_BYTES))
+                        if not buf:
+                            break
+                        left -= len(buf)
+                        yield buf
+                yield b'}'
+        elif isinstance(covers, BlockStore):
+            rows = covers.rows(name)
+
+            def chunks():
+                yield head + b'['
+                for i in range(0, len(rows), STREAM_BLOCKS):
+                    text = _json_bytes(rows[i:i+STREAM_BLOCKS].tolist())[1:-1]
+                    yield (b',' if i > 0 else b'') + text
+                yield b']}'
+        else:
+            def chunks():
+                yield head + _json_bytes(np.asarray(covers[name]).tolist()) + b'}'
+        return chunks()
+
+    def stats(self):
+        return {'cache_size': len(self.cache), 'cache_max': self.cache.maxsize,
+                'hits': self.cache.hits, 'misses': self.cache.misses}
+
+    # the response to a GET: bytes of JSON, or an iterator over chunks of it
+    def respond(self, path, query):
+        parts = [x for x in path.split('/') if x != '']
+        if len(parts) == 0:
+            return _json_bytes({'datasets': {d: len(self.data[d]) for d in self.data},
+                                'covers': 0 if self.covers is None else len(self.covers)})
+        if parts == ['stats']:
+            return _json_bytes(self.stats())
+        if len(parts) != 2:
+            raise QueryError(404, f'no such path {path}')
+        dataset, action = parts
+        if dataset == 'cover' and action == 'blocks':
+            return self.blocks(query)
+
+        key = (dataset, action, tuple(sorted(query.items())))
+        body = self.cache.get(key)
+        if body is None:
+            if action == 'query':
+                body = _json_bytes(self.query(dataset, query))
+            elif action == 'entry':
+                body = _json_bytes(self.entry(dataset, query))
+            elif action == 'sets':
+                body = _json_bytes(self.sets(dataset, query))
+            else:
+                raise QueryError(404, f'no such path {path}')
+            self.cache.put(key, body)
+        return body
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+            try:
+                method, target, version = line.decode('latin-1').split()
+                if method != 'GET':
+                    raise QueryError(405, f'{method} not supported')
+                url = urllib.parse.urlsplit(target)
+                body = await loop.run_in_executor(None, self.respond, urllib.parse.unquote(url.path),
+                                                  dict(urllib.parse.parse_qsl(url.query)))
+                status = 200
+            except QueryError as e:
+                status, body = e.status, _json_bytes({'error': e.message})
+            except ValueError as e:
+                status, body = 400, _json_bytes({'error': str(e)})
+            except Exception as e:
+                status, body = 500, _json_bytes({'error': f'{type(e).__name__}: {e}'})
+
+            head = f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\nContent-Type: application/json\r\nConnection: close\r\n'
+            if isinstance(body, bytes):
+                writer.write((head + f'Content-Length: {len(body)}\r\n\r\n').encode() + body)
+            else:
+                # an error once streaming has started leaves the body unfinished,
+                # which the client sees as a broken response
+                writer.write((head + 'Transfer-Encoding: chunked\r\n\r\n').encode())
+                while True:
+                    try:
+                        chunk = await loop.run_in_executor(None, next, body, None)
+                    except Exception:
+                        return
+                    if chunk is None:
+                        break
+                    writer.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+                    await writer.drain()
+                writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    # serve until interrupted
+    def run(self, host='127.0.0.1', port=PORT):
+        async def main():
+            server = await self.serve(host, port)
+            print(f'serving on {host}:{server.sockets[0].getsockname()[1]}')
+            async with server:
+                await server.serve_forever()
+        asyncio.run(main())
+
+    # serve on a background thread; returns the port (port=0 picks a free one)
+    def start(self, host='127.0.0.1', port=0):
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def main():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.serve(host, port))
+            started.set()
+            self._loop.run_forever()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=main, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+
+class Client:
+    def __init__(self, host='127.0.0.1', port=PORT, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    # GET path with the given query parameters, as parsed JSON; raises QueryError on errors
+    def get(self, path, **params):
+        if len(params) > 0:
+            path += '?' + urllib.parse.urlencode(params)
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            body = json.loads(resp.read())
+        finally:
+            conn.close()
+        if resp.status != 200:
+            raise QueryError(resp.status, body.get('error', ''))
+        return body
+
+    def datasets(self):
+        return self.get('/')
+
+    def stats(self):
+        return self.get('/stats')
+
+    # e.g. query('cwm', n='1:500', status='Open')
+    def query(self, dataset, **conditions):
+        return self.get(f'/{dataset}/query', **conditions)
+
+    def entry(self, dataset, name=None, **params):
+        if name is not None:
+            params['name'] = name
+        return self.get(f'/{dataset}/entry', **params)
+
+    def sets(self, dataset, name=None, i=None, **params):
+        if name is not None:
+            params['name'] = name
+        if i is not None:
+            params['i'] = i
+        return self.get(f'/{dataset}/sets', **params)
+
+    # the blocks of a covering, as an n x k array
+    def blocks(self, name=None, **params):
+        if name is not None:
+            params['name'] = name
+        return np.array(self.get('/cover/blocks', **params)['blocks'], dtype=np.int64)
+
+
+# python -m ljcr.server [repository root] [--host HOST] [--port PORT]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='serve the datasets as JSON over HTTP')
+    parser.add_argument('root', nargs='?', default='.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+    QueryServer(args.root, cache_size=args.cache_size).run(args.host, args.port)
@@ -0,0 +1,414 @@
+import abc
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Mapping
+
+import numpy as np
+
+from ljcr.batchcheck import load_datasets
+from ljcr.blockstore import BlockStore, blocks_to_rows, header_path, rows_dtype
+from ljcr.dataset import file_stamp
+from ljcr.jsonindex import IndexedJson
+from ljcr.keyindex import KeyIndex
+from ljcr.names import parse_name
+
+# All the datasets in one local SQLite file, in place of the MySQL database on
+# the website, with indexes for parameter queries.
+#
+# build_store() reads coverdata.json, covers.json (or covers.blk), ds.json,
+# sds.json and cwm.json into these tables:
+#     ds, sds      name, v, k, lam, G ("4,4"), G_rep, status, comment, num_sets, extra
+#                  indexed on (v,k,lam,G) and (status,v)
+#     cwm          name, n, s, status, comment, num_sets, extra
+#                  indexed on (n,s) and (status,n)
+#     ds_sets, sds_sets, cwm_sets
+#                  name, i, P, N: the i-th set of an entry (P and N as JSON lists;
+#                  a DS is stored as P), keyed by (name,i)
+#     cover        name, v, k, t, size, low_bd, indexed on (v,k,t)
+#     cover_imps   name, i, size, method, creator, timestamp, keyed by (name,i)
+#     cover_blocks name, num_blocks, dtype, blocks: the n x k array of points as
+#                  bytes (uint8, or uint16 for v >= 256)
+#     meta         version, build time, and the files it was built from
+# "extra" holds any keys of an entry besides those given columns, as JSON, so
+# the entries read back exactly as they are in the JSON files.  Rows are
+# inserted in the order of the JSON files, and iterate in that order.
+#
+# SQLDataset, SQLCoverdata and SQLCovers read the store and behave like the
+# dictionaries read from the JSON files (cwm, signed_diffsets, diffsets,
+# coverdata, covers), so the functions in the *_code.py files work unchanged
+# on top of them (use_store() in each), while query() is an indexed SQL lookup:
+#     SQLDataset('ljcr.sqlite', 'cwm').query(n=(None,500), status='Open')
+# A condition is a value, or a range: a range() or a pair (lo,hi) meaning
+# lo <= x < hi, with None for no bound (as in covertable.py); query_index() gives
+# the same answer from the JSON files.  The store is read-only; entries assigned
+# to a view (e.g. by apply_log()) are kept in memory on top of it.
+
+STORE_VERSION = 1
+
+# dataset -> (parameter columns, kind in the names)
+TABLES = {'ds': (['v', 'k', 'lam', 'G'], 'DS'), 'sds': (['v', 'k', 'lam', 'G'], 'SDS'),
+          'cwm': (['n', 's'], 'CW')}
+
+_COLUMNS = {'status', 'comment', 'sets', 'G_rep'}
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE ds (name TEXT PRIMARY KEY, v INTEGER, k INTEGER, lam INTEGER, G TEXT, G_rep TEXT,
+                 status TEXT, comment TEXT, num_sets INTEGER, extra TEXT);
+CREATE TABLE sds (name TEXT PRIMARY KEY, v INTEGER, k INTEGER, lam INTEGER, G TEXT, G_rep TEXT,
+                  status TEXT, comment TEXT, num_sets INTEGER, extra TEXT);
+CREATE TABLE cwm (name TEXT PRIMARY KEY, n INTEGER, s INTEGER,
+                  status TEXT, comment TEXT, num_sets INTEGER, extra TEXT);
+CREATE TABLE ds_sets (name TEXT, i INTEGER, P TEXT, N TEXT, PRIMARY KEY (name, i));
+CREATE TABLE sds_sets (name TEXT, i INTEGER, P TEXT, N TEXT, PRIMARY KEY (name, i));
+CREATE TABLE cwm_sets (name TEXT, i INTEGER, P TEXT, N TEXT, PRIMARY KEY (name, i));
+CREATE TABLE cover (name TEXT PRIMARY KEY, v INTEGER, k INTEGER, t INTEGER, size INTEGER, low_bd INTEGER);
+CREATE TABLE cover_imps (name TEXT, i INTEGER, size INTEGER, method TEXT, creator TEXT, timestamp TEXT,
+                         PRIMARY KEY (name, i));
+CREATE TABLE cover_blocks (name TEXT PRIMARY KEY, num_blocks INTEGER, dtype TEXT, blocks BLOB);
+CREATE INDEX ds_params ON ds (v, k, lam, G);
+CREATE INDEX ds_status ON ds (status, v);
+CREATE INDEX sds_params ON sds (v, k, lam, G);
+CREATE INDEX sds_status ON sds (status, v);
+CREATE INDEX cwm_params ON cwm (n, s);
+CREATE INDEX cwm_status ON cwm (status, n);
+CREATE INDEX cover_params ON cover (v, k, t);
+'''
+
+# rows inserted between commits while building
+BATCH = 10000
+
+
+def _group_text(G):
+    return ','.join(str(int(n)) for n in G)
+
+
+def _dataset_rows(dataset, data):
+    entries = []
+    sets = []
+    for name, entry in data.items():
+        kind, P = parse_name(name)
+        if kind != TABLES[dataset][1]:
+            raise ValueError(f'{name} in {dataset}')
+        S = entry.get('sets', [])
+        extra = {x: entry[x] for x in entry if x not in _COLUMNS}
+        common = [entry.get('status'), entry.get('comment'), len(S), json.dumps(extra) if extra else None]
+        if dataset == 'cwm':
+            entries += [[name, P[0], P[1]] + common]
+        else:
+            G_rep = _group_text(entry['G_rep']) if 'G_rep' in entry else None
+            entries += [[name, P[0], P[1], P[2], _group_text(P[3]), G_rep] + common]
+        for i, X in enumerate(S):
+            if dataset == 'ds':
+                sets += [(name, i, json.dumps(X), None)]
+            else:
+                sets += [(name, i, json.dumps(X[0]), json.dumps(X[1]))]
+    return entries, sets
+
+
+# write the store to path from the datasets given (any may be None): ds, sds and cwm
+# dictionaries, coverdata, and covers as a dictionary, IndexedJson or BlockStore
+def write_store(path, ds=None, sds=None, cwm=None, coverdata=None, covers=None, sources=()):
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        db.executescript(SCHEMA)
+        for dataset, data in [('ds', ds), ('sds', sds), ('cwm', cwm)]:
+            if data is None:
+                continue
+            entries, sets = _dataset_rows(dataset, data)
+            if len(entries) > 0:
+                marks = ','.join('?'*len(entries[0]))
+                db.executemany(f'INSERT INTO {dataset} VALUES ({marks})', entries)
+            db.executemany(f'INSERT INTO {dataset}_sets VALUES (?,?,?,?)', sets)
+            db.commit()
+
+        if coverdata is not None:
+            db.executemany('INSERT INTO cover VALUES (?,?,?,?,?,?)',
+                           ([name] + list(parse_name(name)[1]) + [E['size'], E['low_bd']]
+                            for name, E in coverdata.items()))
+            db.executemany('INSERT INTO cover_imps VALUES (?,?,?,?,?,?)',
+                           ((name, i, imp[0], imp[1], imp[2], imp[3])
+                            for name, E in coverdata.items() for i, imp in enumerate(E.get('imps', []))))
+            db.commit()
+
+        if covers is not None:
+            n = 0
+            for name in covers:
+                v, k, t = parse_name(name)[1]
+                B = covers[name]
+                if isinstance(B, np.ndarray):
+                    rows = np.ascontiguousarray(B, dtype=rows_dtype(v)).reshape(-1, k)
+                else:
+                    rows = blocks_to_rows(B, v, k)
+                db.execute('INSERT INTO cover_blocks VALUES (?,?,?,?)',
+                           (name, len(rows), rows.dtype.str, rows.tobytes()))
+                n += 1
+                if n % BATCH == 0:
+                    db.commit()
+            db.commit()
+
+        meta = {'version': STORE_VERSION, 'built': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'sources': [[p] + file_stamp(p) for p in sources]}
+        db.executemany('INSERT INTO meta VALUES (?,?)', [(x, json.dumps(y)) for x, y in meta.items()])
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp, path)
+
+
+# build the store from the files under the repository root; covers come from
+# coverings/covers.blk if it exists, else coverings/covers.json (blocks=False leaves them out)
+def build_store(path='ljcr.sqlite', root='.', blocks=True):
+    from ljcr.batchcheck import DATASETS
+
+    data = load_datasets(root)
+    sources = [os.path.join(root, DATASETS[d]) for d in data]
+    coverdata = None
+    covers = None
+    cd = os.path.join(root, 'coverings', 'coverdata.json')
+    if os.path.exists(cd):
+        with open(cd, 'r') as f:
+            coverdata = json.load(f)
+        sources += [cd]
+    blk = os.path.join(root, 'coverings', 'covers.blk')
+    cj = os.path.join(root, 'coverings', 'covers.json')
+    if blocks and os.path.exists(header_path(blk)):
+        covers = BlockStore(blk)
+        sources += [blk]
+    elif blocks and os.path.exists(cj):
+        covers = IndexedJson(cj)
+        sources += [cj]
+    write_store(path, data.get('ds'), data.get('sds'), data.get('cwm'), coverdata, covers, sources)
+
+
+def connect(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    version = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if version is None or json.loads(version[0]) != STORE_VERSION:
+        raise ValueError(f'{path}: unsupported store version')
+    return db
+
+
+# WHERE clause and arguments for conditions {column: value or range}
+def where(conditions):
+    clauses = []
+    args = []
+    for column, cond in conditions.items():
+        if cond is None:
+            continue
+        if isinstance(cond, range):
+            if cond.step != 1:
+                clauses += [f'{column} IN ({",".join("?"*len(cond))})']
+                args += list(cond)
+                continue
+            cond = (cond.start, cond.stop)
+        if isinstance(cond, tuple):
+            lo, hi = cond
+            if lo is not None:
+                clauses += [f'{column} >= ?']
+                args += [lo]
+            if hi is not None:
+                clauses += [f'{column} < ?']
+                args += [hi]
+        else:
+            clauses += [f'{column} = ?']
+            args += [cond]
+    if len(clauses) == 0:
+        return '', []
+    return ' WHERE ' + ' AND '.join(clauses), args
+
+
+def _matches(x, cond):
+    if cond is None:
+        return True
+    if isinstance(cond, range):
+        return x in cond
+    if isinstance(cond, tuple):
+        lo, hi = cond
+        return (lo is None or x >= lo) and (hi is None or x < hi)
+    return x == cond
+
+
+# the same query without the store, going through a key index (see keyindex.py) and the
+# dictionary: for ds, sds and cwm read from the JSON files
+def query_index(index, data, dataset, status=None, **conditions):
+    columns = TABLES[dataset][0]
+    conditions = dict(conditions)
+    G = conditions.pop('G', None)
+    names = []
+    for name, (kind, P) in index.params.items():
+        values = dict(zip(columns, P))
+        if all(_matches(values[x], cond) for x, cond in conditions.items()) and \
+                (G is None or tuple(values['G']) == tuple(G)) and \
+                (status is None or data[name].get('status') == status):
+            names += [name]
+    # in the order of the SQL query, which sorts G as text
+    def key(name):
+        P = index.params[name][1]
+        return P if dataset == 'cwm' else P[:3] + (_group_text(P[3]),)
+    return sorted(names, key=key)
+
+
+class _SQLView(Mapping):
+    table = None
+
+    def __init__(self, path):
+        self.path = path
+        self.db = connect(path)
+        # entries assigned in this session, on top of the store
+        self._overlay = {}
+
+    def loaded(self):
+        return True
+
+    # the entry called name, as in the JSON file, or None if it isn't in the store
+    @abc.abstractmethod
+    def _entry(self, name):
+        pass
+
+    def __getitem__(self, name):
+        if name in self._overlay:
+            return self._overlay[name]
+        E = self._entry(name)
+        if E is None:
+            raise KeyError(name)
+        return E
+
+    def __setitem__(self, name, entry):
+        self._overlay[name] = entry
+
+    def __contains__(self, name):
+        if name in self._overlay:
+            return True
+        return self.db.execute(f'SELECT 1 FROM {self.table} WHERE name = ?', (name,)).fetchone() is not None
+
+    def __iter__(self):
+        for (name,) in self.db.execute(f'SELECT name FROM {self.table} ORDER BY rowid'):
+            if name not in self._overlay:
+                yield name
+        yield from self._overlay
+
+    def __len__(self):
+        n = self.db.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        return n + sum(1 for name in self._overlay if self._entry(name) is None)
+
+
+# ds, sds or cwm from the store, as the dictionary in the JSON file
+class SQLDataset(_SQLView):
+    def __init__(self, path, dataset):
+        if dataset not in TABLES:
+            raise ValueError(f'unknown dataset {dataset}')
+        self.table = dataset
+        super().__init__(path)
+
+    def _entry(self, name):
+        if self.table == 'cwm':
+            row = self.db.execute('SELECT status, comment, num_sets, extra FROM cwm WHERE name = ?',
+                                  (name,)).fetchone()
+            G_rep = None
+        else:
+            row = self.db.execute(f'SELECT status, comment, num_sets, extra, G_rep FROM {self.table} WHERE name = ?',
+                                  (name,)).fetchone()
+            if row is not None:
+                G_rep = row[4]
+        if row is None:
+            return None
+        status, comment, num_sets, extra = row[:4]
+        E = {}
+        if status is not None:
+            E['status'] = status
+        if comment is not None:
+            E['comment'] = comment
+        if G_rep is not None:
+            E['G_rep'] = [int(n) for n in G_rep.split(',')]
+        if num_sets > 0:
+            S = self.db.execute(f'SELECT P, N FROM {self.table}_sets WHERE name = ? ORDER BY i', (name,))
+            if self.table == 'ds':
+                E['sets'] = [json.loads(P) for P, N in S]
+            else:
+                E['sets'] = [[json.loads(P), json.loads(N)] for P, N in S]
+        if extra is not None:
+            E.update(json.loads(extra))
+        return E
+
+    # names of the entries satisfying every condition, sorted by parameters; G may be
+    # given as a list, e.g. query(v=range(10,50), status='Open') or query(v=16, G=[4,4])
+    def query(self, status=None, **conditions):
+        columns = TABLES[self.table][0]
+        for x in conditions:
+            if x not in columns:
+                raise ValueError(f'no column {x} in {self.table}')
+        conditions = dict(conditions)
+        if conditions.get('G') is not None and not isinstance(conditions['G'], str):
+            conditions['G'] = _group_text(conditions['G'])
+        conditions['status'] = status
+        clause, args = where(conditions)
+        order = ', '.join(columns)
+        return [name for (name,) in self.db.execute(f'SELECT name FROM {self.table}{clause} ORDER BY {order}', args)]
+
+    # key index (see keyindex.py) from the parameter columns, without parsing names
+    def key_index(self):
+        kind = TABLES[self.table][1]
+        names = []
+        parsed = []
+        if self.table == 'cwm':
+            for name, n, s in self.db.execute('SELECT name, n, s FROM cwm ORDER BY rowid'):
+                names += [name]
+                parsed += [(kind, (n, s))]
+        else:
+            for name, v, k, lam, G in self.db.execute(f'SELECT name, v, k, lam, G FROM {self.table} ORDER BY rowid'):
+                names += [name]
+                parsed += [(kind, (v, k, lam, tuple(int(n) for n in G.split(','))))]
+        return KeyIndex(names, parsed)
+
+
+# coverdata from the store
+class SQLCoverdata(_SQLView):
+    table = 'cover'
+
+    def _entry(self, name):
+        row = self.db.execute('SELECT size, low_bd FROM cover WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        imps = self.db.execute('SELECT size, method, creator, timestamp FROM cover_imps WHERE name = ? ORDER BY i',
+                               (name,))
+        return {'size': row[0], 'low_bd': row[1], 'imps': [list(imp) for imp in imps]}
+
+    # names of the coverings satisfying every condition (on v, k, t, size, low_bd), sorted by (v,k,t);
+    # open_only selects those whose size and lower bound differ
+    def query(self, v=None, k=None, t=None, size=None, low_bd=None, open_only=False):
+        clause, args = where({'v': v, 'k': k, 't': t, 'size': size, 'low_bd': low_bd})
+        if open_only:
+            clause += (' AND ' if clause else ' WHERE ') + 'size != low_bd'
+        return [name for (name,) in self.db.execute(f'SELECT name FROM cover{clause} ORDER BY v, k, t', args)]
+
+
+# covers from the store: each covering as an n x k array of points
+class SQLCovers(_SQLView):
+    table = 'cover_blocks'
+
+    def _entry(self, name):
+        row = self.db.execute('SELECT dtype, blocks FROM cover_blocks WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        k = parse_name(name)[1][1]
+        return np.frombuffer(row[1], dtype=np.dtype(row[0])).reshape(-1, k)
+
+    def num_blocks(self, name):
+        return self.db.execute('SELECT num_blocks FROM cover_blocks WHERE name = ?', (name,)).fetchone()[0]
+
+
+# python -m ljcr.sqlstore [repository root] [output file]
+if __name__ == '__main__':
+    import sys
+    root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(root, 'ljcr.sqlite')
+    build_store(path, root)
+    print(f'wrote {path}')
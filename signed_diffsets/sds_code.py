@@ -1,13 +1,47 @@
-import pandas as pd
-import numpy as np
-import matplotlib as mpl
-import json
-
-f = open('sds.json','r')
-signed_diffsets = json.load(f)
-f.close()
-
-print(f'read {len(signed_diffsets.keys())} data items\n')
+import os
+import sys
+
+# make the shared ljcr package importable, whether this file is imported or load()ed
+_here = os.path.dirname(os.path.abspath((lambda: 0).__code__.co_filename))
+if os.path.dirname(_here) not in sys.path:
+    sys.path.insert(0, os.path.dirname(_here))
+
+from ljcr.dataset import LazyDataset
+from ljcr.keyindex import load_key_index, params
+
+# sds.json is read the first time signed_diffsets is used, rather than when this file is loaded,
+# and from the directory this file is in, whatever the current directory is.
+# likewise pandas and the NumPy-based code in ljcr are only imported when they're needed
+signed_diffsets = LazyDataset(os.path.join(_here,'sds.json'))
+
+# parsed names, and the groups for each (v,k,lambda), from sds.json.keys when that is up to date
+_keyindex = None
+
+def key_index():
+    global _keyindex
+    if _keyindex is None:
+        _keyindex = load_key_index(signed_diffsets.path, signed_diffsets)
+    return _keyindex
+
+# read signed_diffsets from the SQLite store built by "python -m ljcr.sqlstore" (see ljcr/sqlstore.py)
+# rather than from sds.json; the functions here work the same on top of it
+def use_store(path=os.path.join(os.path.dirname(_here),'ljcr.sqlite')):
+    from ljcr.sqlstore import SQLDataset
+
+    global signed_diffsets, _keyindex
+    signed_diffsets = SQLDataset(path,'sds')
+    _keyindex = signed_diffsets.key_index()
+    print(f'opened {len(signed_diffsets)} data items')
+
+# names of the entries with the given parameters (each a value or a range) and status,
+# sorted by parameters, e.g. sds_query(v=range(10,50),status='Open')
+# with use_store() this is an indexed lookup in the store
+def sds_query(v=None,k=None,lam=None,G=None,status=None):
+    from ljcr.sqlstore import query_index
+
+    if hasattr(signed_diffsets,'query'):
+        return signed_diffsets.query(v=v,k=k,lam=lam,G=G,status=status)
+    return query_index(key_index(),signed_diffsets,'sds',status,v=v,k=k,lam=lam,G=G)
 
 # signed_diffsets is a python dictionary; each entry is the "name" of a set of parameters, e.g. "SDS(89,12,1,[89])"
 # the dictionary entries contain 
@@ -38,25 +72,18 @@ def num_sets(D):
     return len(signed_diffsets[D]["sets"])
 
 # pull parameters out from name D
+# names are parsed once, and looked up after that (see ljcr/keyindex.py)
 def get_v(D):
-    S = D.split(',')
-    return int(S[0].split('(')[1])
+    return params(D)[1][0]
 
 def get_k(D):
-    S = D.split(',')
-    return int(S[1])
+    return params(D)[1][1]
 
 def get_lam(D):
-    S = D.split(',')
-    return int(S[2])
+    return params(D)[1][2]
 
 def get_G(D):
-    S = D.split('[')[1].split(']')[0].split(',')
-    G = []
-    for i in range(len(S)):
-        component = S[i]
-        G += [int(component)]
-    return G
+    return list(params(D)[1][3])
 
 
 #get the ith set as a list
@@ -132,6 +159,14 @@ def sds_as_gp_ring_elt(D):
     return A
 
 
+# the same group ring element without Sage, as a GroupRingElement (see ljcr/groupring.py)
+# supports +, -, * and gp_ring_elt_map(), and converts to Sage with to_sage()
+def sds_as_gp_ring_array(D):
+    from ljcr.groupring import GroupRingElement
+
+    return GroupRingElement.from_sets(D[3],D[4],D[5])
+
+
 # get the ith (v,k,lambda) signed difference set in G, as a group ring element
 def get_sds_in_groupring(v,k,lam,G,i):
     sdsname = f'SDS({v},{k},{lam},{G})'.replace(' ','')
@@ -167,59 +202,46 @@ def set_count(sds):
         return 0
     return len(sds['sets'])
 
-# print out information about a given SDS
-def get_sds_data(v,k,lam,G):
+# the entry for an SDS as a record (see ljcr/records.py), with its parameters, status,
+# comment and G_rep, and sets() iterating over its [P,N] pairs; None if it's not in the dataset
+def sds_record(v,k,lam,G):
+    from ljcr.records import DSRecord
+
     sdsname = f'SDS({v},{k},{lam},{G})'.replace(' ','')
     if sdsname not in signed_diffsets:
-        print(f'{sdsname} not in database')
-        return
+        return None
+    return DSRecord(sdsname,signed_diffsets[sdsname])
 
-    D = signed_diffsets[sdsname]
-    if D['status']=="All":
-        if set_count(D)>1:
-            print(f'There are exactly {set_count(D)} SDS({v},{k},{lam}) in group {G}')
-        else:
-            print(f'There is exactly {set_count(D)} SDS({v},{k},{lam}) in group {G}')
-
-    if D['status']=="Yes":
-        if set_count(D)>1:
-            print(f'There are at least {set_count(D)} SDS({v},{k},{lam}) in group {G}')
-        else:
-            if set_count(D)>0:
-                print(f'There is at least {set_count(D)} SDS({v},{k},{lam}) in group {G}')
-            else:
-                print(f'There is at least one SDS({v},{k},{lam}) in group {G}, but it is not in this dataset')
+# records for each group with a (v,k,lambda) signed difference set entry, one at a time
+def sds_records_allgroups(v,k,lam):
+    for G in key_index().lookup((v,k,lam)):
+        yield sds_record(v,k,lam,list(G))
 
-    if D['status']=="No":
-            print(f'No SDS({v},{k},{lam}) exists in group {G}')
-
-    if 'comment' in D:
-        print(f'Reference: {D["comment"]}\n')
-
-    if 'G_rep' in D:
-        print(f'SDS given as elements of {D["G_rep"]}')
+# print out information about a given SDS
+def get_sds_data(v,k,lam,G):
+    from ljcr.records import format_ds
 
-    for i in range(set_count(D)):
-        sds = D['sets'][i]
-        if set_count(D) > 1:
-            print(f'{i}:\t',end='')
-        print(f'P = {sds[0]}, N = {sds[1]}')
+    R = sds_record(v,k,lam,G)
+    if R is None:
+        print(f'SDS({v},{k},{lam},{G})'.replace(' ','') + ' not in database')
+        return
+    print(format_ds(R,G),end='')
 
 def get_cyclic_sds_data(v,k,lam):
     get_sds_data(v,k,lam,[v])
 
 # find all (v,k,lambda) difference sets for any group
 def get_sds_allgroups(v,k,lam):
-    sdsname = f'SDS({v},{k},{lam}'
-    sdslen = len(sdsname)
-    for d in signed_diffsets:
-        if d[:sdslen]==sdsname:
-            G = d[sdslen+1:-1]
-            get_sds_data(v,k,lam,G)
-            print('')
+    for G in key_index().lookup((v,k,lam)):
+        G = f'{list(G)}'.replace(' ','')
+        get_sds_data(v,k,lam,G)
+        print('')
 
 # multiply group elts in group ring element by t
 def gp_ring_elt_map(A,t):
+    if not hasattr(A,'parent'):     # a GroupRingElement rather than a Sage element
+        return A.map(t)
+
     R = A.parent()
     G = R.group()
     
@@ -263,6 +285,90 @@ def is_sds(D):
     return True
 
 
+# the same test without Sage, and exact for any v: the autocorrelation is computed with
+# number-theoretic transforms mod primes rather than an FFT (see ljcr/ntt.py), so there
+# is no rounding however large the group is.  if the SDS is stored with a G_rep, its
+# elements are taken in that group
+def is_sds_exact(D):
+    from ljcr.ntt import is_signed_difference_set_exact
+
+    v = D[0]
+    k = D[1]
+    lam = D[2]
+    G = D[3]
+
+    sdsname = f'SDS({v},{k},{lam},{G})'.replace(' ','')
+    if sdsname in signed_diffsets and 'G_rep' in signed_diffsets[sdsname]:
+        G = signed_diffsets[sdsname]['G_rep']
+
+    return is_signed_difference_set_exact(v,k,lam,G,D[4],D[5])
+
+
+# the orbits of Z_v under the multipliers given (by default the primes p > lambda
+# dividing k-lambda, prime to v), and the group of units they generate.  both are
+# computed once per session, and saved for later sessions if LJCR_CACHE is set
+# (see ljcr/multipliers.py)
+def sds_orbits(v,k,lam,multipliers=None):
+    from ljcr.multipliers import sds_multipliers, orbits, subgroup
+
+    if multipliers is None:
+        multipliers = sds_multipliers(v,k,lam)
+    H = subgroup(v,multipliers)
+    O = orbits(v,multipliers)
+    print(f'multipliers {multipliers} generate a group of {len(H)} units mod {v}, with {len(O)} orbits on Z_{v}')
+    return [list(map(int,o)) for o in O]
+
+# orbit exhaust for SDS(v,k,lambda) in G (see ljcr/orbitsearch.py): search all SDS fixed
+# by the multipliers given (by default the primes p > lambda dividing k-lambda, prime to v)
+# on all cores, in the entry's G_rep if it has one.  returns an entry in the format of
+# sds.json, its comment naming the multipliers: status "Yes" with the sets found, or if
+# none are found "Open", or "No" when proven=True says the multipliers are known to be
+# multipliers for the parameters (the default candidates are not).  with a checkpoint
+# file, an interrupted search can be continued by calling this again with the same file
+def sds_search(v,k,lam,G,multipliers=None,processes=None,checkpoint=None,proven=False):
+    from ljcr.orbitsearch import sds_orbit_search, sds_multipliers
+
+    sdsname = f'SDS({v},{k},{lam},{G})'.replace(' ','')
+    rep = None
+    if sdsname in signed_diffsets and 'G_rep' in signed_diffsets[sdsname]:
+        rep = signed_diffsets[sdsname]['G_rep']
+    if multipliers is None:
+        multipliers = sds_multipliers(v,k,lam)
+    E = sds_orbit_search(v,k,lam,G,multipliers,processes,checkpoint,rep,proven)
+    print(f'{sdsname} fixed by multipliers {multipliers}: {len(E.get("sets",[]))} found')
+    for i in range(len(E.get('sets',[]))):
+        print(f'{i}:\tP = {E["sets"][i][0]}, N = {E["sets"][i][1]}')
+    return E
+
+# character-sum tests (see ljcr/charfilter.py)
+# the candidate [P,N] pairs in G that pass the test |chi(D)|^2 = k-lambda for every
+# nontrivial character chi, all characters being evaluated at once with an FFT
+def sds_char_filter(v,k,lam,G,sets):
+    from ljcr.charfilter import character_check
+
+    ok = character_check(v,k,lam,G,sets,signed=True)
+    return [sets[i] for i in range(len(sets)) if ok[i]]
+
+# run the parameter tests (trivial character and self-conjugacy) on the entries with the
+# given statuses (all entries if statuses is None), and list the ones they eliminate
+def sds_prefilter(statuses=['Open']):
+    from ljcr.charfilter import prefilter, print_prefilter
+
+    report = prefilter(signed_diffsets,statuses)
+    print_prefilter(report)
+    return report
+
+# write sds.json as typed columns, with the sets as ragged arrays (see ljcr/columnar.py):
+# Parquet files in the directory path if pyarrow is installed, else one .npz file.
+# read it back with read_columns(path) from ljcr.columnar
+def sds_export(path,fmt=None):
+    from ljcr.columnar import dataset_columns, write_columns
+
+    C = dataset_columns(signed_diffsets,'SDS')
+    fmt = write_columns(C,path,fmt)
+    print(f'wrote {len(C)} data items to {path} ({fmt})')
+    return C
+
 # code to create tables for showing a list of signed difference sets
 def init_tab():
     T = {}
@@ -275,9 +381,9 @@ def init_tab():
     return T
 
 def add_tab_entry(T,D):
-    v = int(D.split(',')[0].split('(')[1])
-    k = int(D.split(',')[1])
-    lam = int(D.split(',')[2].split(')')[0])
+    v = get_v(D)
+    k = get_k(D)
+    lam = get_lam(D)
     n = k-lam
     T['v'] += [v]
     T['k'] += [k]
@@ -287,6 +393,7 @@ def add_tab_entry(T,D):
     T['comment'] += [signed_diffsets[D]['comment']]
 
 def show_tab(T):
+    import pandas as pd
     df = pd.DataFrame(T)
     df = df.style.hide(axis='index')
     return df